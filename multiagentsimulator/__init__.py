@@ -1,11 +1,24 @@
+import importlib
+from typing import Any
 
 from . import data
 from . import environment
-from . import configs
-from . import visualization
 from . import utils
 
 env = environment
-sh = configs
 init_globals = env.init_globals
 
+# configs and visualization pull in matplotlib, folium, osmnx and geopandas, so they are imported on first access
+_lazy_submodules = {'configs': 'configs', 'sh': 'configs', 'visualization': 'visualization'}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _lazy_submodules:
+        module = importlib.import_module(f'.{_lazy_submodules[name]}', __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> Any:
+    return sorted(list(globals()) + list(_lazy_submodules))
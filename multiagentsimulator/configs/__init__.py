@@ -1,7 +1,26 @@
+import importlib
+from typing import Any
 
 from .covid_regulations import *
-from .evaluation import *
 from .experiments import *
 from .person_routines import *
-from .plot_helpers import *
+from . import sim_configs as _sim_configs
 from .sim_configs import *
+from .synthetic_configs import *
+
+# the evaluation and plotting helpers pull in matplotlib and the visualization package, so their names are looked up
+# in these modules on first access
+_lazy_modules = ('plot_helpers', 'evaluation')
+
+
+def __getattr__(name: str) -> Any:
+    if name == 'kyiv_config':
+        return _sim_configs.__getattr__(name)
+    if not name.startswith('_'):
+        for module_name in _lazy_modules:
+            module = importlib.import_module(f'.{module_name}', __name__)
+            if hasattr(module, name):
+                value = getattr(module, name)
+                globals()[name] = value
+                return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
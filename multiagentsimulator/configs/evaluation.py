@@ -1,17 +1,18 @@
 import dataclasses
 import os
 from pathlib import Path
-from typing import Dict, Optional, Sequence, Union, List
+from typing import Callable, Dict, Optional, Sequence, Union, List
 
 from .experiments import experiment_main
-from .sim_configs import small_town_config, medium_town_config, kyiv_config
+from .sim_configs import small_town_config, medium_town_config, get_kyiv_config, kyiv_num_persons
 from ..data import H5DataSaver, StageSchedule
 from ..environment import SimulationSettings, SimulationConfigs, ChosenRegulation, Risk
 
-population_size_to_config: Dict[int, SimulationConfigs] = {pp.num_persons: pp for pp in [
-    small_town_config,
-    medium_town_config,
-    kyiv_config]}
+# configs are built on demand, the Kyiv config needs the city's buildings
+population_size_to_config: Dict[int, Callable[[], SimulationConfigs]] = {
+    small_town_config.num_persons: lambda: small_town_config,
+    medium_town_config.num_persons: lambda: medium_town_config,
+    kyiv_num_persons: get_kyiv_config}
 
 
 @dataclasses.dataclass
@@ -29,6 +30,7 @@ class EvaluationSettings:
 
     enable_warm_up: bool = False
     max_episode_length: int = 120
+    lockstep_seeds: bool = False
     data_saver_path: Path = Path('../results/')
     data_filename: str = dataclasses.field(init=False)
     render_runs: bool = False
@@ -55,6 +57,7 @@ def evaluate_strategies(exp_name: str, eval_opts: EvaluationSettings) -> None:
                         stages_to_execute=strategy,
                         enable_warm_up=eval_opts.enable_warm_up,
                         num_random_seeds=eval_opts.num_seeds,
+                        lockstep=eval_opts.lockstep_seeds,
                         max_episode_length=eval_opts.max_episode_length,
                         exp_id=i)
 
@@ -69,6 +72,7 @@ def evaluate_spread_rates(exp_name: str, eval_opts: EvaluationSettings) -> None:
                         sim_opts=sim_opts,
                         data_saver=data_saver,
                         num_random_seeds=eval_opts.num_seeds,
+                        lockstep=eval_opts.lockstep_seeds,
                         max_episode_length=eval_opts.max_episode_length,
                         exp_id=i)
 
@@ -89,6 +93,7 @@ def evaluate_testing_rates(exp_name: str, eval_opts: EvaluationSettings) -> None
                         pandemic_regulations=[ChosenRegulation(stay_home_if_sick=True, stage=0)],
                         stages_to_execute=0,
                         num_random_seeds=eval_opts.num_seeds,
+                        lockstep=eval_opts.lockstep_seeds,
                         max_episode_length=eval_opts.max_episode_length,
                         exp_id=i)
 
@@ -108,6 +113,7 @@ def evaluate_social_gatherings(exp_name: str, eval_opts: EvaluationSettings) ->
                         pandemic_regulations=pandemic_regulations,
                         stages_to_execute=cr.stage,
                         num_random_seeds=eval_opts.num_seeds,
+                        lockstep=eval_opts.lockstep_seeds,
                         max_episode_length=eval_opts.max_episode_length,
                         exp_id=i)
 
@@ -125,6 +131,7 @@ def evaluate_location_contact_rates(exp_name: str, eval_opts: EvaluationSettings
                         pandemic_regulations=pandemic_regulations,
                         stages_to_execute=cr.stage,
                         num_random_seeds=eval_opts.num_seeds,
+                        lockstep=eval_opts.lockstep_seeds,
                         max_episode_length=eval_opts.max_episode_length,
                         exp_id=i)
 
@@ -135,9 +142,10 @@ def evaluate_population_sizes(exp_name: str, eval_opts: EvaluationSettings) -> N
 
     for i, population_size in enumerate(eval_opts.population_sizes):
         print(f'Evaluating population_size - {population_size}')
-        experiment_main(sim_config=population_size_to_config[population_size],
+        experiment_main(sim_config=population_size_to_config[population_size](),
                         sim_opts=SimulationSettings(),
                         data_saver=data_saver,
                         num_random_seeds=eval_opts.num_seeds,
+                        lockstep=eval_opts.lockstep_seeds,
                         max_episode_length=eval_opts.max_episode_length,
                         exp_id=i)
@@ -1,4 +1,5 @@
 
+import dataclasses
 from typing import List, Optional, Sequence, Union
 
 import numpy as np
@@ -7,7 +8,7 @@ from tqdm import trange
 from .covid_regulations import ukraine_regulations
 from ..data.interfaces import ExperimentDataSaver, StageSchedule
 from ..environment import SimulationSettings, SimulationConfigs, NoPandemicDone, ChosenRegulation, init_globals, \
-    GymEnvironment
+    GymEnvironment, PandemicObservation, SimulatorEnsemble
 from ..utils import shallow_asdict
 
 
@@ -69,7 +70,20 @@ def experiment_main(exp_id: int,
                     stages_to_execute: Union[int, Sequence[StageSchedule]] = 0,
                     enable_warm_up: bool = False,
                     max_episode_length: int = 120,
-                    num_random_seeds: int = 5) -> None:
+                    num_random_seeds: int = 5,
+                    lockstep: bool = False) -> None:
+    if lockstep:
+        ensemble_experiment_main(exp_id=exp_id,
+                                 sim_opts=sim_opts,
+                                 sim_config=sim_config,
+                                 data_saver=data_saver,
+                                 pandemic_regulations=pandemic_regulations,
+                                 stages_to_execute=stages_to_execute,
+                                 enable_warm_up=enable_warm_up,
+                                 max_episode_length=max_episode_length,
+                                 num_random_seeds=num_random_seeds)
+        return
+
     rng = np.random.RandomState(seed=0)
     num_evaluated_seeds = 0
     while num_evaluated_seeds < num_random_seeds:
@@ -88,3 +102,117 @@ def experiment_main(exp_id: int,
             num_evaluated_seeds += 1
         else:
             print(f'Experiment with seed {seed} did not succeed. Skipping...')
+
+
+def seeded_ensemble_experiment_main(exp_id: int,
+                                    sim_config: SimulationConfigs,
+                                    sim_opts: SimulationSettings,
+                                    data_saver: ExperimentDataSaver,
+                                    pandemic_regulations: Optional[List[ChosenRegulation]] = None,
+                                    stages_to_execute: Union[int, Sequence[StageSchedule]] = 0,
+                                    enable_warm_up: bool = False,
+                                    max_episode_length: int = 120,
+                                    random_seeds: Sequence[int] = (0,)) -> int:
+    """
+    Run one replicate per seed, as seeded_experiment_main would, but step the replicates in lockstep as a
+    SimulatorEnsemble. Each replicate builds its own population from its seed, the infection updates and the testing
+    of all replicates are drawn from a random state of the ensemble that is seeded with all seeds. Every replicate is
+    saved as its own trial if it passes the data saver's checks. A trial records the seed of its replicate as seed, the
+    seeds of the ensemble as ensemble_seeds and its position in the ensemble as replicate.
+
+    :return: the number of saved replicates
+    """
+    sim_opts = dataclasses.replace(sim_opts, use_population_store=True)
+    envs = []
+    for seed in random_seeds:
+        init_globals(seed=seed)
+        env = GymEnvironment.from_config(sim_config=sim_config,
+                                         sim_opts=sim_opts,
+                                         pandemic_regulations=pandemic_regulations or ukraine_regulations,
+                                         done_fn=NoPandemicDone(30))
+        env.reset()
+        envs.append(env)
+    ensemble = SimulatorEnsemble([env.pandemic_sim for env in envs], np.random.RandomState(list(random_seeds)))
+
+    stages = ([StageSchedule(stage=stages_to_execute, end_day=None)]
+              if isinstance(stages_to_execute, int) else stages_to_execute)
+
+    stage_dict = {f'stage_{i}': (s.stage, s.end_day if s.end_day is not None else -1)
+                  for i, s in enumerate(stages)}
+
+    observations: List[List[PandemicObservation]] = [[e.observation] for e in envs]
+    rewards: List[List[float]] = [[] for _ in envs]
+    stage_idx = [0] * len(envs)
+    warm_up_done = [not enable_warm_up] * len(envs)
+    done = [False] * len(envs)
+    for i in trange(max_episode_length, desc='Simulating day'):
+        actions: List[Optional[int]] = []
+        for k, e in enumerate(envs):
+            if done[k]:
+                actions.append(None)
+                continue
+
+            if not e.observation.infection_above_threshold and not warm_up_done[k]:
+                stage = 0
+            else:
+                warm_up_done[k] = True
+                cur_stage = stages[stage_idx[k]]
+                stage = cur_stage.stage
+                if cur_stage.end_day is not None and cur_stage.end_day <= i:
+                    stage_idx[k] += 1
+            actions.append(stage)
+
+        for k, result in enumerate(GymEnvironment.step_ensemble(envs, ensemble, actions)):
+            if result is not None:
+                obs, reward, done[k], aux = result
+                observations[k].append(obs)
+                rewards[k].append(reward)
+        if all(done):
+            break
+
+    num_saved = 0
+    for k, seed in enumerate(random_seeds):
+        data_saver.begin(observations[k][0])
+        for obs, reward in zip(observations[k][1:], rewards[k]):
+            data_saver.record(obs, reward)
+        num_saved += data_saver.finalize(exp_id=exp_id,
+                                         seed=seed,
+                                         ensemble_seeds=np.asarray(random_seeds),
+                                         replicate=k,
+                                         num_stages_to_execute=len(stages),
+                                         num_persons=sim_config.num_persons,
+                                         **stage_dict,
+                                         **shallow_asdict(sim_opts))
+    return num_saved
+
+
+def ensemble_experiment_main(exp_id: int,
+                             sim_opts: SimulationSettings,
+                             sim_config: SimulationConfigs,
+                             data_saver: ExperimentDataSaver,
+                             pandemic_regulations: Optional[List[ChosenRegulation]] = None,
+                             stages_to_execute: Union[int, Sequence[StageSchedule]] = 0,
+                             enable_warm_up: bool = False,
+                             max_episode_length: int = 120,
+                             num_random_seeds: int = 5) -> None:
+    """
+    Like experiment_main, but the seeds are run as the replicates of a SimulatorEnsemble that are stepped in lockstep.
+    Seeds whose replicate is not saved are replaced by another ensemble.
+    """
+    rng = np.random.RandomState(seed=0)
+    num_evaluated_seeds = 0
+    while num_evaluated_seeds < num_random_seeds:
+        seeds = rng.randint(0, 100000, num_random_seeds - num_evaluated_seeds).tolist()
+        print(f'Running experiment seeds: {seeds} - {num_evaluated_seeds + len(seeds)}/{num_random_seeds}')
+        num_saved = seeded_ensemble_experiment_main(exp_id=exp_id,
+                                                    sim_config=sim_config,
+                                                    sim_opts=sim_opts,
+                                                    data_saver=data_saver,
+                                                    pandemic_regulations=pandemic_regulations,
+                                                    stages_to_execute=stages_to_execute,
+                                                    enable_warm_up=enable_warm_up,
+                                                    max_episode_length=max_episode_length,
+                                                    random_seeds=seeds)
+        if num_saved < len(seeds):
+            print(f'{len(seeds) - num_saved} of the experiment seeds did not succeed. Replacing them...')
+        num_evaluated_seeds += num_saved
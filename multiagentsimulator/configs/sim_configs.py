@@ -1,5 +1,6 @@
+from typing import Any, Optional
+
 from .person_routines import DefaultPersonRoutineAssignment
-from ..data.city_buildings.city import City
 from ..environment import Home, Store, Office, School, Hospital, University, Restaurant, \
     SimulationConfigs, LocationConfigs
 
@@ -31,6 +32,9 @@ small_town_config = SimulationConfigs(
 
 
 def get_kyiv_configs():
+    # osmnx and folium are only needed for map based configs
+    from ..data.city_buildings.city import City
+
     city = City(distance=5000)
     buildings = city.get_classified_buildings_in_distance()
     homes = buildings["Home"]
@@ -57,6 +61,9 @@ def get_kyiv_configs():
     ]
 
 
+kyiv_num_persons = 10000
+
+
 class KyivSimConfigs(SimulationConfigs):
     def __init__(self, num_persons, location_configs, person_routine_assignment):
         super().__init__(
@@ -64,12 +71,29 @@ class KyivSimConfigs(SimulationConfigs):
             location_configs=location_configs,
             person_routine_assignment=person_routine_assignment
         )
+        from ..data.city_buildings.city import City
+
         self.city = City(distance=5000)
         self.buildings = self.city.get_classified_buildings_in_distance()
 
 
-kyiv_config = KyivSimConfigs(
-    num_persons=10000,
-    location_configs=get_kyiv_configs(),
-    person_routine_assignment=DefaultPersonRoutineAssignment())
+_kyiv_config: Optional[KyivSimConfigs] = None
+
+
+def get_kyiv_config() -> KyivSimConfigs:
+    """Return the Kyiv config. It is built on the first call, from buildings that are fetched once and then cached."""
+    global _kyiv_config
+    if _kyiv_config is None:
+        _kyiv_config = KyivSimConfigs(
+            num_persons=kyiv_num_persons,
+            location_configs=get_kyiv_configs(),
+            person_routine_assignment=DefaultPersonRoutineAssignment())
+    return _kyiv_config
+
+
+def __getattr__(name: str) -> Any:
+    # kyiv_config needs the city's buildings, so it is only built when it is accessed
+    if name == 'kyiv_config':
+        return get_kyiv_config()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
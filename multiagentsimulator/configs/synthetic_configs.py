@@ -0,0 +1,120 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Sequence, Tuple, Type, TYPE_CHECKING
+
+import numpy as np
+
+from .person_routines import DefaultPersonRoutineAssignment
+from ..environment import BaseLocation, Home, Store, Office, School, Hospital, University, Restaurant, \
+    SimulationConfigs, LocationConfigs
+
+if TYPE_CHECKING:
+    from geopandas import GeoDataFrame
+
+
+@dataclass(frozen=True)
+class SyntheticLocationType:
+    """How a location type scales with the population of a synthetic city."""
+
+    location_type: Type[BaseLocation]
+
+    persons_per_location: float
+    """Mean number of residents of the city per location of this type"""
+
+    num_assignees: int = -1
+
+    state_opts: Dict[str, Any] = field(default_factory=dict)
+
+    footprint: Tuple[float, float] = (10., 10.)
+    """Width and height of the building in meters, used for synthetic positions"""
+
+
+# densities of the small and medium town configs, with households of the mean size of Ukraine
+default_synthetic_location_types: Sequence[SyntheticLocationType] = (
+    SyntheticLocationType(Home, persons_per_location=2.6, footprint=(12., 10.)),
+    SyntheticLocationType(Store, persons_per_location=250., num_assignees=5,
+                          state_opts=dict(visitor_capacity=30), footprint=(30., 20.)),
+    SyntheticLocationType(Office, persons_per_location=200., num_assignees=150,
+                          state_opts=dict(visitor_capacity=0), footprint=(40., 30.)),
+    SyntheticLocationType(School, persons_per_location=100., num_assignees=4,
+                          state_opts=dict(visitor_capacity=30), footprint=(60., 40.)),
+    SyntheticLocationType(Hospital, persons_per_location=1000., num_assignees=30,
+                          state_opts=dict(patient_capacity=10), footprint=(80., 60.)),
+    SyntheticLocationType(University, persons_per_location=250., num_assignees=3,
+                          state_opts=dict(visitor_capacity=5), footprint=(100., 60.)),
+    SyntheticLocationType(Restaurant, persons_per_location=500., num_assignees=6,
+                          state_opts=dict(visitor_capacity=30), footprint=(15., 15.)),
+)
+
+_METERS_PER_DEGREE_LAT = 111320.
+
+
+def synthetic_positions(num: int,
+                        footprint: Tuple[float, float],
+                        radius: float,
+                        center: Tuple[float, float],
+                        numpy_rng: np.random.RandomState) -> 'GeoDataFrame':
+    """
+    Generate rectangular building footprints at uniformly random spots of a circular city.
+
+    :param num: number of buildings
+    :param footprint: width and height of the buildings in meters
+    :param radius: radius of the city in meters
+    :param center: latitude and longitude of the city center
+    :param numpy_rng: random state to draw the spots from
+    :return: a GeoDataFrame with one polygon per building in the geometry column, in WGS84 coordinates
+    """
+    import shapely
+    from geopandas import GeoDataFrame
+
+    lat, lng = center
+    meters_per_degree_lng = _METERS_PER_DEGREE_LAT * np.cos(np.radians(lat))
+    distance = radius * np.sqrt(numpy_rng.uniform(size=num))
+    angle = numpy_rng.uniform(0, 2 * np.pi, size=num)
+    x = lng + distance * np.cos(angle) / meters_per_degree_lng
+    y = lat + distance * np.sin(angle) / _METERS_PER_DEGREE_LAT
+    half_width = footprint[0] / 2 / meters_per_degree_lng
+    half_height = footprint[1] / 2 / _METERS_PER_DEGREE_LAT
+    return GeoDataFrame(geometry=shapely.box(x - half_width, y - half_height, x + half_width, y + half_height),
+                        crs='EPSG:4326')
+
+
+def synthetic_city_config(num_persons: int,
+                          seed: int = 0,
+                          location_types: Sequence[SyntheticLocationType] = default_synthetic_location_types,
+                          spread: float = 0.1,
+                          with_positions: bool = False,
+                          center: Tuple[float, float] = (50.4501, 30.5234),
+                          persons_per_square_km: float = 3500.,
+                          regulation_compliance_prob: float = 0.99) -> SimulationConfigs:
+    """
+    Generate the configs of a synthetic city of the given population, without any map data. The number of locations
+    of each type follows the type's density, scattered by a seeded relative noise. The same arguments always generate
+    the same city.
+
+    :param num_persons: number of persons in the city
+    :param seed: seed of the generator
+    :param location_types: the location types of the city and their densities
+    :param spread: standard deviation of the relative noise of the location counts
+    :param with_positions: if True, give every location a synthetic building footprint for map mode
+    :param center: latitude and longitude of the city center, used for positions
+    :param persons_per_square_km: population density of the city, used for positions
+    :param regulation_compliance_prob: probability that persons comply with regulations
+    :return: SimulationConfigs instance
+    """
+    numpy_rng = np.random.RandomState(seed)
+    nums = [max(1, int(round(num_persons / loc_type.persons_per_location * max(0., numpy_rng.normal(1., spread)))))
+            for loc_type in location_types]
+
+    # positions are drawn after the counts, so that the counts do not depend on with_positions
+    radius = np.sqrt(num_persons / persons_per_square_km / np.pi) * 1000.
+    location_configs = [
+        LocationConfigs(loc_type.location_type, num=num, num_assignees=loc_type.num_assignees,
+                        state_opts=dict(loc_type.state_opts),
+                        positions=(synthetic_positions(num, loc_type.footprint, radius, center, numpy_rng)
+                                   if with_positions else []))
+        for loc_type, num in zip(location_types, nums)]
+
+    return SimulationConfigs(num_persons=num_persons,
+                             location_configs=location_configs,
+                             regulation_compliance_prob=regulation_compliance_prob,
+                             person_routine_assignment=DefaultPersonRoutineAssignment())
@@ -1,52 +1,103 @@
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, List, Optional
+
 import osmnx as ox
 from folium import folium
+from geopandas import GeoDataFrame
 
 from shapely.geometry import Point
 
+# building tags of OSM that make up each location type
+BUILDING_CLASSES: Dict[str, List[str]] = {
+    "University": ['university', 'college', 'collage'],
+    "Office": ['office'],
+    "Restaurant": ['commercial'],
+    "School": ['school'],
+    "Hospital": ['hospital', 'clinic'],
+    "Store": ['supermarket', 'shop', 'mall'],
+    "Home": [
+        'house',
+        'apartments',
+        'semidetached_house',
+        'allotment_house',
+        'warehouse',
+    ],
+}
+
+DEFAULT_CACHE_DIR = Path(os.environ.get('MULTIAGENTSIMULATOR_CACHE_DIR',
+                                        Path.home() / '.cache' / 'multiagentsimulator')) / 'city_buildings'
+
+# classified buildings that were already loaded in this process, keyed by cache file
+_loaded_buildings: Dict[Path, Dict[str, GeoDataFrame]] = {}
+
+
 class City:
     def __init__(
             self,
             lat=None,
             lng=None,
             distance=None,
+            cache_dir: Optional[Path] = None,
     ):
+        """
+        :param lat: latitude of the city center
+        :param lng: longitude of the city center
+        :param distance: distance in meters from the center within which buildings are part of the city
+        :param cache_dir: directory of the on-disk cache of classified buildings, DEFAULT_CACHE_DIR by default
+        """
         self.lat = 50.4501 if lat is None else lat
         self.lng = 30.5234 if lng is None else lng
         self.distance = 2000 if distance is None else distance
+        self.cache_dir = DEFAULT_CACHE_DIR if cache_dir is None else Path(cache_dir)
 
-    def get_classified_buildings_in_distance(self):
-        all_buildings = ox.geometries_from_point(
+    @property
+    def cache_path(self) -> Path:
+        """Cache file of the classified buildings, keyed on the center, the distance and the building tags"""
+        key = json.dumps([self.lat, self.lng, self.distance, BUILDING_CLASSES], sort_keys=True)
+        return self.cache_dir / f'{hashlib.sha1(key.encode()).hexdigest()}.pkl'
+
+    def get_classified_buildings_in_distance(self, use_cache: bool = True) -> Dict[str, GeoDataFrame]:
+        """
+        Return the buildings of the city classified by location type. The buildings are fetched from OSM once and then
+        loaded from the on-disk cache.
+
+        :param use_cache: if False, fetch the buildings from OSM and refresh the cache
+        :return: a dict from location type names to GeoDataFrames of buildings
+        """
+        path = self.cache_path
+        if use_cache:
+            if path in _loaded_buildings:
+                return _loaded_buildings[path]
+            if path.exists():
+                with open(path, 'rb') as f:
+                    _loaded_buildings[path] = pickle.load(f)
+                return _loaded_buildings[path]
+
+        # osmnx renamed geometries to features in 1.3 and dropped the old name in 2.0
+        features_from_point = getattr(ox, 'features_from_point', None) or ox.geometries_from_point
+        all_buildings = features_from_point(
             (self.lat, self.lng),
             tags={'building': True},
             dist=self.distance
         )
         all_buildings = all_buildings[~all_buildings['geometry'].apply(lambda geom: isinstance(geom, Point))]
         classified_building = {
-            "University": all_buildings[
-                all_buildings['building'].isin(['university', 'college', 'collage'])
-            ],
-            "Office": all_buildings[
-                all_buildings['building'].isin(['office'])
-            ],
-            "Restaurant": all_buildings[
-                all_buildings['building'].isin(['commercial'])
-            ],
-            "School": all_buildings[
-                all_buildings['building'].isin(['school'])
-            ],
-            "Hospital": all_buildings[all_buildings['building'].isin(['hospital', 'clinic'])],
-            "Store": all_buildings[all_buildings['building'].isin(['supermarket','shop','mall'])],
-            "Home":all_buildings[all_buildings['building'].isin([
-                'house',
-                'apartments',
-                'semidetached_house',
-                'allotment_house',
-                'warehouse',
-            ])],
+            name: all_buildings[all_buildings['building'].isin(tags)] for name, tags in BUILDING_CLASSES.items()
         }
 
+        # write to a temporary file first, so that concurrent readers never see a partial cache file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(classified_building, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        _loaded_buildings[path] = classified_building
+
         return classified_building
 
     def get_map(self, zoom=15):
         return folium.Map(location=[self.lat, self.lng], zoom_start=zoom)
-
@@ -46,7 +46,13 @@ class H5DataSaver(ExperimentDataSaver):
             # skip since infection never went about threshold
             return False
 
-        g = self._f.create_group(time.strftime('%Y-%m-%dT%H:%M:%SZ'))
+        timestamp = name = time.strftime('%Y-%m-%dT%H:%M:%SZ')
+        # several trials can be saved within a second, e.g. the replicates of a lockstep experiment
+        i = 1
+        while name in self._f:
+            i += 1
+            name = f'{timestamp}_{i}'
+        g = self._f.create_group(name)
 
         g.attrs.update(**kwargs)
         obs = g.create_group('observation')
@@ -1,6 +1,7 @@
-from structlog import BoundLogger
+from typing import TYPE_CHECKING
 
 from .city_registry import *
+from .contact_log import *
 from .trace_contacts import *
 from .finish import *
 from .model import *
@@ -9,17 +10,27 @@ from .job_recruiter import *
 from .location import *
 from .generate_population import *
 from .simulation_environment import *
+from .simulation_summary import *
 from .simulator import *
 from .pandemic_testing_strategies import *
+from .population_store import *
+from .random_streams import *
+from .routine_scheduler import *
 from .person import *
 from .reward import *
 from .simulator_config import *
+from .simulator_ensemble import *
 from .simulator_settings import *
+from .simulator_snapshot import *
+from .step_profiler import *
+
+if TYPE_CHECKING:
+    from structlog import BoundLogger
 
 
 def init_globals(registry: Optional[Registry] = None,
                  seed: Optional[int] = None,
-                 log: Optional[BoundLogger] = None) -> None:
+                 log: Optional['BoundLogger'] = None) -> None:
     """
     Initialize globals for the simulator
 
@@ -1,11 +1,11 @@
-import dataclasses
-from typing import Dict, List, Optional, cast, Set, Type, Mapping, Tuple, Union
+from copy import copy
+from typing import Collection, Dict, List, Optional, cast, Set, Type, Mapping, Tuple, Union
 
 from cachetools import cached
 
 from .interfaces import LocationID, Location, PersonID, Person, Registry, RegistrationError, InfectionSummary, \
     IndividualInfectionState, BusinessLocationState, PandemicTestResult, LocationSummary, SimulationTimeTuple, SimulationTime, \
-    LocationState
+    LocationState, assign_index
 from multiagentsimulator.environment.interfaces.location_base_business import BusinessBaseLocation
 from .location.cemetery import Cemetery
 
@@ -22,12 +22,22 @@ class CityRegistry(Registry):
 
     _quarantined: Set[PersonID]
 
+    # infectious presence, keyed on the dense indices of person and location ids
+    _infectious_person_to_location: Dict[int, int]
+    _location_to_num_infectious: List[int]
+
     _location_ids_with_social_events: List[LocationID]
-    _global_location_summary: Dict[Tuple[str, str], LocationSummary]
     _location_types: Set[str]
-    _person_type_to_count: Dict[str, int]
+
+    # global location summary counters, indexed by location type code and person type code
+    _location_type_codes: Dict[type, int]
+    _person_type_codes: Dict[type, int]
+    _person_type_counts: List[int]
+    _entry_counts: List[List[int]]
+    _visitor_counts: List[List[int]]
 
     IGNORE_LOCS_SUMMARY: Set[Type] = {Cemetery}
+    INFECTIOUS_SUMMARIES: Set[InfectionSummary] = {InfectionSummary.INFECTED, InfectionSummary.CRITICAL}
 
     def __init__(self) -> None:
         self._location_register = {}
@@ -38,20 +48,33 @@ class CityRegistry(Registry):
         self._person_ids = set()
 
         self._quarantined = set()
-        self._global_location_summary = dict()
+        self._infectious_person_to_location = dict()
+        self._location_to_num_infectious = []
         self._location_types = set()
-        self._person_type_to_count = dict()
+
+        self._location_type_codes = dict()
+        self._person_type_codes = dict()
+        self._person_type_counts = []
+        self._entry_counts = []
+        self._visitor_counts = []
 
     def register_location(self, location: Location) -> None:
         if location.id in self._location_register:
             raise RegistrationError(f'Location {location.id.name} is already registered.')
+        assign_index(location.id, len(self._location_register))
         self._location_register[location.id] = location
+        self._location_to_num_infectious.append(0)
         self._location_ids.add(location.id)
         if isinstance(location.state, BusinessLocationState):
             self._business_location_ids.add(location.id)
 
-        if type(location) not in self.IGNORE_LOCS_SUMMARY:
-            self._location_types.add(type(location).__name__)
+        location_type = type(location)
+        if location_type not in self.IGNORE_LOCS_SUMMARY:
+            self._location_types.add(location_type.__name__)
+            if location_type not in self._location_type_codes:
+                self._location_type_codes[location_type] = len(self._location_type_codes)
+                self._entry_counts.append([0] * len(self._person_type_codes))
+                self._visitor_counts.append([0] * len(self._person_type_codes))
 
     def register_person(self, person: Person) -> None:
         if person.id in self._person_register:
@@ -76,19 +99,23 @@ class CityRegistry(Registry):
                                         'claimed current location.')
 
         # everything checks out, register the person
+        assign_index(person.id, len(self._person_register))
         for loc in assigned_locations:
             loc.assign_person(person.id)
         current_location.add_person_to_location(person.id)
         self._person_register[person.id] = person
         self._person_ids.add(person.id)
-
-        # init entry in global_location_summary
-        person_type = type(person).__name__
-        if person_type not in self._person_type_to_count:
-            self._person_type_to_count[person_type] = 0
-            for loc_type in self._location_types:
-                self._global_location_summary[(loc_type, person_type)] = LocationSummary()
-        self._person_type_to_count[person_type] += 1
+        self.update_infectious_presence(person.id)
+
+        # init the counters of the global location summary
+        person_type = type(person)
+        if person_type not in self._person_type_codes:
+            self._person_type_codes[person_type] = len(self._person_type_codes)
+            self._person_type_counts.append(0)
+            for entry_counts, visitor_counts in zip(self._entry_counts, self._visitor_counts):
+                entry_counts.append(0)
+                visitor_counts.append(0)
+        self._person_type_counts[self._person_type_codes[person_type]] += 1
 
     def register_person_entry_in_location(self, person_id: PersonID, location_id: LocationID) -> bool:
         person = self._person_register[person_id]
@@ -104,19 +131,20 @@ class CityRegistry(Registry):
         next_location.add_person_to_location(person_id)  # enter next
         person.state.current_location = next_location.id  # update person state
 
-        # update global location summary
-        if type(next_location) not in self.IGNORE_LOCS_SUMMARY:
-            location_type = type(next_location).__name__
-            person_type = type(person).__name__
-            key = (location_type, person_type)
-            summary = self._global_location_summary[key]
-            is_visitor = person_id not in next_location.state.assignees
-            person_cnt = self._person_type_to_count[person_type]
-            self._global_location_summary[key] = dataclasses.replace(
-                summary,
-                entry_count=(person_cnt * summary.entry_count + 1) / person_cnt,
-                visitor_count=(person_cnt * summary.visitor_count + is_visitor) / person_cnt
-            )
+        # move the person in the infectious presence index
+        prev_location_index = self._infectious_person_to_location.get(person_id.index)
+        if prev_location_index is not None:
+            self._location_to_num_infectious[prev_location_index] -= 1
+            self._location_to_num_infectious[next_location.id.index] += 1
+            self._infectious_person_to_location[person_id.index] = next_location.id.index
+
+        # update global location summary counters
+        location_code = self._location_type_codes.get(type(next_location))
+        if location_code is not None:
+            person_code = self._person_type_codes[type(person)]
+            self._entry_counts[location_code][person_code] += 1
+            if person_id not in next_location.state.assignees:
+                self._visitor_counts[location_code][person_code] += 1
         return True
 
     def update_location_specific_information(self) -> None:
@@ -128,6 +156,56 @@ class CityRegistry(Registry):
         for loc in assigned_locations:
             loc.assign_person(person.id)
 
+    def update_infectious_presence(self, person_id: PersonID) -> None:
+        person = self._person_register[person_id]
+        infection_state = person.state.infection_state
+        is_infectious = infection_state is not None and infection_state.summary in self.INFECTIOUS_SUMMARIES
+
+        location_index = person.state.current_location.index
+        prev_location_index = self._infectious_person_to_location.get(person_id.index)
+        if prev_location_index is not None:
+            if is_infectious and prev_location_index == location_index:
+                return
+            del self._infectious_person_to_location[person_id.index]
+            self._location_to_num_infectious[prev_location_index] -= 1
+
+        if is_infectious:
+            self._infectious_person_to_location[person_id.index] = location_index
+            self._location_to_num_infectious[location_index] += 1
+
+    def update_global_location_summary(self, summary: Mapping[Tuple[str, str], LocationSummary]) -> None:
+        location_codes = {t.__name__: code for t, code in self._location_type_codes.items()}
+        person_codes = {t.__name__: code for t, code in self._person_type_codes.items()}
+        for (location_type, person_type), location_summary in summary.items():
+            location_code = location_codes[location_type]
+            person_code = person_codes[person_type]
+            person_cnt = self._person_type_counts[person_code]
+            self._entry_counts[location_code][person_code] = round(location_summary.entry_count * person_cnt)
+            self._visitor_counts[location_code][person_code] = round(location_summary.visitor_count * person_cnt)
+
+    def fork(self, location_register: Dict[LocationID, Location],
+             person_register: Dict[PersonID, Person]) -> 'CityRegistry':
+        registry = copy(self)
+        registry._location_register = location_register
+        registry._person_register = person_register
+
+        registry._location_ids = set(self._location_ids)
+        registry._business_location_ids = set(self._business_location_ids)
+        registry._person_ids = set(self._person_ids)
+
+        registry._quarantined = set(self._quarantined)
+        registry._infectious_person_to_location = dict(self._infectious_person_to_location)
+        registry._location_to_num_infectious = list(self._location_to_num_infectious)
+        if hasattr(self, '_location_ids_with_social_events'):
+            registry._location_ids_with_social_events = list(self._location_ids_with_social_events)
+        registry._location_types = set(self._location_types)
+        registry._location_type_codes = dict(self._location_type_codes)
+        registry._person_type_codes = dict(self._person_type_codes)
+        registry._person_type_counts = list(self._person_type_counts)
+        registry._entry_counts = [list(counts) for counts in self._entry_counts]
+        registry._visitor_counts = [list(counts) for counts in self._visitor_counts]
+        return registry
+
     # ----------------public attributes-----------------
 
     @property
@@ -148,7 +226,15 @@ class CityRegistry(Registry):
 
     @property
     def global_location_summary(self) -> Mapping[Tuple[str, str], LocationSummary]:
-        return self._global_location_summary
+        # mean number of entries and visits per person, built from the counters on access
+        summary = {}
+        for location_type, location_code in self._location_type_codes.items():
+            for person_type, person_code in self._person_type_codes.items():
+                person_cnt = self._person_type_counts[person_code]
+                summary[(location_type.__name__, person_type.__name__)] = LocationSummary(
+                    entry_count=self._entry_counts[location_code][person_code] / person_cnt,
+                    visitor_count=self._visitor_counts[location_code][person_code] / person_cnt)
+        return summary
 
     # ----------------location utility methods-----------------
 
@@ -159,6 +245,12 @@ class CityRegistry(Registry):
     def get_persons_in_location(self, location_id: LocationID) -> Set[PersonID]:
         return cast(LocationState, self._location_register[location_id].state).persons_in_location
 
+    def num_infectious_in_location(self, location_id: LocationID) -> int:
+        return self._location_to_num_infectious[location_id.index]
+
+    def infectious_person_indices(self) -> Collection[int]:
+        return self._infectious_person_to_location.keys()
+
     def location_id_to_type(self, location_id: LocationID) -> Type:
         return type(self._location_register[location_id])
 
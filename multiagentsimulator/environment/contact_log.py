@@ -0,0 +1,212 @@
+from dataclasses import dataclass
+from os import PathLike
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import h5py as h5
+import numpy as np
+
+_COLUMNS = ('tick', 'location', 'person1', 'person2')
+
+
+class ContactLog:
+    """An appendable HDF5 log of the sampled contacts of a simulation run.
+
+    Every contact is a row of four int32 columns: the tick, the dense index of the location and the dense indices of
+    the two persons. Rows are buffered in arrays and written in chunks to resizable compressed datasets. The file also
+    holds a tick index, the first row of every logged tick, so that readers can load the contacts of a time range
+    without reading the whole log. Ticks must not decrease, so a log holds a single run.
+    """
+
+    _f: h5.File
+    _chunk_size: int
+    _buffer: np.ndarray
+    _size: int
+    _num_written: int
+    _last_tick: int
+    _index_ticks: List[int]
+    _index_rows: List[int]
+
+    def __init__(self, filename: Union[str, PathLike], chunk_size: int = 1 << 16,
+                 compression: Optional[str] = 'gzip'):
+        """
+        :param filename: path of the HDF5 file, an existing log is appended to
+        :param chunk_size: number of rows of a chunk of the datasets and of the write buffer
+        :param compression: h5py compression filter of the datasets, None to store them uncompressed
+        """
+        self._f = h5.File(filename, mode='a')
+        self._chunk_size = chunk_size
+        for name in _COLUMNS:
+            if name not in self._f:
+                self._f.create_dataset(name, shape=(0,), maxshape=(None,), dtype=np.int32, chunks=(chunk_size,),
+                                       compression=compression, shuffle=compression is not None)
+        for name in ('index/tick', 'index/row'):
+            if name not in self._f:
+                self._f.create_dataset(name, shape=(0,), maxshape=(None,), dtype=np.int64, chunks=(1024,))
+
+        self._buffer = np.empty((len(_COLUMNS), chunk_size), dtype=np.int32)
+        self._size = 0
+        self._num_written = len(self._f['tick'])
+        ticks = self._f['index/tick']
+        self._last_tick = int(ticks[-1]) if len(ticks) else -1
+        self._index_ticks = []
+        self._index_rows = []
+
+    @property
+    def num_contacts(self) -> int:
+        """Number of logged contacts, including those that are still buffered"""
+        return self._num_written + self._size
+
+    def append(self, tick: int, location: int, person1: np.ndarray, person2: np.ndarray) -> None:
+        """
+        Log the contacts of a location in a tick.
+
+        :param tick: current tick
+        :param location: dense index of the location
+        :param person1: dense indices of the first persons of the contacts
+        :param person2: dense indices of the second persons of the contacts
+        """
+        if tick != self._last_tick:
+            assert tick > self._last_tick, 'Ticks of a contact log must not decrease, use a new log for every run.'
+            self._index_ticks.append(tick)
+            self._index_rows.append(self.num_contacts)
+            self._last_tick = tick
+
+        start = 0
+        num_rows = len(person1)
+        while start < num_rows:
+            n = min(num_rows - start, self._chunk_size - self._size)
+            rows = slice(self._size, self._size + n)
+            self._buffer[0, rows] = tick
+            self._buffer[1, rows] = location
+            self._buffer[2, rows] = person1[start:start + n]
+            self._buffer[3, rows] = person2[start:start + n]
+            self._size += n
+            start += n
+            if self._size == self._chunk_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered contacts and the tick index to the file."""
+        if self._size:
+            end = self._num_written + self._size
+            for i, name in enumerate(_COLUMNS):
+                dataset = self._f[name]
+                dataset.resize((end,))
+                dataset[self._num_written:end] = self._buffer[i, :self._size]
+            self._num_written = end
+            self._size = 0
+        if self._index_ticks:
+            for name, values in (('index/tick', self._index_ticks), ('index/row', self._index_rows)):
+                dataset = self._f[name]
+                start = len(dataset)
+                dataset.resize((start + len(values),))
+                dataset[start:] = values
+            self._index_ticks = []
+            self._index_rows = []
+        self._f.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._f.close()
+
+    def __enter__(self) -> 'ContactLog':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+@dataclass(frozen=True)
+class ContactGraph:
+    """A weighted contact graph, as an edge list of unordered person pairs."""
+
+    person1: np.ndarray
+    """Dense indices of the first persons of the edges, always smaller than those of the second persons"""
+
+    person2: np.ndarray
+
+    weight: np.ndarray
+    """Number of contacts of each pair, one per location and tick in which the pair was in contact"""
+
+    def to_networkx(self) -> Any:
+        """Return the graph as a networkx Graph with the weights as edge attribute weight."""
+        import networkx as nx
+
+        graph = nx.Graph()
+        graph.add_weighted_edges_from(zip(self.person1.tolist(), self.person2.tolist(), self.weight.tolist()))
+        return graph
+
+
+class ContactLogReader:
+    """Reads the contacts of a ContactLog file. Only the chunks of the requested ticks are read from the file."""
+
+    _f: h5.File
+    _index_ticks: np.ndarray
+    _index_rows: np.ndarray
+
+    def __init__(self, filename: Union[str, PathLike]):
+        """
+        :param filename: path of the HDF5 file of a ContactLog
+        """
+        self._f = h5.File(filename, mode='r')
+        self._index_ticks = self._f['index/tick'][:]
+        self._index_rows = np.append(self._f['index/row'][:], len(self._f['tick']))
+
+    @property
+    def num_contacts(self) -> int:
+        return len(self._f['tick'])
+
+    @property
+    def ticks(self) -> np.ndarray:
+        """The logged ticks in increasing order"""
+        return self._index_ticks
+
+    def contacts(self, start_tick: int, end_tick: int) -> Dict[str, np.ndarray]:
+        """
+        Return the contacts of the ticks in [start_tick, end_tick).
+
+        :param start_tick: first tick
+        :param end_tick: tick after the last tick
+        :return: a dict from the column names tick, location, person1 and person2 to arrays
+        """
+        start, end = np.searchsorted(self._index_ticks, [start_tick, end_tick])
+        rows = slice(int(self._index_rows[start]), int(self._index_rows[end]))
+        return {name: self._f[name][rows] for name in _COLUMNS}
+
+    def contact_graph(self, start_tick: int, end_tick: int) -> ContactGraph:
+        """
+        Return the weighted contact graph of the ticks in [start_tick, end_tick).
+
+        :param start_tick: first tick
+        :param end_tick: tick after the last tick
+        :return: ContactGraph instance
+        """
+        contacts = self.contacts(start_tick, end_tick)
+        person1 = contacts['person1'].astype(np.int64)
+        person2 = contacts['person2'].astype(np.int64)
+        keys = (np.minimum(person1, person2) << 32) | np.maximum(person1, person2)
+        pairs, weight = np.unique(keys, return_counts=True)
+        return ContactGraph(person1=(pairs >> 32).astype(np.int32), person2=(pairs & 0xffffffff).astype(np.int32),
+                            weight=weight)
+
+    def daily_contact_graphs(self, hours_per_day: int = 24) -> Iterator[ContactGraph]:
+        """
+        Yield the weighted contact graph of every day from the first to the last logged day. Each graph is read from
+        the file only when it is requested.
+
+        :param hours_per_day: number of ticks of a day
+        :return: an iterator of ContactGraph instances
+        """
+        if len(self._index_ticks) == 0:
+            return
+        for day in range(self._index_ticks[0] // hours_per_day, self._index_ticks[-1] // hours_per_day + 1):
+            yield self.contact_graph(day * hours_per_day, (day + 1) * hours_per_day)
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> 'ContactLogReader':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
@@ -1,12 +1,67 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+
+class _DenseID:
+    """Ids are immutable and hashed constantly, so their hash is computed once and copies of an id are the id itself.
+
+    The registry assigns every id a dense index at registration, in the order of registration. Internal structures of
+    the simulator key on these indices, while the ids remain the external handles of persons and locations.
+    """
+
+    index: int
+    _hash: int
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # str hashes differ between processes, so the hash is recomputed when unpickling
+        state = dict(self.__dict__)
+        del state['_hash']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.__post_init__()
+
+    def __post_init__(self) -> None:
+        pass
+
+    def __copy__(self) -> Any:
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Any:
+        return self
 
 
 @dataclass(frozen=True)
-class LocationID:
+class LocationID(_DenseID):
     name: str
 
+    index: int = field(default=-1, init=False, compare=False, repr=False)
+    """Dense index of the location in the registry, -1 if the location is not registered"""
+
+    __hash__ = _DenseID.__hash__
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, '_hash', hash(self.name))
+
 
 @dataclass(frozen=True)
-class PersonID:
+class PersonID(_DenseID):
     name: str
     age: int
+
+    index: int = field(default=-1, init=False, compare=False, repr=False)
+    """Dense index of the person in the registry, -1 if the person is not registered"""
+
+    __hash__ = _DenseID.__hash__
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, '_hash', hash((self.name, self.age)))
+
+
+def assign_index(entity_id: _DenseID, index: int) -> None:
+    """Assign the dense index of an id. Called by the registry at registration."""
+    object.__setattr__(entity_id, 'index', index)
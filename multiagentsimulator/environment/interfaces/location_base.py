@@ -13,9 +13,11 @@ from .location_states import LocationState, ContactRate
 from .pandemic_types import DEFAULT
 from .registry import Registry
 from .simulation_time import SimulationTime, SimulationTimeTuple
+from ...utils import fork_dataclass, shallow_copy
 
 
 _State = TypeVar('_State', bound=LocationState)
+_Location = TypeVar('_Location', bound='BaseLocation')
 
 
 class BaseLocation(Location[_State], metaclass=ABCMeta):
@@ -100,3 +102,18 @@ class BaseLocation(Location[_State], metaclass=ABCMeta):
 
     def reset(self) -> None:
         self._state = deepcopy(self._init_state)
+
+    def fork(self: '_Location', registry: Registry, numpy_rng: np.random.RandomState) -> '_Location':
+        """
+        Return a copy of the location for a forked simulation. The id, init state and position are shared with this
+        location, the state is copied.
+
+        :param registry: registry of the forked simulation
+        :param numpy_rng: random state of the forked simulation
+        :return: a copy of the location
+        """
+        location = shallow_copy(self)
+        location._registry = registry
+        location._numpy_rng = numpy_rng
+        location._state = fork_dataclass(self._state)
+        return location
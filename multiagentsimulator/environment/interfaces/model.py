@@ -2,8 +2,11 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import Enum
-from typing import Optional
+from typing import Dict, Optional, List, Mapping, Sequence
 
+import numpy as np
+
+from ...utils import deepcopy_with_numpy_rng
 
 
 class InfectionSummary(Enum):
@@ -39,6 +42,64 @@ class InfectionModel(ABC):
 
         pass
 
+    def step_states(self, subject_infection_states: Sequence[Optional[IndividualInfectionState]],
+                    subject_ages: np.ndarray, subject_risks: Sequence[Risk],
+                    infection_probabilities: np.ndarray) -> List[IndividualInfectionState]:
+        """
+        Step the infection states of a collection of subjects. The default implementation calls step for each subject
+        in order, models can override it with a vectorized version.
+
+        :param subject_infection_states: current infection states
+        :param subject_ages: ages of the subjects
+        :param subject_risks: risks of the subjects
+        :param infection_probabilities: probability of getting infected for each subject
+        :return: a list of the next infection states
+        """
+        return [self.step(state, int(age), risk, float(prob))
+                for state, age, risk, prob in zip(subject_infection_states, subject_ages, subject_risks,
+                                                  infection_probabilities)]
+
+    def encode_states(self, subject_infection_states: Sequence[Optional[IndividualInfectionState]]
+                      ) -> Dict[str, np.ndarray]:
+        """
+        Encode infection states into flat arrays for simulator snapshots. Models that support snapshots override this
+        method together with decode_states.
+
+        :param subject_infection_states: infection states, None for uninitialized subjects
+        :return: a dict of arrays of length len(subject_infection_states)
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support simulator snapshots, override encode_states '
+                                  f'and decode_states to encode the infection states into columns.')
+
+    def decode_states(self, arrays: Mapping[str, np.ndarray]) -> List[Optional[IndividualInfectionState]]:
+        """
+        Decode infection states encoded with encode_states.
+
+        :param arrays: a dict of arrays returned by encode_states
+        :return: a list of infection states
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support simulator snapshots, override encode_states '
+                                  f'and decode_states to encode the infection states into columns.')
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Return the internal state of the model as a dict of arrays. Stateless models return an empty dict."""
+        return {}
+
+    def restore(self, arrays: Mapping[str, np.ndarray]) -> None:
+        """Restore the internal state of the model from a dict returned by snapshot."""
+        pass
+
+    def fork(self, numpy_rng: np.random.RandomState) -> 'InfectionModel':
+        """
+        Return a copy of the model for a forked simulation. The default implementation deep copies the model and
+        replaces its random state, the _numpy_rng attribute, by numpy_rng. Models can override it to share immutable
+        parameters with the copy.
+
+        :param numpy_rng: random state of the forked simulation
+        :return: InfectionModel instance
+        """
+        return deepcopy_with_numpy_rng(self, numpy_rng)
+
     @abstractmethod
     def needs_contacts(self, subject_infection_state: Optional[IndividualInfectionState]) -> bool:
 
@@ -25,53 +25,79 @@ class PandemicObservation:
     @classmethod
     def create_empty(cls: Type['PandemicObservation'],
                      history_size: int = 1,
-                     num_non_essential_business: Optional[int] = None) -> 'PandemicObservation':
+                     num_non_essential_business: Optional[int] = None,
+                     batch_size: int = 1) -> 'PandemicObservation':
         """
         Creates an empty observation TNC layout array.
 
         :param history_size: Size of history. If set > 1, the observation can hold information from multiple sequences
             of PandemicSimStates.
         :param num_non_essential_business: Number of non essential business locations.
+        :param batch_size: Size of the N dimension, for example the number of replicates of an ensemble.
         :return: an empty PandemicObservation instance
         """
-        return PandemicObservation(global_infection_summary=np.zeros((history_size, 1, len(InfectionSummary))),
-                                   global_testing_summary=np.zeros((history_size, 1, len(InfectionSummary))),
-                                   stage=np.zeros((history_size, 1, 1)),
-                                   infection_above_threshold=np.zeros((history_size, 1, 1)),
-                                   time_day=np.zeros((history_size, 1, 1)),
-                                   unlocked_non_essential_business_locations=np.zeros((history_size, 1,
+        return PandemicObservation(global_infection_summary=np.zeros((history_size, batch_size,
+                                                                      len(InfectionSummary))),
+                                   global_testing_summary=np.zeros((history_size, batch_size, len(InfectionSummary))),
+                                   stage=np.zeros((history_size, batch_size, 1)),
+                                   infection_above_threshold=np.zeros((history_size, batch_size, 1)),
+                                   time_day=np.zeros((history_size, batch_size, 1)),
+                                   unlocked_non_essential_business_locations=np.zeros((history_size, batch_size,
                                                                                        num_non_essential_business))
                                    if num_non_essential_business is not None else None)
 
+    @classmethod
+    def stack(cls: Type['PandemicObservation'],
+              observations: Sequence['PandemicObservation']) -> 'PandemicObservation':
+        """
+        Stack observations along the N dimension, for example the observations of the replicates of an ensemble.
+
+        :param observations: a sequence of PandemicObservation instances with the same history size
+        :return: a PandemicObservation instance
+        """
+        unlocked = [obs.unlocked_non_essential_business_locations for obs in observations]
+        return PandemicObservation(
+            global_infection_summary=np.concatenate([obs.global_infection_summary for obs in observations], axis=1),
+            global_testing_summary=np.concatenate([obs.global_testing_summary for obs in observations], axis=1),
+            stage=np.concatenate([obs.stage for obs in observations], axis=1),
+            infection_above_threshold=np.concatenate([obs.infection_above_threshold for obs in observations], axis=1),
+            time_day=np.concatenate([obs.time_day for obs in observations], axis=1),
+            unlocked_non_essential_business_locations=np.concatenate(unlocked, axis=1)
+            if all(u is not None for u in unlocked) else None)
+
     def update_obs_with_sim_state(self, sim_state: SimulationState,
                                   hist_index: int = 0,
-                                  business_location_ids: Optional[Sequence[LocationID]] = None) -> None:
+                                  business_location_ids: Optional[Sequence[LocationID]] = None,
+                                  batch_index: int = 0) -> None:
         """
         Update the PandemicObservation with the information from PandemicSimState.
 
         :param sim_state: PandemicSimState instance
         :param hist_index: history time index
         :param business_location_ids: business location ids
+        :param batch_index: index in the N dimension
         """
         assert hist_index < self.global_infection_summary.shape[0]
+        assert batch_index < self.global_infection_summary.shape[1]
         if self.unlocked_non_essential_business_locations is not None and business_location_ids is not None:
             unlocked_non_essential_business_locations = np.asarray([int(not cast(NonEssentialBusinessLocationState,
                                                                                  sim_state.id_to_location_state[
                                                                                      loc_id]).locked)
                                                                     for loc_id in business_location_ids])
-            self.unlocked_non_essential_business_locations[hist_index, 0] = unlocked_non_essential_business_locations
+            self.unlocked_non_essential_business_locations[hist_index, batch_index] = \
+                unlocked_non_essential_business_locations
 
         gis = np.asarray([sim_state.global_infection_summary[k] for k in sorted_infection_summary])[None, None, ...]
-        self.global_infection_summary[hist_index, 0] = gis
+        self.global_infection_summary[hist_index, batch_index] = gis
 
         gts = np.asarray([sim_state.global_testing_state.summary[k] for k in sorted_infection_summary])[None, None, ...]
-        self.global_testing_summary[hist_index, 0] = gts
+        self.global_testing_summary[hist_index, batch_index] = gts
 
-        self.stage[hist_index, 0] = sim_state.regulation_stage
+        self.stage[hist_index, batch_index] = sim_state.regulation_stage
 
-        self.infection_above_threshold[hist_index, 0] = int(sim_state.infection_above_threshold)
+        self.infection_above_threshold[hist_index, batch_index] = int(sim_state.infection_above_threshold)
 
-        self.time_day[hist_index, 0] = int(sim_state.sim_time.day)
+        self.time_day[hist_index, batch_index] = int(sim_state.sim_time.day)
 
     @property
     def infection_summary_labels(self) -> Sequence[str]:
@@ -2,6 +2,10 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Dict
 
+import numpy as np
+
+from ...utils import deepcopy_with_numpy_rng
+
 from .pandemic_testing_result import PandemicTestResult
 from .model import InfectionSummary
 from .person import PersonState
@@ -33,3 +37,13 @@ class PandemicTesting(ABC):
         :param person_state: Person's state
         :return: PandemicTestResult instance
         """
+
+    def fork(self, numpy_rng: np.random.RandomState) -> 'PandemicTesting':
+        """
+        Return a copy of the testing strategy for a forked simulation. The default implementation deep copies the
+        strategy and replaces its random state, the _numpy_rng attribute, by numpy_rng.
+
+        :param numpy_rng: random state of the forked simulation
+        :return: PandemicTesting instance
+        """
+        return deepcopy_with_numpy_rng(self, numpy_rng)
@@ -1,7 +1,7 @@
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Optional, Sequence, List, Tuple
+from typing import Optional, Sequence, List
 
 from .trace_contacts import ContactTracer
 from .ids import PersonID, LocationID
@@ -31,7 +31,9 @@ class PersonState:
 
     avoid_location_types: List[type] = field(default_factory=list, init=False)
     not_infection_probability: float = field(default=1., init=False)
-    not_infection_probability_history: List[Tuple[LocationID, float]] = field(default_factory=list, init=False)
+    infection_location: Optional[LocationID] = field(default=None, init=False)
+    """Location that an infection in the current infection update is attributed to. Each contact with an infectious
+    person replaces it with the probability of the contact's share of the infection probability so far."""
 
 
 class Person(ABC):
@@ -1,6 +1,6 @@
 
 from abc import ABC, abstractmethod
-from typing import List, Optional, Set, Mapping, Tuple, Union
+from typing import Collection, Dict, List, Optional, Set, Mapping, Tuple, Union
 
 from .ids import LocationID, PersonID
 from .model import InfectionSummary
@@ -53,6 +53,27 @@ class Registry(ABC):
     def reassign_locations(self, person: Person) -> None:
         """Re-assign locations for the given person."""
 
+    @abstractmethod
+    def update_infectious_presence(self, person_id: PersonID) -> None:
+        """Update the per-location count of infectious persons after the person's infection state has changed."""
+
+    @abstractmethod
+    def update_global_location_summary(self, summary: Mapping[Tuple[str, str], LocationSummary]) -> None:
+        """Overwrite entries of the global location summary, for example when restoring a snapshot."""
+
+    @abstractmethod
+    def fork(self, location_register: Dict[LocationID, Location],
+             person_register: Dict[PersonID, Person]) -> 'Registry':
+        """
+        Return a copy of the registry for a forked simulation. The bookkeeping state is copied and the copy looks up
+        locations and persons in the given registers. The registers may be filled by the caller after this call, as
+        the locations and persons of the fork are bound to the returned registry.
+
+        :param location_register: a dict from location ids to the forked locations
+        :param person_register: a dict from person ids to the forked persons
+        :return: Registry instance
+        """
+
     # ----------------public attributes-----------------
 
     @property
@@ -88,6 +109,14 @@ class Registry(ABC):
     def location_id_to_type(self, location_id: LocationID) -> type:
         """Return the type of location with the given ID."""
 
+    @abstractmethod
+    def num_infectious_in_location(self, location_id: LocationID) -> int:
+        """Return the number of infectious (infected or critical) persons in the given location."""
+
+    @abstractmethod
+    def infectious_person_indices(self) -> Collection[int]:
+        """Return the dense indices of the infectious (infected or critical) persons."""
+
     @abstractmethod
     def get_location_work_time(self, location_id: LocationID) -> Optional[SimulationTimeTuple]:
         """Return the open time for the given location and None if not applicable"""
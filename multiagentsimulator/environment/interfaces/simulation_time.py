@@ -1,6 +1,18 @@
 from dataclasses import dataclass, field
 from datetime import date, datetime
-from typing import List, Tuple, Optional, Type, Union
+from typing import List, Tuple, Optional, Type, Union, Sequence
+
+import numpy as np
+
+HOURS_IN_WEEK = 7 * 24
+DAYS_IN_YEAR = 365
+HOURS_IN_YEAR = DAYS_IN_YEAR * 24
+
+# lookups indexed by the hour of the year and the hour of the week, computed once instead of on every step
+_HOUR_OF_YEAR_HOUR: List[int] = [t % 24 for t in range(HOURS_IN_YEAR)]
+_DAY_OF_YEAR_HOUR: List[int] = [t // 24 for t in range(HOURS_IN_YEAR)]
+_DAY_KEYS: List[int] = [1 << d for d in range(DAYS_IN_YEAR)]
+_WEEK_HOUR_KEYS: List[int] = [1 << wh for wh in range(HOURS_IN_WEEK)]
 
 
 @dataclass(frozen=True)
@@ -10,10 +22,40 @@ class SimulationTime:
     day: int = 0
     year: int = 0
 
+    tick: int = field(init=False, default=0, repr=False, compare=False)
+    """Number of hours since the start of year 0, same as in_hours()."""
+
+    week_hour_key: int = field(init=False, default=0, repr=False, compare=False)
+    """A single bit set at the hour of the week, used for membership tests against SimulationTimeTuple masks."""
+
+    day_key: int = field(init=False, default=0, repr=False, compare=False)
+    """A single bit set at the day of the year, used for membership tests against SimulationTimeTuple masks."""
+
     def __post_init__(self) -> None:
         assert self.hour in range(0, 24), 'hour must be in (0, 23)'
         assert self.week_day in range(0, 7), 'Weekday must be in (0, 6)'
         assert self.day in range(0, 365), 'day must be in (0, 364)'
+        self._set_tick(self.year * HOURS_IN_YEAR + self.day * 24 + self.hour, self.week_day)
+
+    @classmethod
+    def from_tick(cls: Type['SimulationTime'], tick: int, week_day: int) -> 'SimulationTime':
+        """Create a SimulationTime from a tick without re-validating the fields."""
+        sim_time = object.__new__(cls)
+        sim_time._set_tick(tick, week_day)
+        return sim_time
+
+    def _set_tick(self, tick: int, week_day: int) -> None:
+        year, hour_of_year = divmod(tick, HOURS_IN_YEAR)
+        hour = _HOUR_OF_YEAR_HOUR[hour_of_year]
+        day = _DAY_OF_YEAR_HOUR[hour_of_year]
+        # the dataclass is frozen for consumers, update all fields in one go
+        self.__dict__.update(hour=hour, week_day=week_day, day=day, year=year, tick=tick,
+                             week_hour_key=_WEEK_HOUR_KEYS[week_day * 24 + hour], day_key=_DAY_KEYS[day])
+
+    @property
+    def week_hour(self) -> int:
+        """Hour of the week in [0, 167]"""
+        return self.week_day * 24 + self.hour
 
     def now(self, frmt: str = 'ydwh') -> List[int]:
         """Returns current time as list of ints in the specified format"""
@@ -26,30 +68,14 @@ class SimulationTime:
         return ret_list
 
     def step(self) -> None:
-        h, w, d, y = self.now('hwdy')
-        h += 1
-        if h >= 24:
-            h = 0
-            w = (w + 1) % 7
-            d += 1
-            if d >= 365:
-                d = 0
-                y += 1
-        object.__setattr__(self, 'hour', h)
-        object.__setattr__(self, 'week_day', w)
-        object.__setattr__(self, 'day', d)
-        object.__setattr__(self, 'year', y)
+        self._set_tick(self.tick + 1, (self.week_day + 1) % 7 if self.hour == 23 else self.week_day)
 
     def in_hours(self) -> int:
-        return self.year * 365 * 24 + self.day * 24 + self.hour
+        return self.tick
 
     @classmethod
     def from_hours(cls: Type, hours: int) -> 'SimulationTime':
-        y = hours // (365 * 24)
-        d = hours % (365 * 24) // 24
-        h = hours % (365 * 24) % 24
-        w = d % 7
-        return SimulationTime(h, w, d, y)
+        return cls.from_tick(hours, hours % HOURS_IN_YEAR // 24 % 7)
 
     def __add__(self, other: Union['SimulationTime', 'SimulationTimeInterval']) -> 'SimulationTime':
         return SimulationTime.from_hours(other.in_hours() + self.in_hours())
@@ -57,6 +83,64 @@ class SimulationTime:
     def __str__(self):
         return str(datetime(year=self.year+2023, month=1, day=self.day, hour=self.hour))
 
+
+class SimulationClock:
+    """An integer tick clock that is the single source of truth for the simulation time. The clock owns a
+    SimulationTime view that is kept in sync with the tick for consumers that take a SimulationTime."""
+
+    _tick: int
+    _week_day_offset: int
+    _sim_time: SimulationTime
+
+    def __init__(self, sim_time: SimulationTime):
+        """
+        :param sim_time: the SimulationTime instance to drive, it is updated in-place when the clock steps
+        """
+        self._tick = sim_time.tick
+        # week days run continuously across years, unlike the day of the year
+        self._week_day_offset = (sim_time.week_day - sim_time.tick // 24) % 7
+        self._sim_time = sim_time
+
+    @property
+    def tick(self) -> int:
+        return self._tick
+
+    @property
+    def sim_time(self) -> SimulationTime:
+        return self._sim_time
+
+    @property
+    def hour(self) -> int:
+        return _HOUR_OF_YEAR_HOUR[self._tick % HOURS_IN_YEAR]
+
+    @property
+    def week_day(self) -> int:
+        return (self._tick // 24 + self._week_day_offset) % 7
+
+    @property
+    def day(self) -> int:
+        return _DAY_OF_YEAR_HOUR[self._tick % HOURS_IN_YEAR]
+
+    @property
+    def year(self) -> int:
+        return self._tick // HOURS_IN_YEAR
+
+    def trigger(self, interval: 'SimulationTimeInterval') -> bool:
+        """Return True if the interval triggers at the current tick."""
+        return interval.trigger_at_tick(self._tick)
+
+    def contains(self, time_tuple: 'SimulationTimeTuple', tick: int) -> bool:
+        """Return True if the time tuple contains the time of the given tick of this clock."""
+        hour_of_year = tick % HOURS_IN_YEAR
+        week_day = (tick // 24 + self._week_day_offset) % 7
+        return ((time_tuple.week_hour_mask & _WEEK_HOUR_KEYS[week_day * 24 + _HOUR_OF_YEAR_HOUR[hour_of_year]]) != 0
+                and (time_tuple.day_mask & _DAY_KEYS[_DAY_OF_YEAR_HOUR[hour_of_year]]) != 0)
+
+    def step(self) -> None:
+        self._tick += 1
+        self._sim_time._set_tick(self._tick, self.week_day)
+
+
 @dataclass(frozen=True)
 class SimulationTimeInterval:
 
@@ -81,8 +165,16 @@ class SimulationTimeInterval:
         object.__setattr__(self, '_offset_hr', self.offset_day * 24 + self.offset_hour)
 
     def trigger_at_interval(self, sim_time: SimulationTime) -> bool:
-        sim_hr = sim_time.year * 365 * 24 + sim_time.day * 24 + sim_time.hour
-        return (sim_hr - self._offset_hr) % self._trigger_hr == 0 if sim_hr >= self._offset_hr else False
+        return self.trigger_at_tick(sim_time.tick)
+
+    def trigger_at_tick(self, tick: int) -> bool:
+        return (tick - self._offset_hr) % self._trigger_hr == 0 if tick >= self._offset_hr else False
+
+    def next_trigger_tick(self, tick: int) -> int:
+        """Return the first tick at or after the given tick at which the interval triggers."""
+        if tick <= self._offset_hr:
+            return self._offset_hr
+        return tick + (self._offset_hr - tick) % self._trigger_hr
 
     def in_hours(self) -> int:
         return self.year * 365 * 24 + self.day * 24 + self.hour
@@ -94,6 +186,12 @@ class SimulationTimeTuple:
     week_days: Optional[Tuple[int, ...]] = None
     days: Optional[Tuple[int, ...]] = None
 
+    week_hour_mask: int = field(init=False, default=0, repr=False, compare=False)
+    """A 168-bit mask of the hours of the week contained in the tuple."""
+
+    day_mask: int = field(init=False, default=0, repr=False, compare=False)
+    """A 365-bit mask of the days of the year contained in the tuple."""
+
     def __post_init__(self) -> None:
         if self.hours:
             for hour in self.hours:
@@ -105,21 +203,53 @@ class SimulationTimeTuple:
             for d in self.days:
                 assert d in range(0, 365), 'day must be in (0, 364)'
 
+        # compile the tuple into bit masks once, membership is then a bitwise and
+        hours = range(24) if self.hours is None else self.hours
+        week_days = range(7) if self.week_days is None else self.week_days
+        days = range(DAYS_IN_YEAR) if self.days is None else self.days
+        week_hour_mask = 0
+        for wd in week_days:
+            for hour in hours:
+                week_hour_mask |= 1 << (int(wd) * 24 + int(hour))
+        day_mask = 0
+        for d in days:
+            day_mask |= 1 << int(d)
+        object.__setattr__(self, 'week_hour_mask', week_hour_mask)
+        object.__setattr__(self, 'day_mask', day_mask)
+
     def __contains__(self, item: SimulationTime) -> bool:
-        contains = True
-        if self.hours is not None:
-            contains = contains and (item.hour in self.hours)
-            if not contains:
-                return False
-
-        if self.week_days is not None:
-            contains = contains and (item.week_day in self.week_days)
-            if not contains:
-                return False
-
-        if self.days is not None:
-            contains = contains and (item.day in self.days)
-            if not contains:
-                return False
-
-        return True
+        return (self.week_hour_mask & item.week_hour_key) != 0 and (self.day_mask & item.day_key) != 0
+
+
+def _mask_to_bool_array(mask: int, num_bits: int) -> np.ndarray:
+    data = np.frombuffer(mask.to_bytes((num_bits + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(data, bitorder='little')[:num_bits].astype(bool)
+
+
+class SimulationTimeTuples:
+    """A compiled collection of SimulationTimeTuples that answers membership queries for all of them at once."""
+
+    _week_hour_masks: np.ndarray
+    _day_masks: np.ndarray
+
+    def __init__(self, time_tuples: Sequence[SimulationTimeTuple]):
+        """
+        :param time_tuples: a sequence of SimulationTimeTuple instances
+        """
+        self._week_hour_masks = np.zeros((len(time_tuples), HOURS_IN_WEEK), dtype=bool)
+        self._day_masks = np.zeros((len(time_tuples), DAYS_IN_YEAR), dtype=bool)
+        for i, time_tuple in enumerate(time_tuples):
+            self._week_hour_masks[i] = _mask_to_bool_array(time_tuple.week_hour_mask, HOURS_IN_WEEK)
+            self._day_masks[i] = _mask_to_bool_array(time_tuple.day_mask, DAYS_IN_YEAR)
+
+    def __len__(self) -> int:
+        return len(self._day_masks)
+
+    def contains(self, sim_time: SimulationTime) -> np.ndarray:
+        """
+        Return a boolean array that is True for each time tuple that contains the given time.
+
+        :param sim_time: SimulationTime instance
+        :return: a boolean array of length len(self)
+        """
+        return self._week_hour_masks[:, sim_time.week_hour] & self._day_masks[:, sim_time.day]
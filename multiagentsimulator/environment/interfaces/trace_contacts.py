@@ -1,6 +1,7 @@
 
 from abc import ABC, abstractmethod
-from typing import Mapping
+from copy import deepcopy
+from typing import Dict, Mapping, Sequence
 
 import numpy as np
 from orderedset import OrderedSet
@@ -10,6 +11,10 @@ from .ids import PersonID
 
 class ContactTracer(ABC):
 
+    # persons whose current test result is positive or critical, as set by set_positive_persons
+    _positive_persons: np.ndarray = np.zeros(0, dtype=bool)
+    _positive_person_ids: Sequence[PersonID] = ()
+
     @abstractmethod
     def new_time_slot(self) -> None:
 
@@ -29,3 +34,62 @@ class ContactTracer(ABC):
     def get_contacts(self, person_id: PersonID) -> Mapping[PersonID, np.ndarray]:
 
         pass
+
+    def set_positive_persons(self, positive: np.ndarray, person_ids: Sequence[PersonID]) -> None:
+        """
+        Set the persons whose current test result is positive or critical.
+
+        :param positive: a boolean array indexed by the dense person indices
+        :param person_ids: person ids indexed by the dense person indices
+        """
+        self._positive_persons = positive
+        self._positive_person_ids = person_ids
+
+    def has_positive_contact(self, person_id: PersonID) -> bool:
+        """
+        Return whether the person had a contact with a positive person within the history of the tracer. The default
+        implementation looks up the contacts of the person, tracers can override it with a precomputed mask.
+
+        :param person_id: id of the person
+        :return: bool
+        """
+        return any(self._positive_persons[contact.index] for contact in self.get_contacts(person_id))
+
+    def positive_contact_mask(self) -> np.ndarray:
+        """
+        Return which persons had a contact with a positive person within the history of the tracer, as set by the last
+        call to set_positive_persons.
+
+        :return: a boolean array indexed by the dense person indices
+        """
+        return np.fromiter((self.has_positive_contact(person_id) for person_id in self._positive_person_ids),
+                           dtype=bool, count=len(self._positive_person_ids))
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """
+        Return the memory of the tracer as a dict of arrays for simulator snapshots, in which persons are identified by
+        the dense indices of their ids. Tracers that support snapshots override this method together with restore.
+
+        :return: a dict of arrays
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support simulator snapshots, override snapshot and '
+                                  f'restore to store the memory of the tracer in arrays.')
+
+    def restore(self, arrays: Mapping[str, np.ndarray], person_ids: Sequence[PersonID]) -> None:
+        """
+        Restore the memory of the tracer from a dict returned by snapshot.
+
+        :param arrays: a dict of arrays returned by snapshot
+        :param person_ids: person ids indexed by the dense person indices used in the snapshot
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support simulator snapshots, override snapshot and '
+                                  f'restore to store the memory of the tracer in arrays.')
+
+    def fork(self) -> 'ContactTracer':
+        """
+        Return a copy of the tracer for a forked simulation. The default implementation deep copies the tracer,
+        tracers can override it to share their immutable memory with the copy.
+
+        :return: ContactTracer instance
+        """
+        return deepcopy(self)
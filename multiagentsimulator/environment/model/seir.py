@@ -1,11 +1,11 @@
 
 from collections import defaultdict
+from copy import copy
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, Optional, Tuple, cast
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, cast
 
 import numpy as np
-from scipy.stats import truncnorm
 
 from ..interfaces import IndividualInfectionState, InfectionModel, InfectionSummary, Risk, globals
 from ...utils import required
@@ -71,6 +71,19 @@ _DEFAULT_DEATH_RATE_HOSP = {
 }
 
 
+_LABELS: List[_SEIRLabel] = list(_SEIRLabel)
+_LABEL_TO_CODE: Dict[_SEIRLabel, int] = {label: i for i, label in enumerate(_LABELS)}
+_AGE_LIMITS: List[_AgeLimit] = list(_AgeLimit)
+_AGE_LIMIT_VALUES = np.asarray([a.value for a in _AGE_LIMITS])
+_RISKS: List[Risk] = sorted(Risk, key=lambda r: r.value)
+_SHOW_SYMPTOMS_LABELS = {_SEIRLabel.symp, _SEIRLabel.hospitalized, _SEIRLabel.needs_hospitalization}
+
+
+def _get_age_buckets_from_ages(ages: np.ndarray) -> np.ndarray:
+    """Vectorized version of _get_age_limit_from_age that returns indices into _AGE_LIMITS."""
+    return np.minimum(np.searchsorted(_AGE_LIMIT_VALUES, ages, side='left'), len(_AGE_LIMITS) - 1)
+
+
 def _get_age_limit_from_age(age: int) -> _AgeLimit:
     value = _AgeLimit._150
 
@@ -116,6 +129,7 @@ class SEIRModel(InfectionModel):
     _numpy_rng: np.random.RandomState
     _pandemic_started_counter: int
     _pandemic_start_limit: int
+    _cum_transitions: np.ndarray
 
     def __init__(self,
                  symp_proportion: float = 0.56,
@@ -236,12 +250,34 @@ class SEIRModel(InfectionModel):
             }
         }
 
+        # scipy.stats takes about a second to import, so it is only imported once a model is built
+        from scipy.stats import truncnorm
+
         spp = spread_probability_params or SpreadProbabilityParams()
         self._spread_probability = truncnorm((0. - spp.mean) / spp.sigma,
                                              (1. - spp.mean) / spp.sigma,
                                              loc=spp.mean, scale=spp.sigma)
         self._pandemic_start_limit = pandemic_start_limit
         self._pandemic_started_counter = 0
+        self._cum_transitions = self._compile_transitions()
+
+    def _compile_transitions(self) -> np.ndarray:
+        """Compile the model into a (label x age-bucket x risk x next-label) cumulative probability tensor. Labels
+        without transitions (and susceptible, which is handled separately) map onto themselves."""
+        cum = np.zeros((len(_LABELS), len(_AGE_LIMITS), len(_RISKS), len(_LABELS)))
+        for label in _LABELS:
+            for a_i, a in enumerate(_AGE_LIMITS):
+                for r_i, r in enumerate(_RISKS):
+                    state_probs = self._model[label][(a, r)] if label in self._model else {}
+                    if len(state_probs) == 0:
+                        cum[_LABEL_TO_CODE[label], a_i, r_i, _LABEL_TO_CODE[label]] = 1.
+                        continue
+                    probs = np.array(list(state_probs.values()))
+                    assert abs(1. - sum(probs)) < 1e-3, f'Probabilities {probs} do not sum to one'
+                    for next_label, prob in state_probs.items():
+                        cum[_LABEL_TO_CODE[label], a_i, r_i, _LABEL_TO_CODE[next_label]] = prob
+        cum = np.cumsum(cum, axis=-1)
+        return cum / cum[..., -1:]
 
     def _create_default(self, state: _SEIRLabel, probs: Dict[_SEIRLabel, float]) -> _ModelDescriptionValue:
         return defaultdict(lambda: self._model[state][None], {None: probs})
@@ -289,13 +325,129 @@ class SEIRModel(InfectionModel):
                                   shows_symptoms=label in show_symptoms_states,
                                   label=label)
 
+    def step_batch(self, labels: np.ndarray, age_buckets: np.ndarray, risks: np.ndarray,
+                   infection_probabilities: np.ndarray,
+                   is_hospitalized: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sample the transitions of many subjects at once with a single uniform draw per subject.
+
+        :param labels: label codes (indices into _SEIRLabel) of the current states
+        :param age_buckets: age bucket codes (indices into _AgeLimit)
+        :param risks: risk codes (Risk.value)
+        :param infection_probabilities: probability of getting infected for each subject
+        :param is_hospitalized: optional boolean mask of hospitalized subjects
+        :return: a tuple of the next label codes and the exposed random numbers (-1 if not exposed)
+        """
+        rnb = self._numpy_rng.uniform(size=len(labels))
+        cum = self._cum_transitions[labels, age_buckets, risks]
+        next_labels = np.minimum((rnb[:, None] >= cum).sum(axis=1), len(_LABELS) - 1)
+
+        susceptible = labels == _LABEL_TO_CODE[_SEIRLabel.susceptible]
+        exposed = susceptible & (rnb < infection_probabilities)
+        next_labels[susceptible] = np.where(exposed[susceptible], _LABEL_TO_CODE[_SEIRLabel.exposed],
+                                            _LABEL_TO_CODE[_SEIRLabel.susceptible])
+        exposed_rnb = np.where(exposed, rnb, -1.)
+
+        if is_hospitalized is not None:
+            hospitalized = (labels == _LABEL_TO_CODE[_SEIRLabel.needs_hospitalization]) & is_hospitalized
+            next_labels[hospitalized] = _LABEL_TO_CODE[_SEIRLabel.hospitalized]
+
+        return next_labels, exposed_rnb
+
+    def step_states(self, subject_infection_states: Sequence[Optional[IndividualInfectionState]],
+                    subject_ages: np.ndarray, subject_risks: Sequence[Risk],
+                    infection_probabilities: np.ndarray) -> List[IndividualInfectionState]:
+        states = cast(List[Optional[SEIRInfectionState]], list(subject_infection_states))
+
+        # initialize missing states, the first pandemic_start_limit of them are exposed to start the pandemic
+        uninitialized = [i for i, state in enumerate(states) if state is None]
+        if len(uninitialized) > 0:
+            spread_probabilities = np.atleast_1d(self._spread_probability.rvs(size=len(uninitialized),
+                                                                              random_state=self._numpy_rng))
+            for i, spread_probability in zip(uninitialized, spread_probabilities):
+                pandemic_started = self._pandemic_started_counter >= self._pandemic_start_limit
+                label = _SEIRLabel.susceptible if pandemic_started else _SEIRLabel.exposed
+                self._pandemic_started_counter += 1 if not pandemic_started else 0
+                states[i] = SEIRInfectionState(summary=self._seir_to_summary[label],
+                                               label=label,
+                                               spread_probability=float(spread_probability))
+
+        seir_states = cast(List[SEIRInfectionState], states)
+        labels = np.fromiter((_LABEL_TO_CODE[s.label] for s in seir_states), dtype=np.int64, count=len(states))
+        is_hospitalized = np.fromiter((s.is_hospitalized for s in seir_states), dtype=bool, count=len(states))
+        risks = np.fromiter((r.value for r in subject_risks), dtype=np.int64, count=len(states))
+        next_labels, exposed_rnb = self.step_batch(labels,
+                                                   _get_age_buckets_from_ages(np.asarray(subject_ages)),
+                                                   risks,
+                                                   np.asarray(infection_probabilities),
+                                                   is_hospitalized)
+
+        next_states: List[IndividualInfectionState] = []
+        for state, label_code, rnb in zip(seir_states, next_labels.tolist(), exposed_rnb.tolist()):
+            label = _LABELS[label_code]
+            if label == state.label and rnb == -1. and state.exposed_rnb == -1.:
+                # frozen and unchanged - reuse the instance
+                next_states.append(state)
+                continue
+            next_states.append(SEIRInfectionState(summary=self._seir_to_summary[label],
+                                                  spread_probability=state.spread_probability,
+                                                  exposed_rnb=rnb,
+                                                  is_hospitalized=state.is_hospitalized,
+                                                  shows_symptoms=label in _SHOW_SYMPTOMS_LABELS,
+                                                  label=label))
+        return next_states
+
+    def encode_states(self, subject_infection_states: Sequence[Optional[IndividualInfectionState]]
+                      ) -> Dict[str, np.ndarray]:
+        states = cast(Sequence[Optional[SEIRInfectionState]], subject_infection_states)
+        initialized = [s for s in states if s is not None]
+        label = np.full(len(states), -1, dtype=np.int8)
+        label[[i for i, s in enumerate(states) if s is not None]] = [_LABEL_TO_CODE[s.label] for s in initialized]
+
+        def column(name: str, dtype: type, default: Any) -> np.ndarray:
+            return np.asarray([default if s is None else getattr(s, name) for s in states], dtype=dtype)
+
+        return dict(label=label,
+                    spread_probability=column('spread_probability', np.float64, 0.),
+                    exposed_rnb=column('exposed_rnb', np.float64, -1.),
+                    is_hospitalized=column('is_hospitalized', bool, False),
+                    shows_symptoms=column('shows_symptoms', bool, False))
+
+    def decode_states(self, arrays: Mapping[str, np.ndarray]) -> List[Optional[IndividualInfectionState]]:
+        states: List[Optional[IndividualInfectionState]] = []
+        for label_code, spread_probability, exposed_rnb, is_hospitalized, shows_symptoms in zip(
+                arrays['label'].tolist(), arrays['spread_probability'].tolist(), arrays['exposed_rnb'].tolist(),
+                arrays['is_hospitalized'].tolist(), arrays['shows_symptoms'].tolist()):
+            if label_code == -1:
+                states.append(None)
+                continue
+            label = _LABELS[label_code]
+            states.append(SEIRInfectionState(summary=self._seir_to_summary[label],
+                                             spread_probability=spread_probability,
+                                             exposed_rnb=exposed_rnb,
+                                             is_hospitalized=is_hospitalized,
+                                             shows_symptoms=shows_symptoms,
+                                             label=label))
+        return states
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        return dict(pandemic_started_counter=np.asarray(self._pandemic_started_counter, dtype=np.int64))
+
+    def restore(self, arrays: Mapping[str, np.ndarray]) -> None:
+        self._pandemic_started_counter = int(arrays['pandemic_started_counter'])
+
+    def fork(self, numpy_rng: np.random.RandomState) -> 'SEIRModel':
+        model = copy(self)
+        model._numpy_rng = numpy_rng
+        return model
+
     def needs_contacts(self, subject_state: Optional[IndividualInfectionState]) -> bool:
         pandemic_started = self._pandemic_started_counter >= self._pandemic_start_limit
         label = _SEIRLabel.susceptible if pandemic_started else _SEIRLabel.exposed
         self._pandemic_started_counter += 1 if not pandemic_started else 0
         subject_state = subject_state if subject_state else SEIRInfectionState(
             summary=self._seir_to_summary[label], label=label,
-            spread_probability=self._spread_probability.rvs())
+            spread_probability=self._spread_probability.rvs(random_state=self._numpy_rng))
         return cast(SEIRInfectionState, subject_state).label == _SEIRLabel.exposed
 
     def reset(self) -> None:
@@ -1,9 +1,12 @@
-from typing import cast
+from copy import copy
+from typing import Tuple, cast
 
 import numpy as np
 
 from ..interfaces import PersonState, InfectionSummary, IndividualInfectionState, PandemicTestResult, PandemicTesting, \
-    globals
+    globals, sorted_infection_summary
+
+_SUMMARY_CODES = {s: i for i, s in enumerate(sorted_infection_summary)}
 
 
 class RandomPandemicTesting(PandemicTesting):
@@ -90,3 +93,44 @@ class RandomPandemicTesting(PandemicTesting):
                        else PandemicTestResult.POSITIVE if test_outcome else PandemicTestResult.NEGATIVE)
 
         return test_result
+
+    def test_batch(self, summaries: np.ndarray, shows_symptoms: np.ndarray, is_hospitalized: np.ndarray,
+                   test_results: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Admit and test many persons at once with two uniform draws per person, following admit_person and
+        test_person.
+
+        :param summaries: infection summary codes (indices into sorted_infection_summary)
+        :param shows_symptoms: boolean mask of persons that show symptoms
+        :param is_hospitalized: boolean mask of hospitalized persons
+        :param test_results: codes (PandemicTestResult values) of the current test results
+        :return: a tuple of the boolean mask of admitted persons and the codes of the next test results
+        """
+        rnd = self._numpy_rng.uniform(size=len(summaries))
+        dead = summaries == _SUMMARY_CODES[InfectionSummary.DEAD]
+        critical = summaries == _SUMMARY_CODES[InfectionSummary.CRITICAL]
+        tested_positive = ((test_results == PandemicTestResult.CRITICAL.value) |
+                           (test_results == PandemicTestResult.POSITIVE.value))
+        admitted = (test_results != PandemicTestResult.DEAD.value) & (
+                dead |
+                is_hospitalized |
+                (tested_positive & (rnd < self._retest_rate)) |
+                (shows_symptoms & critical & (rnd < self._critical_testing_rate)) |
+                (shows_symptoms & ~critical & (rnd < self._symp_testing_rate)) |
+                (~shows_symptoms & (rnd < self._spontaneous_testing_rate)))
+
+        # account for testing uncertainty
+        rnd = self._numpy_rng.uniform(size=len(summaries))
+        infected = critical | (summaries == _SUMMARY_CODES[InfectionSummary.INFECTED])
+        test_outcome = np.where(infected, rnd >= self._testing_false_negative_rate,
+                                rnd < self._testing_false_positive_rate)
+        results = np.where(test_outcome,
+                           np.where(critical, PandemicTestResult.CRITICAL.value, PandemicTestResult.POSITIVE.value),
+                           PandemicTestResult.NEGATIVE.value)
+        results[dead] = PandemicTestResult.DEAD.value
+        return admitted, np.where(admitted, results, test_results).astype(test_results.dtype)
+
+    def fork(self, numpy_rng: np.random.RandomState) -> 'RandomPandemicTesting':
+        testing = copy(self)
+        testing._numpy_rng = numpy_rng
+        return testing
@@ -1,12 +1,18 @@
 import dataclasses
 from copy import deepcopy
-from typing import Optional, List, Sequence, cast
+from typing import Optional, List, Sequence, TypeVar, cast
 
 import numpy as np
 
 from ..interfaces import Person, PersonID, PersonState, LocationID, Risk, Registry, ChosenRegulation, \
-    SimulationTime, NoOP, NOOP, SimulationTimeTuple, PandemicTestResult, ContactTracer, globals
+    SimulationTime, NoOP, NOOP, SimulationTimeTuple, PandemicTestResult, ContactTracer, globals, PersonRoutine, \
+    PersonRoutineWithStatus
 from ..location import Cemetery, Hospital
+from ..population_store import PopulationStore
+from ..routine_scheduler import RoutineScheduler
+from ...utils import fork_dataclass, shallow_copy
+
+_Person = TypeVar('_Person', bound='BasePerson')
 
 
 class BasePerson(Person):
@@ -24,6 +30,9 @@ class BasePerson(Person):
 
     _regulation_compliance_prob: float
     _go_home: bool
+    _population_store: Optional[PopulationStore]
+    _population_index: int
+    _routine_scheduler: Optional[RoutineScheduler]
 
     def __init__(self,
                  person_id: PersonID,
@@ -44,12 +53,132 @@ class BasePerson(Person):
                                                      infection_spread_multiplier=self._regulation_compliance_prob)
 
         self._state = deepcopy(self._init_state)
+        self._population_store = None
+        self._population_index = -1
+        self._routine_scheduler = None
         self._registry.register_person(self)
 
         self._cemetery_ids = list(self._registry.location_ids_of_type(Cemetery))
         self._hospital_ids = list(self._registry.location_ids_of_type(Hospital))
         self._go_home = False
 
+    def use_population_store(self, store: PopulationStore, index: int) -> None:
+        """
+        Move the person's state into a row of the given population store. The state is then a view over that row.
+
+        :param store: PopulationStore instance
+        :param index: the person's dense index in the store
+        """
+        self._population_store = store
+        self._population_index = index
+        self._state = store.load_state(index, self._state)
+
+    def use_routine_scheduler(self, scheduler: RoutineScheduler) -> None:
+        """
+        Sync the person's routines through the given scheduler instead of polling all of them every step.
+
+        :param scheduler: RoutineScheduler instance
+        """
+        self._routine_scheduler = scheduler
+        for rws in self.routines_with_status:
+            scheduler.add_routine(self._id, rws)
+
+    def use_numpy_rng(self, numpy_rng: np.random.RandomState) -> None:
+        """
+        Draw from the given random state instead of the repo wide one, for example from the person's own stream.
+
+        :param numpy_rng: random state of the person
+        """
+        self._numpy_rng = numpy_rng
+
+    def fork(self: '_Person', registry: Registry, numpy_rng: np.random.RandomState,
+             population_store: Optional[PopulationStore] = None,
+             routine_scheduler: Optional[RoutineScheduler] = None) -> '_Person':
+        """
+        Return a copy of the person for a forked simulation. Static structure such as the home, the assigned locations
+        and the routines is shared with this person, the state and the routine status are copied.
+
+        :param registry: registry of the forked simulation
+        :param numpy_rng: random state of the forked simulation
+        :param population_store: the forked population store, if this person's state is held in a store
+        :param routine_scheduler: the forked routine scheduler, if this person's routines are synced by a scheduler
+        :return: a copy of the person
+        """
+        person = shallow_copy(self)
+        person._registry = registry
+        person._numpy_rng = numpy_rng
+        if self._population_store is not None:
+            assert population_store is not None, 'The person\'s state is held in a population store.'
+            person._population_store = population_store
+            person._state = population_store.view(self._population_index)
+        else:
+            person._state = fork_dataclass(self._state)
+        person._copy_routines_with_status()
+
+        person._routine_scheduler = routine_scheduler
+        if routine_scheduler is not None:
+            for rws, new_rws in zip(self.routines_with_status, person.routines_with_status):
+                routine_scheduler.replace_routine(rws, new_rws)
+        return person
+
+    def _copy_routines_with_status(self) -> None:
+        """Replace the routines with status of a forked person by copies. Persons with routines override this."""
+        pass
+
+    @property
+    def routines_with_status(self) -> Sequence[PersonRoutineWithStatus]:
+        """All routines of the person along with their status"""
+        return ()
+
+    def _new_routine_with_status(self, routine: PersonRoutine) -> PersonRoutineWithStatus:
+        rws = PersonRoutineWithStatus(routine)
+        if self._routine_scheduler is not None:
+            self._routine_scheduler.add_routine(self._id, rws)
+        return rws
+
+    def _sync_routines(self, sim_time: SimulationTime) -> None:
+        if self._routine_scheduler is not None:
+            self._routine_scheduler.sync(self._id, sim_time, self._state)
+        else:
+            for rws in self.routines_with_status:
+                rws.sync(sim_time=sim_time, person_state=self._state)
+
+    @property
+    def step_window(self) -> Optional[SimulationTimeTuple]:
+        """The time during which the person leaves home on its own (e.g. for work), if any"""
+        return None
+
+    def is_idle(self) -> bool:
+        """
+        Return True if a step would leave the person and the registry untouched, provided that the person has no
+        routine events and is outside its step_window. Such a step only draws the regulation compliance sample.
+        """
+        state = self._state
+        if (
+                self._go_home or
+                state.current_location != self._home or
+                state.test_result in {PandemicTestResult.DEAD, PandemicTestResult.CRITICAL} or
+                (state.infection_state is not None and state.infection_state.is_hospitalized) or
+                self._registry.get_person_quarantined_state(self._id)
+        ):
+            return False
+
+        for rws in self.routines_with_status:
+            if rws.due or (rws.started and not rws.done):
+                return False
+        return True
+
+    def is_retired(self) -> bool:
+        """Return True if the person is dead and has settled, so that stepping it has no effect anymore."""
+        return (self._state.test_result == PandemicTestResult.DEAD and
+                (len(self._cemetery_ids) == 0 or self._state.current_location in self._cemetery_ids) and
+                not self._registry.get_person_quarantined_state(self._id))
+
+    def routine_status_changed(self, rws: PersonRoutineWithStatus) -> None:
+        """Notify that the status of one of the person's routines was changed outside of its sync."""
+        if self._routine_scheduler is not None:
+            self._routine_scheduler.routine_status_changed(rws)
+
     def enter_location(self, location_id: LocationID) -> bool:
         if location_id == self._home:
             self._go_home = False
@@ -69,6 +198,20 @@ class BasePerson(Person):
     def home(self) -> LocationID:
         return self._home
 
+    @property
+    def numpy_rng(self) -> np.random.RandomState:
+        """The random state the person draws from"""
+        return self._numpy_rng
+
+    @property
+    def go_home(self) -> bool:
+        """Whether the person heads home in its next step"""
+        return self._go_home
+
+    @go_home.setter
+    def go_home(self, value: bool) -> None:
+        self._go_home = value
+
     @property
     def at_home(self) -> bool:
         return self._state.current_location == self.home
@@ -142,7 +285,7 @@ class BasePerson(Person):
 
                 # quarantine if contact positive
                 (contact_tracer is not None and self._state.quarantine_if_contact_positive and not self.at_home and
-                 self._contact_positive(list(contact_tracer.get_contacts(self.id).keys())))
+                 contact_tracer.has_positive_contact(self._id))
         ):
             self.enter_location(self.home)
             self._registry.quarantine_person(self._id)
@@ -168,14 +311,6 @@ class BasePerson(Person):
         self._state.infection_spread_multiplier = (
                 1 - (1 - self._state.infection_spread_multiplier) * self._regulation_compliance_prob)
 
-    def _contact_positive(self, contacts: Sequence[PersonID]) -> bool:
-        for contact in contacts:
-            if self._registry.get_person_test_result(contact) in {PandemicTestResult.POSITIVE,
-                                                                  PandemicTestResult.CRITICAL}:
-                return True
-
-        return False
-
     def _household_quarantined(self) -> bool:
         for hh in self._registry.get_households(self._id):
             if self._registry.get_person_quarantined_state(hh):
@@ -204,6 +339,9 @@ class BasePerson(Person):
 
     def reset(self) -> None:
         self._state = deepcopy(self._init_state)
+        if self._population_store is not None:
+            self._state = self._population_store.load_state(self._population_index, self._state)
+        self._registry.update_infectious_presence(self._id)
         self._registry.reassign_locations(self)
         self._registry.clear_quarantined(self._id)
         self._registry.register_person_entry_in_location(self.id, self._state.current_location)
@@ -4,6 +4,7 @@ from .base import BasePerson
 from .routine_utils import execute_routines
 from ..interfaces import PersonRoutineWithStatus, PersonState, LocationID, SimulationTime, NoOP, SimulationTimeTuple, \
     NOOP, PersonRoutine, ContactTracer, PersonID
+from ...utils import shallow_copy
 
 
 class Child(BasePerson):
@@ -51,13 +52,23 @@ class Child(BasePerson):
         for routine in routines:
             if routine not in self._routines:
                 self._routines.append(routine)
-                self._outside_school_rs.append(PersonRoutineWithStatus(routine))
+                self._outside_school_rs.append(self._new_routine_with_status(routine))
+
+    def _copy_routines_with_status(self) -> None:
+        self._routines = list(self._routines)
+        self._outside_school_rs = [shallow_copy(rws) for rws in self._outside_school_rs]
+
+    @property
+    def routines_with_status(self) -> Sequence[PersonRoutineWithStatus]:
+        return self._outside_school_rs
+
+    @property
+    def step_window(self) -> Optional[SimulationTimeTuple]:
+        return self._school_time if self._school is not None else None
 
     def _sync(self, sim_time: SimulationTime) -> None:
         super()._sync(sim_time)
-
-        for rws in self._outside_school_rs:
-            rws.sync(sim_time=sim_time, person_state=self.state)
+        self._sync_routines(sim_time)
 
     def step(self, sim_time: SimulationTime, contact_tracer: Optional[ContactTracer] = None) -> Optional[NoOP]:
         step_ret = super().step(sim_time, contact_tracer)
@@ -5,6 +5,7 @@ from .base import BasePerson
 from .routine_utils import execute_routines
 from ..interfaces import LocationID, SimulationTime, NoOP, NOOP, PersonState, PersonRoutine, ContactTracer, PersonID, \
     PersonRoutineWithStatus
+from ...utils import shallow_copy
 
 
 class Retired(BasePerson):
@@ -26,17 +27,23 @@ class Retired(BasePerson):
                          regulation_compliance_prob=regulation_compliance_prob,
                          init_state=init_state)
 
+    def _copy_routines_with_status(self) -> None:
+        self._routines = list(self._routines)
+        self._routines_with_status = [shallow_copy(rws) for rws in self._routines_with_status]
+
+    @property
+    def routines_with_status(self) -> Sequence[PersonRoutineWithStatus]:
+        return self._routines_with_status
+
     def _sync(self, sim_time: SimulationTime) -> None:
         super()._sync(sim_time)
-
-        for rws in self._routines_with_status:
-            rws.sync(sim_time=sim_time, person_state=self.state)
+        self._sync_routines(sim_time)
 
     def set_routines(self, routines: Sequence[PersonRoutine]) -> None:
         for routine in routines:
             if routine not in self._routines:
                 self._routines.append(routine)
-                self._routines_with_status.append(PersonRoutineWithStatus(routine))
+                self._routines_with_status.append(self._new_routine_with_status(routine))
 
     def step(self, sim_time: SimulationTime, contact_tracer: Optional[ContactTracer] = None) -> Optional[NoOP]:
         step_ret = super().step(sim_time, contact_tracer)
@@ -7,7 +7,7 @@ from ..interfaces import PersonRoutineWithStatus, NoOP, NOOP, LocationID, Specia
 
 def execute_routines(person: BasePerson, routines_with_status: Sequence[PersonRoutineWithStatus]) -> Optional[NoOP]:
 
-    numpy_rng = globals.numpy_rng
+    numpy_rng = person.numpy_rng
     # the overall flow is that if a routine is due, start it and block the execution of other routines
     # until it has completed
 
@@ -22,6 +22,7 @@ def execute_routines(person: BasePerson, routines_with_status: Sequence[PersonRo
                     (rws.duration >= rws.routine.duration_of_stay_at_end_loc)
             ):
                 rws.done = True
+                person.routine_status_changed(rws)
             else:
                 # block execution of other routines until the routine is complete
                 return None
@@ -56,6 +57,7 @@ def execute_routines(person: BasePerson, routines_with_status: Sequence[PersonRo
                     rws.started = True
                     rws.duration = 1
                     rws.end_loc_selected = end_loc
+                    person.routine_status_changed(rws)
                     return None
     return NOOP
 
@@ -0,0 +1,227 @@
+import dataclasses
+from copy import copy, deepcopy
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .interfaces import PersonState, Person, Location, LocationID, Risk, PandemicTestResult, InfectionSummary, \
+    IndividualInfectionState, sorted_infection_summary
+
+_RISKS: List[Risk] = [r for r in sorted(Risk, key=lambda x: x.value)]
+_TEST_RESULTS: List[PandemicTestResult] = [r for r in sorted(PandemicTestResult)]
+_SUMMARY_TO_CODE: Dict[InfectionSummary, int] = {s: i for i, s in enumerate(sorted_infection_summary)}
+
+
+class PopulationStore:
+    """A columnar (struct-of-arrays) store of person states. Each PersonState field is held in a numpy column indexed
+    by a dense person index, which turns population wide queries into array reductions."""
+
+    current_location: np.ndarray
+    home: np.ndarray
+    risk: np.ndarray
+    infection_state: np.ndarray
+    infection_summary: np.ndarray
+    shows_symptoms: np.ndarray
+    is_hospitalized: np.ndarray
+    infection_spread_multiplier: np.ndarray
+    quarantine: np.ndarray
+    quarantine_if_contact_positive: np.ndarray
+    quarantine_if_household_quarantined: np.ndarray
+    sick_at_home: np.ndarray
+    avoid_gathering_size: np.ndarray
+    test_result: np.ndarray
+    avoid_location_types: np.ndarray
+    not_infection_probability: np.ndarray
+    infection_location: np.ndarray
+
+    _location_ids: List[LocationID]
+    _location_index: Dict[LocationID, int]
+
+    def __init__(self, persons: Sequence[Person], locations: Sequence[Location]):
+        """
+        :param persons: a sequence of persons, a person's position in the sequence is its index in the store
+        :param locations: a sequence of locations that the persons can occupy
+        """
+        num_persons = len(persons)
+        self._location_ids = [loc.id for loc in locations]
+        self._location_index = {loc_id: i for i, loc_id in enumerate(self._location_ids)}
+
+        self.current_location = np.zeros(num_persons, dtype=np.int32)
+        self.home = np.asarray([self._location_index[p.home] for p in persons], dtype=np.int32)
+        self.risk = np.zeros(num_persons, dtype=np.int8)
+        self.infection_state = np.empty(num_persons, dtype=object)
+        self.infection_summary = np.full(num_persons, -1, dtype=np.int8)
+        self.shows_symptoms = np.zeros(num_persons, dtype=bool)
+        self.is_hospitalized = np.zeros(num_persons, dtype=bool)
+        self.infection_spread_multiplier = np.ones(num_persons, dtype=np.float64)
+        self.quarantine = np.zeros(num_persons, dtype=bool)
+        self.quarantine_if_contact_positive = np.zeros(num_persons, dtype=bool)
+        self.quarantine_if_household_quarantined = np.zeros(num_persons, dtype=bool)
+        self.sick_at_home = np.zeros(num_persons, dtype=bool)
+        self.avoid_gathering_size = np.full(num_persons, -1, dtype=np.int32)
+        self.test_result = np.zeros(num_persons, dtype=np.int8)
+        self.avoid_location_types = np.empty(num_persons, dtype=object)
+        self.not_infection_probability = np.ones(num_persons, dtype=np.float64)
+        self.infection_location = np.full(num_persons, -1, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.home)
+
+    def location_index(self, location_id: LocationID) -> int:
+        return self._location_index[location_id]
+
+    def location_id(self, index: int) -> LocationID:
+        return self._location_ids[index]
+
+    def load_state(self, index: int, state: PersonState) -> 'PersonStateView':
+        """
+        Copy the given person state into the row at index and return a view over that row.
+
+        :param index: dense person index
+        :param state: PersonState instance to copy from
+        :return: a PersonStateView instance
+        """
+        view = PersonStateView(self, index)
+        for name in _VIEW_FIELDS:
+            setattr(view, name, getattr(state, name))
+        return view
+
+    def view(self, index: int) -> 'PersonStateView':
+        """Return a view over the row at index."""
+        return PersonStateView(self, index)
+
+    def fork(self) -> 'PopulationStore':
+        """
+        Return a copy of the store for a forked simulation. The columns are copied, the location index is shared.
+
+        :return: PopulationStore instance
+        """
+        store = copy(self)
+        for name, column in vars(self).items():
+            if isinstance(column, np.ndarray):
+                setattr(store, name, column.copy())
+        # object columns hold lists that are updated in place
+        for i, value in enumerate(store.avoid_location_types):
+            store.avoid_location_types[i] = copy(value)
+        return store
+
+    @staticmethod
+    def stack(stores: Sequence['PopulationStore']) -> Dict[str, np.ndarray]:
+        """
+        Stack the columns of stores into (len(stores), num_persons) arrays, where num_persons is the length of the
+        longest store. The rows of shorter stores are padded with zeros. Each store is rebound to the leading part of
+        its row, so that updates through the stores show up in the stacked arrays.
+
+        :param stores: a sequence of PopulationStore instances
+        :return: a dict from column names to the stacked columns
+        """
+        num_persons = max(len(store) for store in stores)
+        columns = {}
+        for name, column in vars(stores[0]).items():
+            if isinstance(column, np.ndarray):
+                columns[name] = np.zeros((len(stores), num_persons), dtype=column.dtype)
+                for store, row in zip(stores, columns[name]):
+                    row = row[:len(store)]
+                    row[:] = getattr(store, name)
+                    setattr(store, name, row)
+        return columns
+
+    # ----------------population wide queries-----------------
+
+    def infection_summary_counts(self) -> Dict[InfectionSummary, int]:
+        """Return the number of persons in each infection summary. Persons without an infection state are ignored."""
+        counts = np.bincount(self.infection_summary[self.infection_summary >= 0], minlength=len(InfectionSummary))
+        return {s: int(counts[i]) for i, s in enumerate(sorted_infection_summary)}
+
+    def test_result_counts(self) -> Dict[PandemicTestResult, int]:
+        """Return the number of persons with each test result."""
+        counts = np.bincount(self.test_result, minlength=len(PandemicTestResult))
+        return {r: int(counts[r.value]) for r in _TEST_RESULTS}
+
+    def at_home_mask(self) -> np.ndarray:
+        """Return a boolean mask of persons currently at their home."""
+        return self.current_location == self.home
+
+    def quarantine_mask(self) -> np.ndarray:
+        """Return a boolean mask of persons that are asked to quarantine by the current regulation."""
+        return self.quarantine.copy()
+
+    def in_location_mask(self, location_id: LocationID) -> np.ndarray:
+        """Return a boolean mask of persons currently in the given location."""
+        return self.current_location == self._location_index[location_id]
+
+
+def _column_property(name: str,
+                     to_python: Optional[Callable[['PopulationStore', Any], Any]] = None,
+                     from_python: Optional[Callable[['PopulationStore', Any], Any]] = None) -> property:
+    def fget(self: 'PersonStateView') -> Any:
+        value = getattr(self._store, name).item(self._index)
+        return to_python(self._store, value) if to_python else value
+
+    def fset(self: 'PersonStateView', value: Any) -> None:
+        getattr(self._store, name)[self._index] = from_python(self._store, value) if from_python else value
+
+    return property(fget, fset)
+
+
+def _object_property(name: str) -> property:
+    def fget(self: 'PersonStateView') -> Any:
+        return getattr(self._store, name)[self._index]
+
+    def fset(self: 'PersonStateView', value: Any) -> None:
+        getattr(self._store, name)[self._index] = value
+
+    return property(fget, fset)
+
+
+def _set_infection_state(self: 'PersonStateView', value: Optional[IndividualInfectionState]) -> None:
+    # keep the summary, symptom and hospitalization columns in sync for array reductions
+    self._store.infection_state[self._index] = value
+    self._store.infection_summary[self._index] = -1 if value is None else _SUMMARY_TO_CODE[value.summary]
+    self._store.shows_symptoms[self._index] = value is not None and value.shows_symptoms
+    self._store.is_hospitalized[self._index] = value is not None and value.is_hospitalized
+
+
+class PersonStateView(PersonState):
+    """A PersonState that reads and writes a single row of a PopulationStore."""
+
+    _store: PopulationStore
+    _index: int
+
+    def __init__(self, store: PopulationStore, index: int):  # noqa
+        object.__setattr__(self, '_store', store)
+        object.__setattr__(self, '_index', index)
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    current_location = _column_property('current_location',  # type: ignore
+                                        to_python=lambda store, v: store.location_id(v),
+                                        from_python=lambda store, loc_id: store.location_index(loc_id))
+    risk = _column_property('risk', to_python=lambda _, v: _RISKS[v], from_python=lambda _, r: r.value)  # type: ignore
+    infection_state = property(_object_property('infection_state').fget, _set_infection_state)  # type: ignore
+    infection_spread_multiplier = _column_property('infection_spread_multiplier')  # type: ignore
+    quarantine = _column_property('quarantine')  # type: ignore
+    quarantine_if_contact_positive = _column_property('quarantine_if_contact_positive')  # type: ignore
+    quarantine_if_household_quarantined = _column_property('quarantine_if_household_quarantined')  # type: ignore
+    sick_at_home = _column_property('sick_at_home')  # type: ignore
+    avoid_gathering_size = _column_property('avoid_gathering_size')  # type: ignore
+    test_result = _column_property('test_result',  # type: ignore
+                                   to_python=lambda _, v: _TEST_RESULTS[v], from_python=lambda _, r: int(r))
+    avoid_location_types = _object_property('avoid_location_types')  # type: ignore
+    not_infection_probability = _column_property('not_infection_probability')  # type: ignore
+    infection_location = _column_property(  # type: ignore
+        'infection_location',
+        to_python=lambda store, v: None if v < 0 else store.location_id(v),
+        from_python=lambda store, loc_id: -1 if loc_id is None else store.location_index(loc_id))
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> PersonState:
+        # copies are detached from the store
+        state = PersonState(current_location=self.current_location, risk=self.risk)
+        for name in _VIEW_FIELDS:
+            setattr(state, name, deepcopy(getattr(self, name), memo))
+        return state
+
+
+_VIEW_FIELDS = tuple(f.name for f in dataclasses.fields(PersonState))
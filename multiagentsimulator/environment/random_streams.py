@@ -0,0 +1,67 @@
+from typing import List
+
+import numpy as np
+
+
+class RandomStreams:
+    """Counter based random streams keyed on (seed, entity, tick).
+
+    Each entity owns a RandomState over a Philox bit generator. The Philox keys of all entities are derived from the
+    seed with a SeedSequence, and before an entity draws in a tick its counter is positioned at that tick. The draws of
+    an entity in a tick therefore only depend on the seed, the entity's stream index and the tick, and not on the draws
+    of other entities or on the order in which entities are visited.
+    """
+
+    _seed: int
+    _keys: np.ndarray
+    _streams: List[np.random.RandomState]
+    _ticks: List[int]
+
+    def __init__(self, seed: int, num_streams: int):
+        """
+        :param seed: seed of all streams
+        :param num_streams: number of streams, one per entity
+        """
+        self._streams = [np.random.RandomState(np.random.Philox(key=np.zeros(2, dtype=np.uint64)))
+                         for _ in range(num_streams)]
+        self.reseed(seed)
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    @property
+    def seed(self) -> int:
+        return self._seed
+
+    def reseed(self, seed: int) -> None:
+        """
+        Derive the keys of all streams from a new seed. The stream instances are kept, so entities that hold them
+        draw from the new keys from their next seek on.
+
+        :param seed: seed of all streams
+        """
+        self._seed = seed
+        self._keys = np.random.SeedSequence(seed).generate_state(2 * len(self._streams), np.uint64).reshape(-1, 2)
+        self._ticks = [-1] * len(self._streams)
+
+    def stream(self, index: int) -> np.random.RandomState:
+        """Return the random state of the stream at index."""
+        return self._streams[index]
+
+    def seek(self, index: int, tick: int) -> np.random.RandomState:
+        """
+        Position the stream at index at the start of the given tick, unless it already draws in that tick.
+
+        :param index: stream index
+        :param tick: current tick
+        :return: the random state of the stream
+        """
+        stream = self._streams[index]
+        if self._ticks[index] != tick:
+            self._ticks[index] = tick
+            stream.set_state({'bit_generator': 'Philox',
+                              'state': {'counter': np.asarray([0, 0, tick, 0], dtype=np.uint64),
+                                        'key': self._keys[index]},
+                              'buffer': np.zeros(4, dtype=np.uint64), 'buffer_pos': 4,
+                              'has_uint32': 0, 'uinteger': 0, 'has_gauss': 0, 'gauss': 0.})
+        return stream
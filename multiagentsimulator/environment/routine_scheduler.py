@@ -0,0 +1,217 @@
+import heapq
+from collections import defaultdict
+from copy import copy
+from itertools import chain
+from typing import DefaultDict, Dict, Iterable, List, Optional, Tuple
+
+from .interfaces import PersonID, PersonRoutine, PersonRoutineWithStatus, PersonState, SimulationClock, \
+    SimulationTime, SimulationTimeRoutineTrigger
+
+_NEVER = -1
+
+
+def _is_time_triggered(routine: PersonRoutine) -> bool:
+    return (isinstance(routine.start_trigger, SimulationTimeRoutineTrigger) and
+            isinstance(routine.reset_when_done_trigger, SimulationTimeRoutineTrigger))
+
+
+class RoutineScheduler:
+    """An event calendar of person routines.
+
+    Syncing a routine only changes its status at a few ticks: when it becomes due, when it leaves its valid time
+    while due, and when it is reset after completion. The scheduler keeps every routine in a priority queue keyed on
+    the next such tick, so a person step only syncs the routines with a pending event instead of polling all of them.
+    Routines with triggers that are not time based are polled on every person step.
+    """
+
+    _clock: SimulationClock
+    _horizon: int
+
+    _routines: List[PersonRoutineWithStatus]
+    _owners: List[PersonID]
+    _next_tick: List[int]
+    _handles: Dict[int, int]
+    _polled: DefaultDict[PersonID, List[int]]
+
+    _heap: List[Tuple[int, int]]
+    _pending: DefaultDict[PersonID, Dict[int, None]]
+    _tick: int
+
+    def __init__(self, clock: SimulationClock, horizon: int = 14 * 24):
+        """
+        :param clock: the simulation clock that drives the routines
+        :param horizon: maximum number of ticks to scan ahead for the next event of a routine. Routines without an
+            event within the horizon are re-examined at the end of it.
+        """
+        self._clock = clock
+        self._horizon = horizon
+
+        self._routines = []
+        self._owners = []
+        self._next_tick = []
+        self._handles = {}
+        self._polled = defaultdict(list)
+
+        self._heap = []
+        self._pending = defaultdict(dict)
+        self._tick = clock.tick
+
+    def add_routine(self, person_id: PersonID, rws: PersonRoutineWithStatus) -> None:
+        """
+        Add a person's routine to the calendar.
+
+        :param person_id: id of the person that owns the routine
+        :param rws: PersonRoutineWithStatus instance
+        """
+        handle = len(self._routines)
+        self._routines.append(rws)
+        self._owners.append(person_id)
+        self._next_tick.append(_NEVER)
+        self._handles[id(rws)] = handle
+        if _is_time_triggered(rws.routine):
+            self._schedule(handle, self._next_event_tick(rws, self._clock.tick))
+        else:
+            self._polled[person_id].append(handle)
+
+    def routine_status_changed(self, rws: PersonRoutineWithStatus) -> None:
+        """
+        Reschedule a routine whose status was changed outside of sync, for example when it was started or completed.
+
+        :param rws: PersonRoutineWithStatus instance
+        """
+        handle = self._handles[id(rws)]
+        if _is_time_triggered(rws.routine):
+            # the status may change again within the current tick if the person steps again
+            self._schedule(handle, self._next_event_tick(rws, self._clock.tick))
+
+    def sync(self, person_id: PersonID, sim_time: SimulationTime, person_state: Optional[PersonState] = None) -> None:
+        """
+        Sync the routines of the given person that have an event at the current tick. This is equivalent to calling
+        sync on each of the person's routines.
+
+        :param person_id: id of the person
+        :param sim_time: current simulation time
+        :param person_state: state of the person
+        """
+        tick = sim_time.tick
+        if tick != self._tick:
+            self.advance(tick)
+
+        for handle in self._polled.get(person_id, ()):
+            self._routines[handle].sync(sim_time=sim_time, person_state=person_state)
+
+        pending = self._pending.pop(person_id, None)
+        if pending:
+            for handle in pending:
+                rws = self._routines[handle]
+                next_tick = self._next_event_tick(rws, tick)
+                if next_tick == tick:
+                    rws.sync(sim_time=sim_time, person_state=person_state)
+                    next_tick = self._next_event_tick(rws, tick + 1)
+                self._schedule(handle, next_tick)
+
+    def reset(self, clock: SimulationClock) -> None:
+        """
+        Rebuild the calendar for a new clock, typically after the routines were reset.
+
+        :param clock: the simulation clock that drives the routines
+        """
+        self._clock = clock
+        self._heap = []
+        self._pending = defaultdict(dict)
+        self._tick = clock.tick
+        polled = set(h for handles in self._polled.values() for h in handles)
+        for handle, rws in enumerate(self._routines):
+            if handle not in polled:
+                self._schedule(handle, self._next_event_tick(rws, clock.tick))
+
+    def fork(self, clock: SimulationClock) -> 'RoutineScheduler':
+        """
+        Return a copy of the calendar for a forked simulation. The copy still refers to the routines of this calendar,
+        each of them must be swapped for its copy with replace_routine before the copy is used.
+
+        :param clock: the simulation clock of the forked simulation
+        :return: RoutineScheduler instance
+        """
+        scheduler = copy(self)
+        scheduler._clock = clock
+        scheduler._routines = list(self._routines)
+        scheduler._owners = list(self._owners)
+        scheduler._next_tick = list(self._next_tick)
+        scheduler._handles = dict(self._handles)
+        scheduler._polled = defaultdict(list, {person_id: list(handles) for person_id, handles in self._polled.items()})
+        scheduler._heap = list(self._heap)
+        scheduler._pending = defaultdict(dict, {person_id: dict(handles)
+                                                for person_id, handles in self._pending.items()})
+        return scheduler
+
+    def replace_routine(self, rws: PersonRoutineWithStatus, new_rws: PersonRoutineWithStatus) -> None:
+        """
+        Swap a routine for another one with the same routine and status, keeping its place in the calendar.
+
+        :param rws: PersonRoutineWithStatus instance in the calendar
+        :param new_rws: PersonRoutineWithStatus instance that takes its place
+        """
+        handle = self._handles.pop(id(rws))
+        self._handles[id(new_rws)] = handle
+        self._routines[handle] = new_rws
+
+    def has_events(self, person_id: PersonID) -> bool:
+        """Return True if syncing the given person's routines at the current tick could change any of them."""
+        return person_id in self._pending or person_id in self._polled
+
+    def persons_with_events(self) -> Iterable[PersonID]:
+        """Return the ids of persons whose routines could change if synced at the current tick."""
+        return chain(self._pending, self._polled)
+
+    def advance(self, tick: int) -> None:
+        """
+        Move the routines with an event up to the given tick to the pending lists of their owners.
+
+        :param tick: current tick
+        """
+        self._tick = tick
+        heap = self._heap
+        while heap and heap[0][0] <= tick:
+            event_tick, handle = heapq.heappop(heap)
+            if self._next_tick[handle] != event_tick:
+                # stale entry, the routine was rescheduled
+                continue
+            self._next_tick[handle] = _NEVER
+            self._pending[self._owners[handle]][handle] = None
+
+    def _schedule(self, handle: int, tick: int) -> None:
+        self._next_tick[handle] = tick
+        if tick == _NEVER:
+            return
+        if tick <= self._tick:
+            self._next_tick[handle] = _NEVER
+            self._pending[self._owners[handle]][handle] = None
+        else:
+            heapq.heappush(self._heap, (tick, handle))
+
+    def _next_event_tick(self, rws: PersonRoutineWithStatus, tick: int) -> int:
+        """Return the first tick at or after the given tick at which syncing the routine would change its status."""
+        routine = rws.routine
+        if rws.done:
+            return routine.reset_when_done_trigger.next_trigger_tick(tick)
+        if rws.started:
+            # a started routine is only completed by execute_routines
+            return _NEVER
+
+        clock = self._clock
+        end_tick = tick + self._horizon
+        if rws.due:
+            # a due routine expires once it leaves the valid time
+            for t in range(tick, end_tick):
+                if not clock.contains(routine.valid_time, t):
+                    return t
+            return end_tick
+
+        start_trigger = routine.start_trigger
+        t = start_trigger.next_trigger_tick(tick)
+        while t < end_tick:
+            if clock.contains(routine.valid_time, t):
+                return t
+            t = start_trigger.next_trigger_tick(t + 1)
+        return end_tick
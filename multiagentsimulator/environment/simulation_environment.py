@@ -1,4 +1,5 @@
-from typing import List, Optional, Dict, Tuple, Mapping, Type, Sequence
+from copy import copy, deepcopy
+from typing import List, Optional, Dict, Tuple, Mapping, Type, Sequence, cast
 
 import gym
 
@@ -6,6 +7,7 @@ from .finish import DoneFunction
 from .interfaces import LocationID, PandemicObservation, NonEssentialBusinessLocationState, ChosenRegulation, \
     InfectionSummary
 from .simulator import Simulator
+from .simulator_ensemble import SimulatorEnsemble
 from .reward import RewardFunction, SumReward, RewardFunctionFactory, RewardFunctionType
 from .simulator_config import SimulationConfigs
 from .simulator_settings import SimulationSettings
@@ -100,34 +102,80 @@ class GymEnvironment(gym.Env):
         return self._last_reward
 
     def step(self, action: int) -> Tuple[PandemicObservation, float, bool, Dict]:
+        obs = self._begin_step(action)
+
+        # update the sim until next regulation interval trigger and construct obs from state hist
+        for i in range(self._sim_steps_per_regulation):
+            self._pandemic_sim.step()
+            self._record_sim_step(obs, i)
+
+        return self._end_step(obs, action)
+
+    @staticmethod
+    def step_ensemble(envs: Sequence['GymEnvironment'], ensemble: SimulatorEnsemble, actions: Sequence[Optional[int]]
+                      ) -> List[Optional[Tuple[PandemicObservation, float, bool, Dict]]]:
+        """
+        Step environments whose simulators are the replicates of an ensemble, with one action per environment. The
+        replicates are stepped in lockstep, see SimulatorEnsemble.step.
+
+        :param envs: one environment per replicate, envs[k] wraps ensemble.simulators[k]
+        :param ensemble: SimulatorEnsemble instance
+        :param actions: one action per environment, None for environments that are not stepped
+        :return: the step results of the environments, None for the environments that are not stepped
+        """
+        assert len(envs) == len(ensemble) == len(actions), 'Expected one environment and one action per replicate.'
+        assert all(env.pandemic_sim is sim for env, sim in zip(envs, ensemble.simulators)), (
+            'The environments must wrap the replicates of the ensemble.')
+        rows = [k for k, action in enumerate(actions) if action is not None]
+        assert len(set(envs[k]._sim_steps_per_regulation for k in rows)) <= 1, (
+            'The environments must have the same number of sim steps per regulation.')
+
+        observations = {k: envs[k]._begin_step(cast(int, actions[k])) for k in rows}
+        for i in range(envs[rows[0]]._sim_steps_per_regulation if rows else 0):
+            ensemble.step(rows)
+            for k in rows:
+                envs[k]._record_sim_step(observations[k], i)
+
+        return [envs[k]._end_step(observations[k], cast(int, actions[k])) if k in observations else None
+                for k in range(len(envs))]
+
+    def _begin_step(self, action: int) -> PandemicObservation:
+        # impose the regulation of the action and return the empty observation of the step
         assert self.action_space.contains(action), "%r (%s) invalid" % (action, type(action))
+        profiler = self._pandemic_sim.profiler
+        if profiler is not None:
+            profiler.begin_step('env_step', self._pandemic_sim.state.sim_time.tick)
 
         # execute the action if different from the current stage
         if action != self._last_observation.stage[-1, 0, 0]:  # stage has a TNC layout
             regulation = self._stage_to_regulation[action]
             self._pandemic_sim.impose_regulation(regulation=regulation)
+        if profiler is not None:
+            profiler.end_phase('regulation')
 
-        # update the sim until next regulation interval trigger and construct obs from state hist
-        obs = PandemicObservation.create_empty(
+        return PandemicObservation.create_empty(
             history_size=self._obs_history_size,
             num_non_essential_business=len(self._non_essential_business_loc_ids)
             if self._non_essential_business_loc_ids is not None else None)
 
-        hist_index = 0
-        for i in range(self._sim_steps_per_regulation):
-            # step sim
-            self._pandemic_sim.step()
+    def _record_sim_step(self, obs: PandemicObservation, i: int) -> None:
+        # store only the last self._history_size state values
+        hist_index = i - (self._sim_steps_per_regulation - self._obs_history_size)
+        if hist_index >= 0:
+            obs.update_obs_with_sim_state(self._pandemic_sim.state, hist_index, self._non_essential_business_loc_ids)
 
-            # store only the last self._history_size state values
-            if i >= (self._sim_steps_per_regulation - self._obs_history_size):
-                obs.update_obs_with_sim_state(self._pandemic_sim.state, hist_index,
-                                              self._non_essential_business_loc_ids)
-                hist_index += 1
+    def _end_step(self, obs: PandemicObservation, action: int) -> Tuple[PandemicObservation, float, bool, Dict]:
+        profiler = self._pandemic_sim.profiler
+        if profiler is not None:
+            profiler.end_phase('simulation')
 
         prev_obs = self._last_observation
         self._last_reward = self._reward_fn.calculate_reward(prev_obs, action, obs) if self._reward_fn else 0.
         done = self._done_fn.calculate_done(obs, action) if self._done_fn else False
         self._last_observation = obs
+        if profiler is not None:
+            profiler.end_phase('reward')
+            profiler.end_step()
 
         return self._last_observation, self._last_reward, done, {}
 
@@ -142,5 +190,23 @@ class GymEnvironment(gym.Env):
             self._done_fn.reset()
         return self._last_observation
 
+    def fork(self, n: int, seeds: Optional[Sequence[int]] = None) -> List['GymEnvironment']:
+        """
+        Fork the environment into n independent continuations of its current state, for example to compare
+        regulations from the same warmed up city. See Simulator.fork.
+
+        :param n: number of forks
+        :param seeds: optional seeds of the forks' random states
+        :return: a list of n GymEnvironment instances
+        """
+        envs = []
+        for sim in self._pandemic_sim.fork(n, seeds):
+            env = copy(self)
+            env._pandemic_sim = sim
+            env._reward_fn = deepcopy(self._reward_fn)
+            env._done_fn = deepcopy(self._done_fn)
+            envs.append(env)
+        return envs
+
     def render(self, mode: str = 'human') -> bool:
         pass
@@ -0,0 +1,124 @@
+from copy import copy
+from typing import Dict, Iterable, List, Optional, Sequence, Type
+
+import numpy as np
+
+from .interfaces import GlobalTestingState, IndividualInfectionState, InfectionSummary, SimulationState, \
+    sorted_infection_summary
+
+_SUMMARY_CODES: Dict[InfectionSummary, int] = {s: i for i, s in enumerate(sorted_infection_summary)}
+
+
+class SimulationSummary:
+    """Aggregate counters of a simulation that are updated incrementally as persons change state.
+
+    The counters are integer arrays indexed by the position of an infection summary in sorted_infection_summary or by
+    the code of a location type. The dict views of the SimulationState are only built from the counters when the state
+    is read.
+    """
+
+    location_types: List[Type]
+
+    infection_counts: np.ndarray
+    """Number of persons per infection summary, persons without an infection state are not counted"""
+
+    testing_counts: np.ndarray
+    """Number of persons per infection summary, as known from their test results"""
+
+    num_tests: int
+
+    location_type_infection_counts: np.ndarray
+    """Number of infections per type of the location in which they happened"""
+
+    _location_type_codes: Dict[Type, int]
+
+    def __init__(self, location_types: Sequence[Type]):
+        """
+        :param location_types: location types of the simulation, in the order of the location type infection summary
+        """
+        self.location_types = list(location_types)
+        self._location_type_codes = {t: i for i, t in enumerate(self.location_types)}
+        self.reset([])
+
+    def reset(self, infection_states: Iterable[Optional[IndividualInfectionState]]) -> None:
+        """
+        Reset the counters to those of a population with the given infection states that has not been tested yet.
+
+        :param infection_states: infection states of all persons
+        """
+        self.infection_counts = np.zeros(len(sorted_infection_summary), dtype=np.int64)
+        num_persons = 0
+        for infection_state in infection_states:
+            num_persons += 1
+            if infection_state is not None:
+                self.infection_counts[_SUMMARY_CODES[infection_state.summary]] += 1
+        self.testing_counts = np.zeros(len(sorted_infection_summary), dtype=np.int64)
+        self.testing_counts[_SUMMARY_CODES[InfectionSummary.NONE]] = num_persons
+        self.num_tests = 0
+        self.location_type_infection_counts = np.zeros(len(self.location_types), dtype=np.int64)
+
+    def count_infection_transition(self, prev: Optional[InfectionSummary], new: InfectionSummary) -> None:
+        """
+        Move a person from one infection summary to another.
+
+        :param prev: previous infection summary, None if the person had no infection state
+        :param new: new infection summary
+        """
+        if prev is not new:
+            if prev is not None:
+                self.infection_counts[_SUMMARY_CODES[prev]] -= 1
+            self.infection_counts[_SUMMARY_CODES[new]] += 1
+
+    def count_infection_in_location_type(self, location_type: Type) -> None:
+        """Count an infection that happened in a location of the given type."""
+        self.location_type_infection_counts[self._location_type_codes[location_type]] += 1
+
+    def count_test_transition(self, prev: InfectionSummary, new: InfectionSummary, num_tests: int = 1) -> None:
+        """
+        Move a person from one infection summary to another in the testing summary.
+
+        :param prev: infection summary of the previous test result
+        :param new: infection summary of the new test result
+        :param num_tests: number of tests that the transition counts as
+        """
+        self.testing_counts[_SUMMARY_CODES[prev]] -= 1
+        self.testing_counts[_SUMMARY_CODES[new]] += 1
+        self.num_tests += num_tests
+
+    def num_tested(self, summary: InfectionSummary) -> int:
+        """Return the number of persons in the given infection summary, as known from their test results."""
+        return int(self.testing_counts[_SUMMARY_CODES[summary]])
+
+    def update_state(self, state: SimulationState) -> None:
+        """Write the dict views of the counters into the given state."""
+        state.location_type_infection_summary = dict(zip(self.location_types,
+                                                         self.location_type_infection_counts.tolist()))
+        state.global_infection_summary = dict(zip(sorted_infection_summary, self.infection_counts.tolist()))
+        state.global_testing_state = GlobalTestingState(
+            summary=dict(zip(sorted_infection_summary, self.testing_counts.tolist())), num_tests=self.num_tests)
+
+    @staticmethod
+    def stack(summaries: Sequence['SimulationSummary']) -> Dict[str, np.ndarray]:
+        """
+        Stack the counters of summaries with the same location types into (len(summaries), ...) arrays. Each summary
+        is rebound to a row of the stacked counters, so that updates through the summaries show up in the stacked
+        arrays and the other way around.
+
+        :param summaries: a sequence of SimulationSummary instances with the same location types
+        :return: a dict from counter names to the stacked counters
+        """
+        assert len(set(tuple(summary.location_types) for summary in summaries)) == 1, (
+            'The summaries must count the same location types.')
+        counters = {}
+        for name in ('infection_counts', 'testing_counts', 'location_type_infection_counts'):
+            counters[name] = np.stack([getattr(summary, name) for summary in summaries])
+            for summary, row in zip(summaries, counters[name]):
+                setattr(summary, name, row)
+        return counters
+
+    def fork(self) -> 'SimulationSummary':
+        summary = copy(self)
+        summary.infection_counts = self.infection_counts.copy()
+        summary.testing_counts = self.testing_counts.copy()
+        summary.location_type_infection_counts = self.location_type_infection_counts.copy()
+        return summary
@@ -1,22 +1,92 @@
 
 from collections import defaultdict, OrderedDict
-from itertools import product as cartesianproduct, combinations
-from typing import DefaultDict, Dict, List, Optional, Sequence, cast, Type
+from copy import copy, deepcopy
+from os import PathLike
+from typing import DefaultDict, Dict, List, Optional, Sequence, Set, Tuple, Type, Union, cast
 
 import numpy as np
 from orderedset import OrderedSet
 
+from .contact_log import ContactLog
 from .trace_contacts import MaxSlotContactTracer
 from .model import SEIRModel, SpreadProbabilityParams
 from .interfaces import ContactRate, ContactTracer, ChosenRegulation, SimulationState, PandemicTesting, \
     PandemicTestResult, \
-    DEFAULT, GlobalTestingState, InfectionModel, InfectionSummary, Location, LocationID, Person, PersonID, Registry, \
-    SimulationTime, SimulationTimeInterval, sorted_infection_summary, globals, PersonRoutineAssignment
-from .location import Hospital
+    DEFAULT, GlobalTestingState, IndividualInfectionState, InfectionModel, InfectionSummary, Location, LocationID, \
+    Person, PersonID, Registry, \
+    Risk, LocationSummary, BaseLocation, BusinessLocationState, NonEssentialBusinessLocationState, SimulationClock, \
+    SimulationTime, SimulationTimeInterval, SimulationTimeTuple, SimulationTimeTuples, \
+    globals, PersonRoutineAssignment
+from .location import Hospital, HospitalState
+from .person import BasePerson
+from .population_store import PopulationStore
+from .routine_scheduler import RoutineScheduler
 from .generate_population import generate_population
 from .pandemic_testing_strategies import RandomPandemicTesting
+from .random_streams import RandomStreams
+from .simulation_summary import SimulationSummary
 from .simulator_config import SimulationConfigs
 from .simulator_settings import SimulationSettings
+from .step_profiler import StepProfiler
+from .simulator_snapshot import SimulatorSnapshot, decode_contact_rates, decode_time_tuples, encode_contact_rates, \
+    encode_rng, encode_time_tuples, pack_ragged, restore_rng, unpack_ragged, with_prefix
+from ..utils import unrank_pair_combinations, unrank_pair_products
+
+
+_PERSON_FLAGS = ('quarantine', 'quarantine_if_contact_positive', 'quarantine_if_household_quarantined', 'sick_at_home')
+
+_NO_PERSONS = np.zeros(0, dtype=np.int64)
+
+_POSITIVE_TEST_RESULTS = frozenset({PandemicTestResult.POSITIVE, PandemicTestResult.CRITICAL})
+
+# random streams of the simulator wide draws, the streams of persons and then locations follow
+_ORDER_STREAM, _INFECTION_STREAM, _TESTING_STREAM = range(3)
+_NUM_SIMULATOR_STREAMS = 3
+
+
+def _rng_states_equal(state1: Dict, state2: Dict) -> bool:
+    return state1.keys() == state2.keys() and all(
+        _rng_states_equal(v1, v2) if isinstance(v1, dict) else np.array_equal(v1, v2)
+        for v1, v2 in zip(state1.values(), state2.values()))
+
+
+def _seeds_from_rng(numpy_rng: np.random.RandomState, n: int) -> List[int]:
+    # derive seeds from the random state without advancing it
+    _, keys, pos, _, _ = numpy_rng.get_state()
+    return np.random.SeedSequence([*keys.tolist(), pos]).generate_state(n).tolist()
+
+
+def _attribution_rng_from(numpy_rng: np.random.RandomState) -> np.random.RandomState:
+    # the random state of infection location attribution, derived from the current random state without advancing it
+    return np.random.RandomState(_seeds_from_rng(numpy_rng, 2)[1])
+
+
+def _test_transition(new_result: PandemicTestResult,
+                     prev_result: PandemicTestResult) -> Optional[Tuple[InfectionSummary, InfectionSummary, int]]:
+    # the move of a person in the testing summary for a new test result, and the number of tests it counts as
+    if new_result == prev_result:
+        # nothing to update
+        return None
+
+    # person died - just update the test summary and __not__ the num_tests
+    if new_result == PandemicTestResult.DEAD and prev_result != PandemicTestResult.DEAD:
+        prv = InfectionSummary.CRITICAL if prev_result == PandemicTestResult.CRITICAL else \
+            InfectionSummary.INFECTED if prev_result == PandemicTestResult.POSITIVE else InfectionSummary.NONE
+        return prv, InfectionSummary.DEAD, 0
+
+    # person tested positive/critical
+    if (new_result in {PandemicTestResult.POSITIVE, PandemicTestResult.CRITICAL} and
+            prev_result in {PandemicTestResult.POSITIVE, PandemicTestResult.NEGATIVE, PandemicTestResult.UNTESTED}):
+        new = InfectionSummary.CRITICAL if new_result == PandemicTestResult.CRITICAL else InfectionSummary.INFECTED
+        prv = InfectionSummary.INFECTED if prev_result == PandemicTestResult.POSITIVE else InfectionSummary.NONE
+        return prv, new, 1
+
+    # person tested negative after having tested as infected before
+    if (new_result == PandemicTestResult.NEGATIVE and
+            prev_result in {PandemicTestResult.POSITIVE, PandemicTestResult.CRITICAL}):
+        prv = InfectionSummary.CRITICAL if prev_result == PandemicTestResult.CRITICAL else InfectionSummary.INFECTED
+        return prv, InfectionSummary.RECOVERED, 1
+    return None
 
 
 def generate_locations(sim_config: SimulationConfigs) -> List[Location]:
@@ -53,6 +123,23 @@ class Simulator:
     persons: Sequence[Person]
     locations: Sequence[Location]
     _state: SimulationState
+    _summary: SimulationSummary
+    _summary_stale: bool
+    _clock: SimulationClock
+    _routine_scheduler: Optional[RoutineScheduler]
+    _skip_idle_persons: bool
+    _verify_idle_persons: bool
+    _step_windows: SimulationTimeTuples
+    _idle: np.ndarray
+    _active_persons: List[Person]
+    _retired: np.ndarray
+    _retired_ids: Set[PersonID]
+    _num_retired_in_location: DefaultDict[LocationID, int]
+    _population_store: Optional[PopulationStore]
+    _random_streams: Optional[RandomStreams]
+    _attribution_numpy_rng: np.random.RandomState
+    _profiler: Optional[StepProfiler]
+    _contact_log: Optional[ContactLog]
 
     def __init__(self,
                  locations: Sequence[Location],
@@ -63,11 +150,21 @@ class Simulator:
                  new_time_slot_interval: SimulationTimeInterval = SimulationTimeInterval(day=1),
                  infection_update_interval: SimulationTimeInterval = SimulationTimeInterval(day=1),
                  person_routine_assignment: Optional[PersonRoutineAssignment] = None,
-                 infection_threshold: int = 0):
+                 infection_threshold: int = 0,
+                 use_population_store: bool = False,
+                 use_routine_scheduler: bool = True,
+                 skip_idle_persons: bool = True,
+                 verify_idle_persons: bool = False,
+                 use_random_streams: bool = False):
         assert globals.registry, 'No registry found. Create the repo wide registry first by calling init_globals()'
         self._registry = globals.registry
         self._numpy_rng = globals.numpy_rng
 
+        # persons and locations are indexed by the dense indices that the registry assigned to their ids
+        assert all(loc.id.index == i for i, loc in enumerate(locations)), (
+            'Locations must be given in the order of their registration.')
+        assert all(person.id.index == i for i, person in enumerate(persons)), (
+            'Persons must be given in the order of their registration.')
         self.id_to_location = OrderedDict({loc.id: loc for loc in locations})
         assert self._registry.location_ids.issuperset(self.id_to_location)
         self._id_to_person = OrderedDict({p.id: p for p in persons})
@@ -95,19 +192,67 @@ class Simulator:
                     f'Required location type {_loc.__name__} not found. Modify sim_config to include it.')
             person_routine_assignment.assign_routines(persons)
 
+        # back person states by a columnar store
+        self._population_store = None
+        if use_population_store:
+            self._population_store = PopulationStore(persons, locations)
+            for i, person in enumerate(persons):
+                cast(BasePerson, person).use_population_store(self._population_store, i)
+
         self._state = SimulationState(
             id_to_person_state={person.id: person.state for person in persons},
             id_to_location_state={location.id: location.state for location in locations},
-            location_type_infection_summary={type(location): 0 for location in locations},
-            global_infection_summary={s: 0 for s in sorted_infection_summary},
-            global_testing_state=GlobalTestingState(summary={s: len(persons) if s == InfectionSummary.NONE else 0
-                                                             for s in sorted_infection_summary},
-                                                    num_tests=0),
-            global_location_summary=self._registry.global_location_summary,
+            # the summaries are written from the simulation summary when the state is read
+            location_type_infection_summary={},
+            global_infection_summary={},
+            global_testing_state=GlobalTestingState(summary={}, num_tests=0),
+            global_location_summary={},
             sim_time=SimulationTime(),
             regulation_stage=0,
             infection_above_threshold=False
         )
+        self._clock = SimulationClock(self._state.sim_time)
+
+        # aggregate summaries are counted incrementally and written into the state when it is read
+        self._summary = SimulationSummary(list(self.type_to_locations))
+        self._summary.reset(person.state.infection_state for person in persons)
+        self._summary_stale = True
+
+        # contact tracing quarantine reads from the tracer whether persons had a positive contact
+        self._update_positive_persons()
+
+        # sync routines through an event calendar instead of polling them every step
+        self._routine_scheduler = None
+        if use_routine_scheduler:
+            self._routine_scheduler = RoutineScheduler(self._clock)
+            for person in persons:
+                cast(BasePerson, person).use_routine_scheduler(self._routine_scheduler)
+
+        # persons that are idle at home are not stepped, idleness relies on the routine scheduler for routine events
+        self._skip_idle_persons = skip_idle_persons and self._routine_scheduler is not None
+        self._verify_idle_persons = verify_idle_persons and self._routine_scheduler is not None
+        self._step_windows = SimulationTimeTuples([cast(BasePerson, person).step_window or SimulationTimeTuple(hours=())
+                                                   for person in persons])
+        self._idle = np.zeros(len(persons), dtype=bool)
+        self._update_idle_persons()
+
+        # dead persons that settled are retired from all per-hour loops
+        self._active_persons = list(persons)
+        self._retired = np.zeros(len(persons), dtype=bool)
+        self._retired_ids = set()
+        self._num_retired_in_location = defaultdict(int)
+
+        # draw from a counter based stream per entity and tick instead of the shared random state, so that the results
+        # do not depend on the order in which persons and locations are stepped
+        self._random_streams = None
+        if use_random_streams:
+            # the last stream samples the infection locations
+            self._use_random_streams(RandomStreams(_seeds_from_rng(self._numpy_rng, 1)[0],
+                                                   _NUM_SIMULATOR_STREAMS + len(persons) + len(locations) + 1))
+        self._attribution_numpy_rng = _attribution_rng_from(self._numpy_rng)
+
+        self._profiler = None
+        self._contact_log = None
 
     @classmethod
     def from_config(cls: Type['Simulator'],
@@ -143,15 +288,92 @@ class Simulator:
                          pandemic_testing=pandemic_testing,
                          contact_tracer=contact_tracer,
                          infection_threshold=sim_opts.infection_threshold,
-                         person_routine_assignment=sim_config.person_routine_assignment)
+                         person_routine_assignment=sim_config.person_routine_assignment,
+                         use_population_store=sim_opts.use_population_store,
+                         use_routine_scheduler=sim_opts.use_routine_scheduler,
+                         skip_idle_persons=sim_opts.skip_idle_persons,
+                         verify_idle_persons=sim_opts.verify_idle_persons,
+                         use_random_streams=sim_opts.use_random_streams)
 
     @property
     def registry(self) -> Registry:
         return self._registry
 
-    def _compute_contacts(self, location: Location) -> OrderedSet:
+    @property
+    def population_store(self) -> Optional[PopulationStore]:
+        return self._population_store
+
+    @property
+    def random_streams(self) -> Optional[RandomStreams]:
+        return self._random_streams
+
+    @property
+    def profiler(self) -> Optional[StepProfiler]:
+        return self._profiler
+
+    def use_profiler(self, profiler: Optional[StepProfiler]) -> None:
+        """
+        Record the phase times and counters of every step into the given profiler, or stop recording if None.
+
+        :param profiler: StepProfiler instance or None
+        """
+        self._profiler = profiler
+
+    @property
+    def contact_log(self) -> Optional[ContactLog]:
+        return self._contact_log
+
+    def use_contact_log(self, contact_log: Optional[ContactLog]) -> None:
+        """
+        Log the sampled contacts of every step into the given contact log, or stop logging if None. While a log is
+        used, the contacts of all locations are sampled, as they are for a contact tracer.
+
+        :param contact_log: ContactLog instance or None
+        """
+        self._contact_log = contact_log
+
+    def _use_random_streams(self, streams: RandomStreams) -> None:
+        self._random_streams = streams
+        for i, person in enumerate(self.persons):
+            cast(BasePerson, person).use_numpy_rng(streams.stream(_NUM_SIMULATOR_STREAMS + i))
+        self._infection_model = self._infection_model.fork(streams.stream(_INFECTION_STREAM))
+        self._pandemic_testing = self._pandemic_testing.fork(streams.stream(_TESTING_STREAM))
+
+    def _rng(self, stream_index: int) -> np.random.RandomState:
+        # the random state to draw from in the current tick
+        if self._random_streams is None:
+            return self._numpy_rng
+        return self._random_streams.seek(stream_index, self._clock.tick)
+
+    def _attribution_rng(self) -> np.random.RandomState:
+        # infection locations are sampled apart from the draws of the simulation, so they do not change its course
+        if self._random_streams is None:
+            return self._attribution_numpy_rng
+        return self._random_streams.seek(_NUM_SIMULATOR_STREAMS + len(self.persons) + len(self.locations),
+                                         self._clock.tick)
+
+    def _seek_person_stream(self, index: int) -> None:
+        if self._random_streams is not None:
+            self._random_streams.seek(_NUM_SIMULATOR_STREAMS + index, self._clock.tick)
+
+    def _compute_contacts(self, location: Location, trace: bool = True,
+                          index: bool = False) -> Tuple[OrderedSet, np.ndarray, np.ndarray]:
+        """
+        Sample the contacts of the persons in the location.
+
+        :param location: the location
+        :param trace: if True, return the contacts as an ordered set of person id pairs, otherwise the set is empty
+        :param index: if True, return the contacts as two arrays of dense person indices in the order of the set,
+            otherwise the arrays are empty. The arrays are always computed while a contact log is used.
+        :return: a tuple of the ordered set and the two arrays
+        """
         assignees = location.state.assignees_in_location
         visitors = location.state.visitors_in_location
+        numpy_rng = self._rng(_NUM_SIMULATOR_STREAMS + len(self.persons) + location.id.index)
+        if self._num_retired_in_location.get(location.id):
+            # retired persons do not make contacts
+            assignees = [p for p in assignees if p not in self._retired_ids]
+            visitors = [p for p in visitors if p not in self._retired_ids]
         cr = location.state.contact_rate
 
         groups = [(assignees, assignees),
@@ -162,147 +384,344 @@ class Simulator:
                        (cr.min_visitors, cr.fraction_visitors)]
 
         contacts: OrderedSet = OrderedSet()
+        contact_log = self._contact_log
+        index = index or contact_log is not None
+        persons1: List[np.ndarray] = []
+        persons2: List[np.ndarray] = []
 
         for grp, cst in zip(groups, constraints):
             grp1, grp2 = grp
             minimum, fraction = cst
 
-            possible_contacts = list(combinations(grp1, 2) if grp1 == grp2 else cartesianproduct(grp1, grp2))
-            num_possible_contacts = len(possible_contacts)
+            # pairs are never materialized, sampled ranks are mapped straight to pair indices following the order of
+            # itertools.combinations (same group) and itertools.product (across groups)
+            same_group = grp1 is grp2
+            num_possible_contacts = (len(grp1) * (len(grp1) - 1) // 2 if same_group else len(grp1) * len(grp2))
 
-            if len(possible_contacts) == 0:
+            if num_possible_contacts == 0:
                 continue
 
-            fraction_sample = min(1., max(0., self._numpy_rng.normal(fraction, 1e-2)))
+            fraction_sample = min(1., max(0., numpy_rng.normal(fraction, 1e-2)))
             real_fraction = max(minimum, int(fraction_sample * num_possible_contacts))
 
             # we are using an orderedset, it's repeatable
-            contact_idx = self._numpy_rng.randint(0, num_possible_contacts, real_fraction)
-            contacts.update([possible_contacts[idx] for idx in contact_idx])
-
-        return contacts
-
-    def _compute_infection_probabilities(self, contacts: OrderedSet) -> None:
-        infectious_states = {InfectionSummary.INFECTED, InfectionSummary.CRITICAL}
-
-        for c in contacts:
-            id_person1 = c[0]
-            id_person2 = c[1]
-            person1_state = self._id_to_person[id_person1].state
-            person2_state = self._id_to_person[id_person2].state
-            person1_inf_state = person1_state.infection_state
-            person2_inf_state = person2_state.infection_state
-
-            if (
-                    # both are not infectious
-                    (person1_inf_state is None and person2_inf_state is None) or
-
-                    # both are already infected
-                    (person1_inf_state is not None and person2_inf_state is not None and
-
-                     person1_inf_state.summary in infectious_states and person2_inf_state.summary in infectious_states)
-            ):
-                continue
-            elif person1_inf_state is not None and person1_inf_state.summary in infectious_states:
-                spread_probability = (person1_inf_state.spread_probability *
-                                      person1_state.infection_spread_multiplier)
-                person2_state.not_infection_probability *= 1 - spread_probability
-                person2_state.not_infection_probability_history.append((person2_state.current_location,
-                                                                        person2_state.not_infection_probability))
-            elif person2_inf_state is not None and person2_inf_state.summary in infectious_states:
-                spread_probability = (person2_inf_state.spread_probability *
-                                      person2_state.infection_spread_multiplier)
-                person1_state.not_infection_probability *= 1 - spread_probability
-                person1_state.not_infection_probability_history.append((person1_state.current_location,
-                                                                        person1_state.not_infection_probability))
-
-    def _update_global_testing_state(self, new_result: PandemicTestResult, prev_result: PandemicTestResult) -> None:
-        if new_result == prev_result:
-            # nothing to update
+            contact_idx = numpy_rng.randint(0, num_possible_contacts, real_fraction)
+            if same_group:
+                idx1, idx2 = unrank_pair_combinations(contact_idx, len(grp1))
+            else:
+                idx1, idx2 = unrank_pair_products(contact_idx, len(grp2))
+            members1 = list(grp1)
+            members2 = members1 if same_group else list(grp2)
+            if trace:
+                contacts.update([(members1[i], members2[j]) for i, j in zip(idx1.tolist(), idx2.tolist())])
+
+            if index:
+                # the distinct sampled pairs in the order of their first draw, as in the ordered set
+                _, first = np.unique(idx1 * len(members2) + idx2, return_index=True)
+                first.sort()
+                indices1 = np.fromiter((p.index for p in members1), dtype=np.int64, count=len(members1))
+                indices2 = indices1 if same_group else np.fromiter((p.index for p in members2), dtype=np.int64,
+                                                                   count=len(members2))
+                persons1.append(indices1[idx1[first]])
+                persons2.append(indices2[idx2[first]])
+
+        if not persons1:
+            return contacts, _NO_PERSONS, _NO_PERSONS
+        contact_persons1 = np.concatenate(persons1)
+        contact_persons2 = np.concatenate(persons2)
+        if contact_log is not None:
+            contact_log.append(self._clock.tick, location.id.index, contact_persons1, contact_persons2)
+        return contacts, contact_persons1, contact_persons2
+
+    def _infectious_spread_probabilities(self) -> Tuple[np.ndarray, np.ndarray]:
+        # which persons are infectious and with what probability they spread the infection through a contact
+        infectious = np.zeros(len(self.persons), dtype=bool)
+        spread_probabilities = np.zeros(len(self.persons))
+        for i in self._registry.infectious_person_indices():
+            person_state = self.persons[i].state
+            infectious[i] = True
+            spread_probabilities[i] = (cast(IndividualInfectionState, person_state.infection_state).spread_probability *
+                                       person_state.infection_spread_multiplier)
+        return infectious, spread_probabilities
+
+    def _compute_infection_probabilities(self, location_id: LocationID, persons1: np.ndarray, persons2: np.ndarray,
+                                         infectious: np.ndarray, spread_probabilities: np.ndarray) -> None:
+        # only contacts between an infectious and a non infectious person spread the infection
+        infectious1 = infectious[persons1]
+        exposures = infectious1 != infectious[persons2]
+        if not exposures.any():
             return
+        infectious1 = infectious1[exposures]
+        persons1 = persons1[exposures]
+        persons2 = persons2[exposures]
+        sources = np.where(infectious1, persons1, persons2)
+        targets = np.where(infectious1, persons2, persons1)
+
+        # the survival probabilities of the exposures are accumulated per exposed person as sums of logs
+        exposed, exposure_persons = np.unique(targets, return_inverse=True)
+        with np.errstate(divide='ignore'):
+            log_survival = np.bincount(exposure_persons, weights=np.log1p(-spread_probabilities[sources]),
+                                       minlength=len(exposed))
+        store = self._population_store
+        if store is not None:
+            prev_not_infection_probabilities = store.not_infection_probability[exposed]
+        else:
+            prev_not_infection_probabilities = np.fromiter(
+                (self.persons[i].state.not_infection_probability for i in exposed.tolist()), dtype=np.float64,
+                count=len(exposed))
+        not_infection_probabilities = prev_not_infection_probabilities * np.exp(log_survival)
+
+        # all exposures are in this location, so it becomes the infection location of an exposed person with the
+        # probability of its share of the person's infection probability so far, which attributes an infection to each
+        # location in proportion to the infection probability it added
+        uniforms = self._attribution_rng().uniform(size=len(exposed))
+        attributed = (uniforms * (1 - not_infection_probabilities) <
+                      prev_not_infection_probabilities - not_infection_probabilities)
+
+        if store is not None:
+            store.not_infection_probability[exposed] = not_infection_probabilities
+            store.infection_location[exposed[attributed]] = store.location_index(location_id)
+            return
+        for person_index, not_infection_probability, attribute in zip(exposed.tolist(),
+                                                                     not_infection_probabilities.tolist(),
+                                                                     attributed.tolist()):
+            person_state = self.persons[person_index].state
+            person_state.not_infection_probability = not_infection_probability
+            if attribute:
+                person_state.infection_location = location_id
 
-            # person died - just update the test summary and __not__ the num_tests
-        if new_result == PandemicTestResult.DEAD and prev_result != PandemicTestResult.DEAD:
-            prv = InfectionSummary.CRITICAL if prev_result == PandemicTestResult.CRITICAL else \
-                InfectionSummary.INFECTED if prev_result == PandemicTestResult.POSITIVE else InfectionSummary.NONE
-            self._state.global_testing_state.summary[InfectionSummary.DEAD] += 1
-            self._state.global_testing_state.summary[prv] -= 1
-
-        # person tested positive/critical
-        elif (new_result in {PandemicTestResult.POSITIVE, PandemicTestResult.CRITICAL} and
-              prev_result in {PandemicTestResult.POSITIVE, PandemicTestResult.NEGATIVE, PandemicTestResult.UNTESTED}):
-            new = InfectionSummary.CRITICAL if new_result == PandemicTestResult.CRITICAL else InfectionSummary.INFECTED
-            prv = InfectionSummary.INFECTED if prev_result == PandemicTestResult.POSITIVE else InfectionSummary.NONE
-            self._state.global_testing_state.summary[new] += 1
-            self._state.global_testing_state.summary[prv] -= 1
-            self._state.global_testing_state.num_tests += 1  # update number of tests
-
-        # person tested negative after having tested as infected before
-        elif (new_result == PandemicTestResult.NEGATIVE and
-              prev_result in {PandemicTestResult.POSITIVE, PandemicTestResult.CRITICAL}):
-            prv = InfectionSummary.CRITICAL if prev_result == PandemicTestResult.CRITICAL else InfectionSummary.INFECTED
-            self._state.global_testing_state.summary[InfectionSummary.RECOVERED] += 1
-            self._state.global_testing_state.summary[prv] -= 1
-            self._state.global_testing_state.num_tests += 1  # update number of tests
+    def _update_global_testing_state(self, new_result: PandemicTestResult, prev_result: PandemicTestResult) -> None:
+        transition = _test_transition(new_result, prev_result)
+        if transition is not None:
+            self._summary.count_test_transition(*transition)
 
     def step(self) -> None:
+        self._step_hour()
+        if self._clock.trigger(self._infection_update_interval):
+            self._update_infections()
+            self._update_after_infections()
+        self._end_step()
+
+    def _step_hour(self) -> None:
+        # the hourly part of a step: locations, person steps, contacts and the infection probabilities
+        sim_time = self._clock.sim_time
+        profiler = self._profiler
+        if profiler is not None:
+            stats = profiler.begin_step('sim_step', sim_time.tick)
+            locations_before = [person.state.current_location for person in self.persons]
+
         # sync all locations
         for location in self.id_to_location.values():
-            location.sync(self._state.sim_time)
+            location.sync(sim_time)
         self._registry.update_location_specific_information()
+        if profiler is not None:
+            profiler.end_phase('location_sync')
 
         # call person steps (randomize order)
-        for i in self._numpy_rng.randint(0, len(self.persons), len(self.persons)):
-            self.persons[i].step(self._state.sim_time, self._contact_tracer)
+        order = self._rng(_ORDER_STREAM).randint(0, len(self.persons), len(self.persons))
+        if self._retired_ids:
+            order = order[~self._retired[order]]
+        num_person_steps = len(order)
+        if self._verify_idle_persons:
+            self._step_persons_and_verify_idle(order, sim_time)
+        elif self._skip_idle_persons:
+            num_person_steps = self._step_active_persons(order, sim_time)
+        else:
+            for i in order:
+                self._seek_person_stream(i)
+                self.persons[i].step(sim_time, self._contact_tracer)
+        if profiler is not None:
+            profiler.end_phase('person_steps')
+            stats.num_person_steps = num_person_steps
+            stats.num_moves = sum(before != person.state.current_location
+                                  for before, person in zip(locations_before, self.persons))
 
         # update person contacts
+        trace = bool(self._contact_tracer)
+        spread: Optional[Tuple[np.ndarray, np.ndarray]] = None
         for location in self.id_to_location.values():
-            contacts = self._compute_contacts(location)
+            # if nobody can get infected here, only sample the contacts if they need to be traced or logged
+            infectious_present = self._registry.num_infectious_in_location(location.id) > 0
+            if not (infectious_present or trace or self._contact_log is not None):
+                continue
+
+            contacts, persons1, persons2 = self._compute_contacts(location, trace=trace, index=infectious_present)
+            if profiler is not None:
+                profiler.end_phase('contacts')
+                stats.num_locations += 1
+                stats.num_contacts += len(contacts) if trace else len(persons1)
 
             if self._contact_tracer:
                 self._contact_tracer.add_contacts(contacts)
-
-            self._compute_infection_probabilities(contacts)
-
-        # call infection model steps
-        if self._infection_update_interval.trigger_at_interval(self._state.sim_time):
-            global_infection_summary = {s: 0 for s in sorted_infection_summary}
-            for person in self._id_to_person.values():
-                # infection model step
-                person.state.infection_state = self._infection_model.step(person.state.infection_state,
-                                                                          person.id.age,
-                                                                          person.state.risk,
-                                                                          1 - person.state.not_infection_probability)
-                if person.state.infection_state.exposed_rnb != -1.:
-                    for vals in person.state.not_infection_probability_history:
-                        if person.state.infection_state.exposed_rnb < 1 - vals[1]:
-                            infection_location = vals[0]
-                            break
-
-                    person_location_type = self._registry.location_id_to_type(infection_location)
-                    self._state.location_type_infection_summary[person_location_type] += 1
-
-                global_infection_summary[person.state.infection_state.summary] += 1
-                person.state.not_infection_probability = 1.
-                person.state.not_infection_probability_history = []
-
-                # test the person for infection
-                if self._pandemic_testing.admit_person(person.state):
-                    new_test_result = self._pandemic_testing.test_person(person.state)
-                    self._update_global_testing_state(new_test_result, person.state.test_result)
-                    person.state.test_result = new_test_result
-
-            self._state.global_infection_summary = global_infection_summary
-        self._state.infection_above_threshold = (self._state.global_testing_state.summary[InfectionSummary.INFECTED]
+                if profiler is not None:
+                    profiler.end_phase('contact_tracer')
+
+            if infectious_present:
+                if spread is None:
+                    spread = self._infectious_spread_probabilities()
+                self._compute_infection_probabilities(location.id, persons1, persons2, *spread)
+                if profiler is not None:
+                    profiler.end_phase('infection_probabilities')
+
+    def _update_infections(self) -> None:
+        # the infection update and the testing of the active persons
+        profiler = self._profiler
+        persons = self._active_persons
+        self._rng(_INFECTION_STREAM)
+        self._rng(_TESTING_STREAM)
+
+        # infection model step for the whole population at once
+        infection_states = [person.state.infection_state for person in persons]
+        next_infection_states = self._infection_model.step_states(
+            infection_states,
+            np.fromiter((person.id.age for person in persons), dtype=np.int64, count=len(persons)),
+            [person.state.risk for person in persons],
+            np.fromiter((1 - person.state.not_infection_probability for person in persons), dtype=np.float64,
+                        count=len(persons)))
+        if profiler is not None:
+            profiler.end_phase('infection_model')
+            profiler.current.num_infection_transitions = sum(
+                (InfectionSummary.NONE if prev is None else prev.summary) != next_state.summary
+                for prev, next_state in zip(infection_states, next_infection_states))
+
+        for person, prev_infection_state, infection_state in zip(persons, infection_states,
+                                                                 next_infection_states):
+            person.state.infection_state = infection_state
+            self._summary.count_infection_transition(
+                prev_infection_state.summary if prev_infection_state is not None else None, infection_state.summary)
+            self._registry.update_infectious_presence(person.id)
+            if person.state.infection_state.exposed_rnb != -1.:
+                person_location_type = self._registry.location_id_to_type(
+                    cast(LocationID, person.state.infection_location))
+                self._summary.count_infection_in_location_type(person_location_type)
+
+            person.state.not_infection_probability = 1.
+            person.state.infection_location = None
+        if profiler is not None:
+            profiler.end_phase('infection_update')
+
+        # test the persons for infection
+        num_tests = 0
+        for person in persons:
+            if self._pandemic_testing.admit_person(person.state):
+                new_test_result = self._pandemic_testing.test_person(person.state)
+                self._update_global_testing_state(new_test_result, person.state.test_result)
+                person.state.test_result = new_test_result
+                num_tests += 1
+        if profiler is not None:
+            profiler.end_phase('testing')
+            profiler.current.num_tests = num_tests
+
+    def _update_after_infections(self) -> None:
+        self._retire_dead_persons()
+        self._update_idle_persons()
+        self._update_positive_persons()
+
+    def _end_step(self) -> None:
+        profiler = self._profiler
+        self._state.infection_above_threshold = (self._summary.num_tested(InfectionSummary.INFECTED)
                                                  >= self._infection_threshold)
+        self._summary_stale = True
 
-        self._state.global_location_summary = self._registry.global_location_summary
-
-        if self._contact_tracer and self._new_time_slot_interval.trigger_at_interval(self._state.sim_time):
+        if self._contact_tracer and self._clock.trigger(self._new_time_slot_interval):
             self._contact_tracer.new_time_slot()
 
-        # call sim time step
-        self._state.sim_time.step()
+        # advance the clock, this also updates the sim time in the state
+        self._clock.step()
+        if profiler is not None:
+            profiler.end_phase('bookkeeping')
+            profiler.end_step()
+
+    def _update_positive_persons(self) -> None:
+        if self._contact_tracer is None:
+            return
+        self._contact_tracer.set_positive_persons(np.fromiter(
+            (person.state.test_result in _POSITIVE_TEST_RESULTS for person in self.persons), dtype=bool,
+            count=len(self.persons)), [person.id for person in self.persons])
+
+    def _retire_dead_persons(self) -> None:
+        active_persons = []
+        for person in self._active_persons:
+            if cast(BasePerson, person).is_retired():
+                self._retired[person.id.index] = True
+                self._retired_ids.add(person.id)
+                self._num_retired_in_location[person.state.current_location] += 1
+            else:
+                active_persons.append(person)
+        self._active_persons = active_persons
+
+    def _update_idle_persons(self) -> None:
+        for i, person in enumerate(self.persons):
+            self._idle[i] = cast(BasePerson, person).is_idle()
+
+    def _idle_mask(self, sim_time: SimulationTime, in_step_window: np.ndarray) -> np.ndarray:
+        # persons that would not do anything in a step at the current time
+        assert self._routine_scheduler
+        self._routine_scheduler.advance(sim_time.tick)
+        idle = self._idle & ~in_step_window
+        for person_id in self._routine_scheduler.persons_with_events():
+            idle[person_id.index] = False
+        return idle
+
+    def _step_active_persons(self, order: np.ndarray, sim_time: SimulationTime) -> int:
+        assert self._routine_scheduler
+        in_step_window = self._step_windows.contains(sim_time)
+        idle = self._idle_mask(sim_time, in_step_window)
+
+        # A skipped step of an idle person would only have drawn its regulation compliance sample. Draw the samples
+        # of skipped steps in bulk to keep the random stream identical to stepping everyone. Persons with their own
+        # random streams need no samples, their next step seeks their stream anyway. Persons idle at the start of the
+        # hour stay idle, since only a person's own step can change its idleness.
+        shared_rng = self._random_streams is None
+        last_stepped = -1
+        num_stepped = 0
+        for pos in np.flatnonzero(~idle[order]):
+            i = order[pos]
+            if idle[i]:
+                continue
+            if pos - last_stepped > 1 and shared_rng:
+                self._numpy_rng.random_sample(pos - last_stepped - 1)
+            last_stepped = pos
+
+            person = cast(BasePerson, self.persons[i])
+            self._seek_person_stream(i)
+            person.step(sim_time, self._contact_tracer)
+            num_stepped += 1
+            self._idle[i] = person.is_idle()
+            idle[i] = self._idle[i] and not in_step_window[i] and not self._routine_scheduler.has_events(person.id)
+        if len(order) - last_stepped > 1 and shared_rng:
+            self._numpy_rng.random_sample(len(order) - last_stepped - 1)
+        return num_stepped
+
+    def _step_persons_and_verify_idle(self, order: np.ndarray, sim_time: SimulationTime) -> None:
+        assert self._routine_scheduler
+        in_step_window = self._step_windows.contains(sim_time)
+        idle = self._idle_mask(sim_time, in_step_window)
+
+        # step everyone and check that the steps of idle persons are equivalent to a single compliance sample
+        for i in order:
+            person = cast(BasePerson, self.persons[i])
+            self._seek_person_stream(i)
+            if not idle[i]:
+                person.step(sim_time, self._contact_tracer)
+            else:
+                numpy_rng = person.numpy_rng
+                rng_state = numpy_rng.get_state(legacy=False)
+                numpy_rng.random_sample()
+                expected_rng_state = numpy_rng.get_state(legacy=False)
+                numpy_rng.set_state(rng_state)
+                person_state = deepcopy(person.state)
+                routines = [copy(rws) for rws in person.routines_with_status]
+
+                person.step(sim_time, self._contact_tracer)
+
+                assert _rng_states_equal(numpy_rng.get_state(legacy=False), expected_rng_state), (
+                    f'Step of idle person {person.id} at {sim_time} drew an unexpected amount of random numbers.')
+                assert deepcopy(person.state) == person_state and list(person.routines_with_status) == routines, (
+                    f'Step of idle person {person.id} at {sim_time} changed its state.')
+                assert person.is_idle(), f'Idle person {person.id} is no longer idle after a step at {sim_time}.'
+            self._idle[i] = person.is_idle()
+            idle[i] = self._idle[i] and not in_step_window[i] and not self._routine_scheduler.has_events(person.id)
 
     def step_day(self, hours_in_a_day: int = 24) -> None:
         for _ in range(hours_in_a_day):
@@ -344,6 +763,7 @@ class Simulator:
         # update person policy
         for person in self._id_to_person.values():
             person.receive_regulation(regulation)
+        self._update_idle_persons()
 
         self._state.regulation_stage = regulation.stage
 
@@ -354,7 +774,10 @@ class Simulator:
 
         :return: Current state of the simulator.
         """
-
+        if self._summary_stale:
+            self._summary.update_state(self._state)
+            self._state.global_location_summary = self._registry.global_location_summary
+            self._summary_stale = False
         return self._state
 
     def reset(self) -> None:
@@ -365,18 +788,379 @@ class Simulator:
 
         self._infection_model.reset()
 
-        num_persons = len(self._id_to_person)
         self._state = SimulationState(
             id_to_person_state={person_id: person.state for person_id, person in self._id_to_person.items()},
             id_to_location_state={loc_id: loc.state for loc_id, loc in self.id_to_location.items()},
-            location_type_infection_summary={type(location): 0 for location in self.id_to_location.values()},
-
-            global_infection_summary={s: 0 for s in sorted_infection_summary},
-            global_location_summary=self._registry.global_location_summary,
-            global_testing_state=GlobalTestingState(summary={s: num_persons if s == InfectionSummary.NONE else 0
-                                                             for s in sorted_infection_summary},
-                                                    num_tests=0),
+            location_type_infection_summary={},
+            global_infection_summary={},
+            global_testing_state=GlobalTestingState(summary={}, num_tests=0),
+            global_location_summary={},
             sim_time=SimulationTime(),
             regulation_stage=0,
             infection_above_threshold=False,
         )
+        self._clock = SimulationClock(self._state.sim_time)
+        self._summary.reset(person.state.infection_state for person in self.persons)
+        self._summary_stale = True
+        if self._routine_scheduler is not None:
+            self._routine_scheduler.reset(self._clock)
+        self._update_idle_persons()
+        self._active_persons = list(self.persons)
+        self._retired[:] = False
+        self._retired_ids = set()
+        self._num_retired_in_location = defaultdict(int)
+        if self._random_streams is not None:
+            # every episode draws from new streams
+            self._random_streams.reseed(int(np.random.SeedSequence(self._random_streams.seed).generate_state(1)[0]))
+        # like the streams, the attribution does not depend on the draws of earlier episodes
+        self._attribution_numpy_rng = _attribution_rng_from(self._numpy_rng)
+        self._update_positive_persons()
+
+    def _location_type_lookup(self) -> Dict[str, Type]:
+        types: Dict[str, Type] = {t.__name__: t for t in self.type_to_locations}
+        for person in self.persons:
+            types.update({t.__name__: t for t in person.state.avoid_location_types})
+        return types
+
+    def snapshot(self) -> SimulatorSnapshot:
+        """
+        Capture the mutable state of the simulator in flat numpy arrays. This includes person states, routine status,
+        location occupancy, the contact tracer memory, infection model counters, the random state and the clock.
+        The snapshot can be restored into this simulator or any simulator built the same way.
+
+        :return: SimulatorSnapshot instance
+        """
+        persons = [cast(BasePerson, person) for person in self.persons]
+        person_states = [person.state for person in persons]
+        locations = list(self.id_to_location.values())
+        location_states = [location.state for location in locations]
+        location_index = {loc_id: i for i, loc_id in enumerate(self.id_to_location)}
+        type_names = sorted(set(t.__name__ for s in person_states for t in s.avoid_location_types))
+        type_index = {name: i for i, name in enumerate(type_names)}
+
+        arrays: Dict[str, np.ndarray] = {}
+
+        # persons
+        arrays['person.current_location'] = np.asarray([location_index[s.current_location] for s in person_states],
+                                                       dtype=np.int32)
+        arrays['person.risk'] = np.asarray([s.risk.value for s in person_states], dtype=np.int8)
+        arrays['person.infection_spread_multiplier'] = np.asarray([s.infection_spread_multiplier
+                                                                   for s in person_states], dtype=np.float64)
+        for name in _PERSON_FLAGS:
+            arrays[f'person.{name}'] = np.asarray([getattr(s, name) for s in person_states], dtype=bool)
+        arrays['person.avoid_gathering_size'] = np.asarray([s.avoid_gathering_size for s in person_states],
+                                                           dtype=np.int32)
+        arrays['person.test_result'] = np.asarray([int(s.test_result) for s in person_states], dtype=np.int8)
+        arrays['person.not_infection_probability'] = np.asarray([s.not_infection_probability for s in person_states],
+                                                                dtype=np.float64)
+        arrays['location_type_names'] = np.asarray(type_names, dtype=str)
+        arrays['person.avoid_location_types_offsets'], arrays['person.avoid_location_types'] = pack_ragged(
+            [[type_index[t.__name__] for t in s.avoid_location_types] for s in person_states], np.int16)
+        arrays['person.infection_location'] = np.asarray(
+            [-1 if s.infection_location is None else location_index[s.infection_location] for s in person_states],
+            dtype=np.int32)
+        arrays['person.go_home'] = np.asarray([person.go_home for person in persons], dtype=bool)
+        arrays['person.quarantined'] = np.asarray([self._registry.get_person_quarantined_state(person.id)
+                                                   for person in persons], dtype=bool)
+        arrays['person.retired'] = self._retired.copy()
+        arrays.update(with_prefix('infection_state.', self._infection_model.encode_states(
+            [s.infection_state for s in person_states])))
+
+        # routines
+        routines = [person.routines_with_status for person in persons]
+        all_routines = [rws for rs in routines for rws in rs]
+        arrays['routine.offsets'] = np.zeros(len(routines) + 1, dtype=np.int64)
+        np.cumsum([len(rs) for rs in routines], out=arrays['routine.offsets'][1:])
+        for name in ('due', 'started', 'done'):
+            arrays[f'routine.{name}'] = np.asarray([getattr(rws, name) for rws in all_routines], dtype=bool)
+        arrays['routine.duration'] = np.asarray([rws.duration for rws in all_routines], dtype=np.int32)
+        arrays['routine.end_loc_selected'] = np.asarray([-1 if rws.end_loc_selected is None
+                                                         else location_index[rws.end_loc_selected]
+                                                         for rws in all_routines], dtype=np.int32)
+
+        # locations
+        for name in ('assignees', 'assignees_in_location', 'visitors_in_location'):
+            arrays[f'location.{name}_offsets'], arrays[f'location.{name}'] = pack_ragged(
+                [[pid.index for pid in getattr(s, name)] for s in location_states], np.int32)
+        arrays['location.is_open'] = np.asarray([s.is_open for s in location_states], dtype=bool)
+        arrays['location.social_gathering_event'] = np.asarray([s.social_gathering_event for s in location_states],
+                                                               dtype=bool)
+        arrays['location.locked'] = np.asarray([isinstance(s, NonEssentialBusinessLocationState) and s.locked
+                                                for s in location_states], dtype=bool)
+        arrays['location.visitor_capacity'] = np.asarray([s.visitor_capacity for s in location_states], dtype=np.int64)
+        hospital_states = [s if isinstance(s, HospitalState) else None for s in location_states]
+        arrays['location.patients_offsets'], arrays['location.patients'] = pack_ragged(
+            [sorted(pid.index for pid in s.patients_in_location) if s else [] for s in hospital_states],
+            np.int32)
+        arrays['location.num_admitted_patients'] = np.asarray([s.num_admitted_patients if s else 0
+                                                               for s in hospital_states], dtype=np.int64)
+        arrays['location.patient_capacity'] = np.asarray([s.patient_capacity if s else -1 for s in hospital_states],
+                                                         dtype=np.int64)
+        arrays.update(with_prefix('location.contact_rate.',
+                                  encode_contact_rates([s.contact_rate for s in location_states])))
+        arrays.update(with_prefix('location.visitor_time.',
+                                  encode_time_tuples([s.visitor_time for s in location_states])))
+        arrays.update(with_prefix('location.open_time.', encode_time_tuples(
+            [s.open_time if isinstance(s, BusinessLocationState) else SimulationTimeTuple() for s in location_states])))
+
+        # registry
+        summary = self._registry.global_location_summary
+        arrays['location_summary.keys'] = np.asarray(list(summary.keys()), dtype=str).reshape(-1, 2)
+        arrays['location_summary.entry_count'] = np.asarray([s.entry_count for s in summary.values()],
+                                                            dtype=np.float64)
+        arrays['location_summary.visitor_count'] = np.asarray([s.visitor_count for s in summary.values()],
+                                                              dtype=np.float64)
+
+        # simulation state
+        state = self._state
+        summary = self._summary
+        arrays['state.location_type_names'] = np.asarray([t.__name__ for t in summary.location_types], dtype=str)
+        arrays['state.location_type_infection_summary'] = summary.location_type_infection_counts.copy()
+        arrays['state.global_infection_summary'] = summary.infection_counts.copy()
+        arrays['state.global_testing_summary'] = summary.testing_counts.copy()
+        arrays['state.num_tests'] = np.asarray(summary.num_tests, dtype=np.int64)
+        arrays['state.infection_above_threshold'] = np.asarray(state.infection_above_threshold, dtype=bool)
+        arrays['state.regulation_stage'] = np.asarray(state.regulation_stage, dtype=np.int64)
+        arrays['clock.tick'] = np.asarray(self._clock.tick, dtype=np.int64)
+        arrays['clock.week_day'] = np.asarray(self._clock.week_day, dtype=np.int64)
+
+        # models and random state
+        arrays.update(with_prefix('infection_model.', self._infection_model.snapshot()))
+        if self._contact_tracer is not None:
+            arrays.update(with_prefix('contact_tracer.', self._contact_tracer.snapshot()))
+        arrays.update(with_prefix('rng.', encode_rng(self._numpy_rng)))
+        arrays.update(with_prefix('attribution_rng.', encode_rng(self._attribution_numpy_rng)))
+        if self._random_streams is not None:
+            arrays['random_streams.seed'] = np.asarray(self._random_streams.seed, dtype=np.uint64)
+
+        return SimulatorSnapshot(arrays)
+
+    def restore(self, snapshot: SimulatorSnapshot) -> None:
+        """
+        Restore the mutable state of the simulator from a snapshot taken with snapshot().
+
+        :param snapshot: SimulatorSnapshot instance
+        """
+        arrays = snapshot.arrays
+        persons = [cast(BasePerson, person) for person in self.persons]
+        location_ids = list(self.id_to_location)
+        person_ids = [person.id for person in persons]
+        assert len(arrays['person.current_location']) == len(persons), 'The snapshot has a different population.'
+        assert len(arrays['location.is_open']) == len(location_ids), 'The snapshot has different locations.'
+        type_lookup = self._location_type_lookup()
+        avoid_types = [type_lookup[str(name)] for name in arrays['location_type_names']]
+
+        # persons
+        infection_states = self._infection_model.decode_states(snapshot.subset('infection_state.'))
+        avoid_location_types = unpack_ragged(arrays['person.avoid_location_types_offsets'],
+                                             arrays['person.avoid_location_types'])
+        flags = {name: arrays[f'person.{name}'].tolist() for name in _PERSON_FLAGS}
+        columns = zip(persons, arrays['person.current_location'].tolist(), arrays['person.risk'].tolist(),
+                      infection_states, arrays['person.infection_spread_multiplier'].tolist(),
+                      arrays['person.avoid_gathering_size'].tolist(), arrays['person.test_result'].tolist(),
+                      arrays['person.not_infection_probability'].tolist(), avoid_location_types,
+                      arrays['person.infection_location'].tolist(), arrays['person.go_home'].tolist(),
+                      arrays['person.quarantined'].tolist())
+        for i, (person, loc, risk, infection_state, multiplier, gathering_size, test_result, not_infection_probability,
+                avoid_types_i, infection_loc, go_home, quarantined) in enumerate(columns):
+            person_state = person.state
+            person_state.current_location = location_ids[loc]
+            person_state.risk = Risk(risk)
+            person_state.infection_state = infection_state
+            person_state.infection_spread_multiplier = multiplier
+            for name in _PERSON_FLAGS:
+                setattr(person_state, name, flags[name][i])
+            person_state.avoid_gathering_size = gathering_size
+            person_state.test_result = PandemicTestResult(test_result)
+            person_state.not_infection_probability = not_infection_probability
+            person_state.avoid_location_types = [avoid_types[t] for t in avoid_types_i]
+            person_state.infection_location = None if infection_loc < 0 else location_ids[infection_loc]
+            person.go_home = go_home
+            if quarantined:
+                self._registry.quarantine_person(person.id)
+            else:
+                self._registry.clear_quarantined(person.id)
+
+        # routines
+        routine_offsets = arrays['routine.offsets'].tolist()
+        routine_columns = list(zip(arrays['routine.due'].tolist(), arrays['routine.started'].tolist(),
+                                   arrays['routine.done'].tolist(), arrays['routine.duration'].tolist(),
+                                   arrays['routine.end_loc_selected'].tolist()))
+        for person, start, end in zip(persons, routine_offsets[:-1], routine_offsets[1:]):
+            routines = person.routines_with_status
+            assert len(routines) == end - start, f'The snapshot has different routines for person {person.id}.'
+            for rws, (due, started, done, duration, end_loc) in zip(routines, routine_columns[start:end]):
+                rws.due, rws.started, rws.done, rws.duration = due, started, done, duration
+                rws.end_loc_selected = None if end_loc == -1 else location_ids[end_loc]
+
+        # locations
+        occupancy = {name: unpack_ragged(arrays[f'location.{name}_offsets'], arrays[f'location.{name}'])
+                     for name in ('assignees', 'assignees_in_location', 'visitors_in_location')}
+        patients = unpack_ragged(arrays['location.patients_offsets'], arrays['location.patients'])
+        contact_rates = decode_contact_rates(snapshot.subset('location.contact_rate.'))
+        visitor_times = decode_time_tuples(snapshot.subset('location.visitor_time.'))
+        open_times = decode_time_tuples(snapshot.subset('location.open_time.'))
+        for i, location in enumerate(self.id_to_location.values()):
+            location_state = location.state
+            for name, members in occupancy.items():
+                setattr(location_state, name, OrderedSet(person_ids[p] for p in members[i]))
+            location_state.is_open = bool(arrays['location.is_open'][i])
+            location_state.social_gathering_event = bool(arrays['location.social_gathering_event'][i])
+            location_state.visitor_capacity = int(arrays['location.visitor_capacity'][i])
+            location_state.contact_rate = contact_rates[i]
+            location_state.visitor_time = visitor_times[i]
+            if isinstance(location_state, BusinessLocationState):
+                location_state.open_time = open_times[i]
+            if isinstance(location_state, NonEssentialBusinessLocationState):
+                location_state.locked = bool(arrays['location.locked'][i])
+            if isinstance(location_state, HospitalState):
+                location_state.patients_in_location = set(person_ids[p] for p in patients[i])
+                location_state.num_admitted_patients = int(arrays['location.num_admitted_patients'][i])
+                location_state.patient_capacity = int(arrays['location.patient_capacity'][i])
+
+        # registry
+        self._registry.update_global_location_summary({
+            (str(loc_type), str(person_type)): LocationSummary(entry_count=entry_count, visitor_count=visitor_count)
+            for (loc_type, person_type), entry_count, visitor_count in zip(
+                arrays['location_summary.keys'].tolist(), arrays['location_summary.entry_count'].tolist(),
+                arrays['location_summary.visitor_count'].tolist())})
+        for person_id in person_ids:
+            self._registry.update_infectious_presence(person_id)
+        self._registry.update_location_specific_information()
+
+        # simulation state
+        state = self._state
+        summary = self._summary
+        location_type_counts = dict(zip(arrays['state.location_type_names'].tolist(),
+                                        arrays['state.location_type_infection_summary'].tolist()))
+        summary.location_type_infection_counts = np.asarray(
+            [location_type_counts.get(t.__name__, 0) for t in summary.location_types], dtype=np.int64)
+        summary.infection_counts = arrays['state.global_infection_summary'].astype(np.int64)
+        summary.testing_counts = arrays['state.global_testing_summary'].astype(np.int64)
+        summary.num_tests = int(arrays['state.num_tests'])
+        self._summary_stale = True
+        state.infection_above_threshold = bool(arrays['state.infection_above_threshold'])
+        state.regulation_stage = int(arrays['state.regulation_stage'])
+        state.sim_time = SimulationTime.from_tick(int(arrays['clock.tick']), int(arrays['clock.week_day']))
+        self._clock = SimulationClock(state.sim_time)
+
+        # models and random state
+        self._infection_model.restore(snapshot.subset('infection_model.'))
+        if self._contact_tracer is not None:
+            self._contact_tracer.restore(snapshot.subset('contact_tracer.'), person_ids)
+        restore_rng(self._numpy_rng, snapshot.subset('rng.'))
+        restore_rng(self._attribution_numpy_rng, snapshot.subset('attribution_rng.'))
+        if self._random_streams is not None:
+            assert 'random_streams.seed' in arrays, 'The snapshot was taken without random streams.'
+            self._random_streams.reseed(int(arrays['random_streams.seed']))
+
+        # derived simulator state
+        self._retired = arrays['person.retired'].copy()
+        self._retired_ids = set(person_ids[i] for i in np.flatnonzero(self._retired))
+        self._num_retired_in_location = defaultdict(int)
+        for i in np.flatnonzero(self._retired):
+            self._num_retired_in_location[persons[i].state.current_location] += 1
+        self._active_persons = [person for person, retired in zip(self.persons, self._retired) if not retired]
+        if self._routine_scheduler is not None:
+            self._routine_scheduler.reset(self._clock)
+        self._update_idle_persons()
+        self._update_positive_persons()
+
+    def fork(self, n: int, seeds: Optional[Sequence[int]] = None) -> List['Simulator']:
+        """
+        Fork the simulator into n independent continuations of its current state. The forks share the static
+        structure of this simulator (location assignments, routines, households and positions) and copy only its
+        mutable state, so forking is much cheaper than building a new simulator. Each fork draws from its own random
+        state, or from its own random streams if this simulator uses random streams.
+
+        :param n: number of forks
+        :param seeds: optional seeds of the forks' random states. By default the seeds are derived from the current
+            random state of this simulator, or from the seed of its random streams and the current tick, without
+            advancing either.
+        :return: a list of n Simulator instances
+        """
+        if seeds is None:
+            if self._random_streams is None:
+                seeds = _seeds_from_rng(self._numpy_rng, n)
+            else:
+                seeds = np.random.SeedSequence(self._random_streams.seed,
+                                               spawn_key=(self._clock.tick,)).generate_state(n).tolist()
+        assert len(seeds) == n, 'Expected one seed per fork.'
+        return [self._fork(seed) for seed in seeds]
+
+    def _fork(self, seed: int) -> 'Simulator':
+        numpy_rng = np.random.RandomState(seed)
+        sim = copy(self)
+        sim._numpy_rng = numpy_rng
+        sim._attribution_numpy_rng = _attribution_rng_from(numpy_rng)
+
+        location_register: Dict[LocationID, Location] = {}
+        person_register: Dict[PersonID, Person] = {}
+        registry = self._registry.fork(location_register, person_register)
+        sim._registry = registry
+
+        for loc_id, location in self.id_to_location.items():
+            location_register[loc_id] = cast(BaseLocation, location).fork(registry, numpy_rng)
+        sim.id_to_location = OrderedDict(location_register)
+        sim.locations = list(location_register.values())
+        sim.type_to_locations = defaultdict(list)
+        for location in sim.locations:
+            sim.type_to_locations[type(location)].append(location)
+
+        state = self._state
+        sim_time = copy(state.sim_time)
+        sim._clock = SimulationClock(sim_time)
+        sim._population_store = self._population_store.fork() if self._population_store is not None else None
+        sim._routine_scheduler = (self._routine_scheduler.fork(sim._clock) if self._routine_scheduler is not None
+                                  else None)
+        for person in self.persons:
+            person_register[person.id] = cast(BasePerson, person).fork(registry, numpy_rng, sim._population_store,
+                                                                       sim._routine_scheduler)
+        sim._id_to_person = OrderedDict(person_register)
+        sim.persons = list(person_register.values())
+
+        sim._infection_model = self._infection_model.fork(numpy_rng)
+        sim._pandemic_testing = self._pandemic_testing.fork(numpy_rng)
+        sim._contact_tracer = self._contact_tracer.fork() if self._contact_tracer is not None else None
+        # a contact log holds a single run, forks do not log
+        sim._contact_log = None
+        sim._summary = self._summary.fork()
+        sim._summary_stale = True
+
+        sim._state = SimulationState(
+            id_to_person_state={person_id: person.state for person_id, person in sim._id_to_person.items()},
+            id_to_location_state={loc_id: loc.state for loc_id, loc in sim.id_to_location.items()},
+            location_type_infection_summary={},
+            global_infection_summary={},
+            global_testing_state=GlobalTestingState(summary={}, num_tests=0),
+            global_location_summary={},
+            sim_time=sim_time,
+            regulation_stage=state.regulation_stage,
+            infection_above_threshold=state.infection_above_threshold
+        )
+
+        sim._idle = self._idle.copy()
+        sim._active_persons = [person for person, retired in zip(sim.persons, self._retired) if not retired]
+        sim._retired = self._retired.copy()
+        sim._retired_ids = set(self._retired_ids)
+        sim._num_retired_in_location = defaultdict(int, self._num_retired_in_location)
+        sim._profiler = None
+        if self._random_streams is not None:
+            sim._use_random_streams(RandomStreams(seed, len(self._random_streams)))
+        return sim
+
+    def save(self, path: Union[str, PathLike]) -> None:
+        """
+        Save a snapshot of the simulator to a file.
+
+        :param path: path of the file
+        """
+        self.snapshot().save(path)
+
+    def load(self, path: Union[str, PathLike]) -> None:
+        """
+        Restore the simulator from a file written by save().
+
+        :param path: path of the file
+        """
+        self.restore(SimulatorSnapshot.load(path))
@@ -1,12 +1,13 @@
 import dataclasses
 from dataclasses import dataclass, field
-from typing import Sequence, Type, Any, Dict, Optional, List
-
-from geopandas import GeoDataFrame
+from typing import Sequence, Type, Any, Dict, Optional, List, TYPE_CHECKING
 
 from .interfaces import BaseLocation, PersonRoutineAssignment
 from .location import Hospital, HospitalState
 
+if TYPE_CHECKING:
+    from geopandas import GeoDataFrame
+
 
 @dataclass
 class LocationConfigs:
@@ -16,7 +17,7 @@ class LocationConfigs:
 
     num_assignees: int = -1
 
-    positions: GeoDataFrame = field(default_factory=list)
+    positions: 'GeoDataFrame' = field(default_factory=list)
 
     state_opts: Dict[str, Any] = field(default_factory=dict)
 
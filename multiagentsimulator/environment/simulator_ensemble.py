@@ -0,0 +1,288 @@
+import dataclasses
+from typing import Dict, List, Optional, Sequence, Type, Union, cast
+
+import numpy as np
+
+from .city_registry import CityRegistry
+from .interfaces import ChosenRegulation, InfectionModel, InfectionSummary, LocationID, PandemicObservation, \
+    PandemicTestResult, Risk, globals, sorted_infection_summary
+from .pandemic_testing_strategies import RandomPandemicTesting
+from .population_store import PopulationStore
+from .simulation_summary import SimulationSummary
+from .simulator import Simulator, _seeds_from_rng, _test_transition
+from .simulator_config import SimulationConfigs
+from .simulator_settings import SimulationSettings
+
+_SUMMARY_CODES: Dict[InfectionSummary, int] = {s: i for i, s in enumerate(sorted_infection_summary)}
+_RISKS: np.ndarray = np.asarray(sorted(Risk, key=lambda x: x.value), dtype=object)
+
+
+def _test_transition_table() -> np.ndarray:
+    # the move in the testing summary, (previous summary code, new summary code, number of tests), of each pair of
+    # previous and new test results, -1 codes for pairs that do not move a person
+    results = sorted(PandemicTestResult)
+    table = np.full((len(results), len(results), 3), -1, dtype=np.int64)
+    for prev_result in results:
+        for new_result in results:
+            transition = _test_transition(new_result, prev_result)
+            if transition is not None:
+                prv, new, num_tests = transition
+                table[prev_result.value, new_result.value] = _SUMMARY_CODES[prv], _SUMMARY_CODES[new], num_tests
+    return table
+
+
+_TEST_TRANSITIONS: np.ndarray = _test_transition_table()
+
+
+class SimulatorEnsemble:
+    """Replicates of a simulation that are stepped in lockstep, with the replicate as the leading axis of their state.
+
+    The replicates are simulators of the same configuration, each with its own population and random state. Their
+    person states are kept in population stores whose columns are stacked into (K, N) arrays, and their summary
+    counters are stacked into (K, ...) arrays. Every hour, the persons of each replicate move and meet as in a single
+    simulator. At every infection update, the infection model and the testing are applied once to the active persons
+    of all replicates that are due, as (K x N) array operations on the stacked columns, and the counters of all
+    replicates are updated by scattered adds. The infection update and the testing draw from the random state of the
+    ensemble, so a replicate does not follow the same course as its simulator stepped alone.
+    """
+
+    _simulators: List[Simulator]
+    _population_columns: Dict[str, np.ndarray]
+    _summary_counters: Dict[str, np.ndarray]
+    _retired: np.ndarray
+    _ages: np.ndarray
+    _location_type_codes: np.ndarray
+
+    _numpy_rng: np.random.RandomState
+    _infection_model: InfectionModel
+    _pandemic_testing: RandomPandemicTesting
+
+    def __init__(self, simulators: Sequence[Simulator], numpy_rng: Optional[np.random.RandomState] = None):
+        """
+        :param simulators: the replicates, simulators of the same configuration that keep their person states in
+            population stores and test with RandomPandemicTesting
+        :param numpy_rng: random state of the infection updates and the testing, derived from the random states of the
+            replicates by default
+        """
+        assert len(simulators) > 0, 'Expected at least one replicate.'
+        self._simulators = list(simulators)
+        for sim in self._simulators:
+            assert sim.population_store is not None, (
+                'The replicates must keep their person states in population stores, see '
+                'SimulationSettings.use_population_store.')
+            assert isinstance(sim._pandemic_testing, RandomPandemicTesting), (
+                'The replicates must test with RandomPandemicTesting.')
+
+        # the populations of the replicates differ in size, the padding of the stacked arrays is retired
+        self._population_columns = PopulationStore.stack([cast(PopulationStore, sim.population_store)
+                                                          for sim in self._simulators])
+        self._summary_counters = SimulationSummary.stack([sim._summary for sim in self._simulators])
+        num_persons = max(len(sim.persons) for sim in self._simulators)
+        self._retired = np.ones((len(self._simulators), num_persons), dtype=bool)
+        self._ages = np.zeros((len(self._simulators), num_persons), dtype=np.int64)
+        for sim, retired, ages in zip(self._simulators, self._retired, self._ages):
+            retired[:len(sim.persons)] = sim._retired
+            sim._retired = retired[:len(sim.persons)]
+            ages[:len(sim.persons)] = [person.id.age for person in sim.persons]
+
+        # location type of each location index of the stores, as a code into the location type infection summary
+        location_types = self._simulators[0]._summary.location_types
+        num_locations = max(len(sim.locations) for sim in self._simulators)
+        self._location_type_codes = np.zeros((len(self._simulators), num_locations), dtype=np.int64)
+        for sim, codes in zip(self._simulators, self._location_type_codes):
+            store = cast(PopulationStore, sim.population_store)
+            codes[:len(sim.locations)] = [location_types.index(type(sim.id_to_location[store.location_id(i)]))
+                                          for i in range(len(sim.locations))]
+
+        if numpy_rng is None:
+            numpy_rng = np.random.RandomState([_seeds_from_rng(sim._numpy_rng, 1)[0] for sim in self._simulators])
+        self._numpy_rng = numpy_rng
+        self._infection_model = self._simulators[0]._infection_model.fork(numpy_rng)
+        self._pandemic_testing = cast(RandomPandemicTesting, self._simulators[0]._pandemic_testing).fork(numpy_rng)
+
+    @classmethod
+    def from_config(cls: Type['SimulatorEnsemble'],
+                    sim_config: SimulationConfigs,
+                    seeds: Sequence[int],
+                    sim_opts: SimulationSettings = SimulationSettings()) -> 'SimulatorEnsemble':
+        """
+        Build one replicate per seed, each with its own registry, population and random state, as init_globals and
+        Simulator.from_config would. The replicates always use population stores.
+
+        :param sim_config: SimulationConfigs instance
+        :param seeds: seeds of the replicates
+        :param sim_opts: SimulationSettings instance
+        :return: SimulatorEnsemble instance
+        """
+        sim_opts = dataclasses.replace(sim_opts, use_population_store=True)
+        simulators = []
+        for seed in seeds:
+            globals.registry = CityRegistry()
+            globals.numpy_rng = np.random.RandomState(seed)
+            simulators.append(Simulator.from_config(sim_config, sim_opts))
+        return cls(simulators, np.random.RandomState(list(seeds)))
+
+    def __len__(self) -> int:
+        return len(self._simulators)
+
+    @property
+    def simulators(self) -> Sequence[Simulator]:
+        return self._simulators
+
+    @property
+    def population_columns(self) -> Dict[str, np.ndarray]:
+        """The stacked (K, N) population store columns of the replicates, N is the size of the largest population"""
+        return self._population_columns
+
+    def step(self, replicates: Optional[Sequence[int]] = None) -> None:
+        """
+        Step the replicates by one hour. The replicates that are due for an infection update are updated together.
+
+        :param replicates: optional indices of the replicates to step, all replicates by default
+        """
+        rows = list(range(len(self._simulators))) if replicates is None else list(replicates)
+        for k in rows:
+            self._simulators[k]._step_hour()
+        update_rows = [k for k in rows if self._simulators[k]._clock.trigger(
+            self._simulators[k]._infection_update_interval)]
+        if update_rows:
+            self._update_infections(update_rows)
+            for k in update_rows:
+                self._simulators[k]._update_after_infections()
+        for k in rows:
+            self._simulators[k]._end_step()
+
+    def step_day(self, hours_in_a_day: int = 24, replicates: Optional[Sequence[int]] = None) -> None:
+        for _ in range(hours_in_a_day):
+            self.step(replicates)
+
+    def _update_infections(self, rows: Sequence[int]) -> None:
+        # the infection update and the testing of the active persons of the given replicates, in one pass over the
+        # stacked columns
+        columns = self._population_columns
+        counters = self._summary_counters
+
+        # persons get their first infection state from the model of their own replicate
+        uninitialized = [k for k in rows if ((columns['infection_summary'][k] < 0) & ~self._retired[k]).any()]
+        for k in uninitialized:
+            self._simulators[k]._update_infections()
+        rows = [k for k in rows if k not in uninitialized]
+        if not rows:
+            return
+
+        active = np.zeros(self._retired.shape, dtype=bool)
+        active[rows] = ~self._retired[rows]
+        ks, ns = np.nonzero(active)
+
+        # infection model step for the active persons of all replicates at once
+        infection_states = columns['infection_state'][ks, ns]
+        next_infection_states = np.empty(len(ks), dtype=object)
+        next_infection_states[:] = self._infection_model.step_states(
+            infection_states, self._ages[ks, ns], _RISKS[columns['risk'][ks, ns]],
+            1 - columns['not_infection_probability'][ks, ns])
+
+        # write back the persons whose infection state changed
+        changed = np.fromiter((prev is not new for prev, new in zip(infection_states, next_infection_states)),
+                              dtype=bool, count=len(ks))
+        changed_states = next_infection_states[changed]
+        cks, cns = ks[changed], ns[changed]
+        prev_summaries = columns['infection_summary'][cks, cns]
+        summaries = np.fromiter((_SUMMARY_CODES[s.summary] for s in changed_states), dtype=prev_summaries.dtype,
+                                count=len(changed_states))
+        columns['infection_state'][cks, cns] = changed_states
+        columns['infection_summary'][cks, cns] = summaries
+        columns['shows_symptoms'][cks, cns] = np.fromiter((s.shows_symptoms for s in changed_states), dtype=bool,
+                                                          count=len(changed_states))
+        columns['is_hospitalized'][cks, cns] = np.fromiter((s.is_hospitalized for s in changed_states), dtype=bool,
+                                                           count=len(changed_states))
+
+        moved = summaries != prev_summaries
+        counted = moved & (prev_summaries >= 0)
+        np.add.at(counters['infection_counts'], (cks[counted], prev_summaries[counted]), -1)
+        np.add.at(counters['infection_counts'], (cks[moved], summaries[moved]), 1)
+        for k, n in zip(cks[moved].tolist(), cns[moved].tolist()):
+            sim = self._simulators[k]
+            sim._registry.update_infectious_presence(sim.persons[n].id)
+
+        exposed = np.fromiter((s.exposed_rnb != -1. for s in changed_states), dtype=bool, count=len(changed_states))
+        eks, ens = cks[exposed], cns[exposed]
+        np.add.at(counters['location_type_infection_counts'],
+                  (eks, self._location_type_codes[eks, columns['infection_location'][eks, ens]]), 1)
+
+        columns['not_infection_probability'][ks, ns] = 1.
+        columns['infection_location'][ks, ns] = -1
+
+        # test the persons for infection
+        prev_results = columns['test_result'][ks, ns]
+        admitted, results = self._pandemic_testing.test_batch(
+            columns['infection_summary'][ks, ns], columns['shows_symptoms'][ks, ns],
+            columns['is_hospitalized'][ks, ns], prev_results)
+        columns['test_result'][ks, ns] = results
+        transitions = _TEST_TRANSITIONS[prev_results[admitted], results[admitted]]
+        tested = transitions[:, 0] >= 0
+        tks, transitions = ks[admitted][tested], transitions[tested]
+        np.add.at(counters['testing_counts'], (tks, transitions[:, 0]), -1)
+        np.add.at(counters['testing_counts'], (tks, transitions[:, 1]), 1)
+        num_tests = np.bincount(tks, weights=transitions[:, 2], minlength=len(self._simulators))
+        for k in rows:
+            self._simulators[k]._summary.num_tests += int(num_tests[k])
+
+    def reset(self) -> None:
+        for sim in self._simulators:
+            sim.reset()
+        # resetting the summaries replaces their counters
+        self._summary_counters = SimulationSummary.stack([sim._summary for sim in self._simulators])
+        self._infection_model.reset()
+
+    def impose_regulation(self, regulation: Union[ChosenRegulation, Sequence[ChosenRegulation]]) -> None:
+        """
+        Impose a regulation on all replicates, or one regulation per replicate.
+
+        :param regulation: a ChosenRegulation instance or a sequence with one instance per replicate
+        """
+        regulations = [regulation] * len(self._simulators) if isinstance(regulation, ChosenRegulation) else regulation
+        assert len(regulations) == len(self._simulators), 'Expected one regulation per replicate.'
+        for sim, reg in zip(self._simulators, regulations):
+            sim.impose_regulation(reg)
+
+    # ----------------replicate wide quantities-----------------
+
+    @property
+    def global_infection_summary(self) -> np.ndarray:
+        """Number of persons in each infection summary, a (K, len(InfectionSummary)) array"""
+        return self._summary_counters['infection_counts'].copy()
+
+    @property
+    def global_testing_summary(self) -> np.ndarray:
+        """Number of persons with each test based infection summary, a (K, len(InfectionSummary)) array"""
+        return self._summary_counters['testing_counts'].copy()
+
+    @property
+    def infection_above_threshold(self) -> np.ndarray:
+        """Whether the infections are above the threshold, a (K,) array"""
+        return np.asarray([sim.state.infection_above_threshold for sim in self._simulators])
+
+    @property
+    def regulation_stage(self) -> np.ndarray:
+        """Current regulation stages, a (K,) array"""
+        return np.asarray([sim.state.regulation_stage for sim in self._simulators])
+
+    def update_obs_with_sim_states(self, obs: PandemicObservation, hist_index: int = 0,
+                                   business_location_ids: Optional[Sequence[LocationID]] = None) -> None:
+        """
+        Update an observation whose N dimension is the replicate axis with the current states of the replicates.
+
+        :param obs: a PandemicObservation instance with a batch size of len(self)
+        :param hist_index: history time index
+        :param business_location_ids: business location ids
+        """
+        for i, sim in enumerate(self._simulators):
+            obs.update_obs_with_sim_state(sim.state, hist_index, business_location_ids, batch_index=i)
+
+    def observation(self, business_location_ids: Optional[Sequence[LocationID]] = None) -> PandemicObservation:
+        """Return an observation of the current states of the replicates, with the replicates along the N axis."""
+        obs = PandemicObservation.create_empty(
+            num_non_essential_business=len(business_location_ids) if business_location_ids is not None else None,
+            batch_size=len(self._simulators))
+        self.update_obs_with_sim_states(obs, business_location_ids=business_location_ids)
+        return obs
@@ -26,3 +26,13 @@ class SimulationSettings:
     contact_tracer_history_size: int = 5
 
     infection_threshold: int = 50
+
+    use_population_store: bool = False
+
+    use_routine_scheduler: bool = True
+
+    skip_idle_persons: bool = True
+
+    verify_idle_persons: bool = False
+
+    use_random_streams: bool = False
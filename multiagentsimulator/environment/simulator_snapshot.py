@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from os import PathLike
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .interfaces import SimulationTimeTuple, ContactRate
+
+_TIME_TUPLE_FIELDS = ('hours', 'week_days', 'days')
+_CONTACT_RATE_FIELDS = ('min_assignees', 'min_assignees_visitors', 'min_visitors',
+                        'fraction_assignees', 'fraction_assignees_visitors', 'fraction_visitors')
+
+
+@dataclass(frozen=True)
+class SimulatorSnapshot:
+    """A snapshot of the mutable state of a simulator. The state is held in flat numpy arrays keyed by name, so that
+    it can be saved and loaded without pickling any objects."""
+
+    arrays: Dict[str, np.ndarray]
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the snapshot arrays in bytes"""
+        return sum(a.nbytes for a in self.arrays.values())
+
+    def save(self, path: Union[str, PathLike]) -> None:
+        """
+        Save the snapshot to a compressed npz file.
+
+        :param path: path of the file
+        """
+        np.savez_compressed(path, **self.arrays)
+
+    @classmethod
+    def load(cls, path: Union[str, PathLike]) -> 'SimulatorSnapshot':
+        """
+        Load a snapshot saved with save().
+
+        :param path: path of the file
+        :return: SimulatorSnapshot instance
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def subset(self, prefix: str) -> Dict[str, np.ndarray]:
+        """Return the arrays whose names start with the given prefix, with the prefix stripped."""
+        return {name[len(prefix):]: a for name, a in self.arrays.items() if name.startswith(prefix)}
+
+
+def with_prefix(prefix: str, arrays: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {prefix + name: a for name, a in arrays.items()}
+
+
+def pack_ragged(sequences: Sequence[Sequence], dtype: type) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack a sequence of variable length sequences into an offsets and a values array.
+
+    :param sequences: a sequence of sequences
+    :param dtype: dtype of the values
+    :return: a tuple of offsets (len(sequences) + 1) and the concatenated values
+    """
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in sequences], out=offsets[1:])
+    values = np.fromiter((v for s in sequences for v in s), dtype=dtype, count=int(offsets[-1]))
+    return offsets, values
+
+
+def unpack_ragged(offsets: np.ndarray, values: np.ndarray) -> List[list]:
+    """Inverse of pack_ragged, returns the sequences as lists of python values."""
+    values_list = values.tolist()
+    bounds = offsets.tolist()
+    return [values_list[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def encode_rng(rng: np.random.RandomState) -> Dict[str, np.ndarray]:
+    name, keys, pos, has_gauss, cached_gaussian = rng.get_state()
+    assert name == 'MT19937', f'Unsupported bit generator {name}.'
+    return dict(keys=np.asarray(keys, dtype=np.uint32),
+                pos=np.asarray(pos, dtype=np.int64),
+                has_gauss=np.asarray(has_gauss, dtype=np.int64),
+                cached_gaussian=np.asarray(cached_gaussian, dtype=np.float64))
+
+
+def restore_rng(rng: np.random.RandomState, arrays: Mapping[str, np.ndarray]) -> None:
+    rng.set_state(('MT19937', arrays['keys'], int(arrays['pos']), int(arrays['has_gauss']),
+                   float(arrays['cached_gaussian'])))
+
+
+def encode_time_tuples(time_tuples: Sequence[SimulationTimeTuple]) -> Dict[str, np.ndarray]:
+    arrays = {}
+    for name in _TIME_TUPLE_FIELDS:
+        values = [getattr(tt, name) for tt in time_tuples]
+        arrays[f'{name}_is_none'] = np.asarray([v is None for v in values], dtype=bool)
+        arrays[f'{name}_offsets'], arrays[f'{name}_values'] = pack_ragged([v or () for v in values], np.int16)
+    return arrays
+
+
+def decode_time_tuples(arrays: Mapping[str, np.ndarray]) -> List[SimulationTimeTuple]:
+    fields = []
+    for name in _TIME_TUPLE_FIELDS:
+        values = unpack_ragged(arrays[f'{name}_offsets'], arrays[f'{name}_values'])
+        fields.append([None if is_none else tuple(v) for v, is_none in zip(values, arrays[f'{name}_is_none'].tolist())])
+
+    # time tuples compile their masks on creation, so share instances between equal tuples
+    cache: Dict[Tuple[Optional[Tuple[int, ...]], ...], SimulationTimeTuple] = {}
+    time_tuples = []
+    for key in zip(*fields):
+        if key not in cache:
+            cache[key] = SimulationTimeTuple(*key)
+        time_tuples.append(cache[key])
+    return time_tuples
+
+
+def encode_contact_rates(contact_rates: Sequence[ContactRate]) -> Dict[str, np.ndarray]:
+    return {name: np.asarray([getattr(cr, name) for cr in contact_rates],
+                             dtype=np.float64 if name.startswith('fraction') else np.int64)
+            for name in _CONTACT_RATE_FIELDS}
+
+
+def decode_contact_rates(arrays: Mapping[str, np.ndarray]) -> List[ContactRate]:
+    cache: Dict[tuple, ContactRate] = {}
+    contact_rates = []
+    for key in zip(*(arrays[name].tolist() for name in _CONTACT_RATE_FIELDS)):
+        if key not in cache:
+            cache[key] = ContactRate(*key)
+        contact_rates.append(cache[key])
+    return contact_rates
@@ -0,0 +1,155 @@
+import json
+from dataclasses import dataclass, field
+from os import PathLike
+from time import perf_counter
+from typing import Any, Dict, List, Union
+
+_COUNTERS = ('num_locations', 'num_contacts', 'num_person_steps', 'num_moves', 'num_infection_transitions',
+             'num_tests')
+
+
+@dataclass
+class StepStats:
+    """Wall times in seconds and counters of a single step."""
+
+    name: str
+    tick: int
+    start: float
+    duration: float = 0.
+    phase_times: Dict[str, float] = field(default_factory=dict)
+
+    num_locations: int = 0
+    """Number of locations whose contacts were sampled"""
+
+    num_contacts: int = 0
+    """Number of sampled contacts"""
+
+    num_person_steps: int = 0
+    """Number of person steps, skipped steps of idle persons are not counted"""
+
+    num_moves: int = 0
+    """Number of persons that changed their location"""
+
+    num_infection_transitions: int = 0
+    """Number of persons whose infection summary changed"""
+
+    num_tests: int = 0
+    """Number of tested persons"""
+
+    def counters(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in _COUNTERS}
+
+
+class StepProfiler:
+    """Records the wall time of the phases of simulator and environment steps, together with a few counters per step.
+
+    Steps record into a profiler only if one is set, otherwise the step code merely checks for its absence. Steps can
+    nest, for example the simulator steps within an environment step, and the phases of a step are the intervals
+    between consecutive calls to end_phase. Phase times of the same name accumulate within a step.
+    """
+
+    steps: List[StepStats]
+    _open_steps: List[StepStats]
+    _marks: List[float]
+    _origin: float
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        """Discard all recorded steps."""
+        self.steps = []
+        self._open_steps = []
+        self._marks = []
+        self._origin = perf_counter()
+
+    @property
+    def current(self) -> StepStats:
+        """Stats of the innermost step that is being recorded"""
+        return self._open_steps[-1]
+
+    def begin_step(self, name: str, tick: int) -> StepStats:
+        """
+        Start recording a step. The first phase of the step starts now.
+
+        :param name: name of the step, for example sim_step
+        :param tick: current tick
+        :return: the stats of the step
+        """
+        now = perf_counter()
+        stats = StepStats(name=name, tick=tick, start=now)
+        self._open_steps.append(stats)
+        self._marks.append(now)
+        return stats
+
+    def end_phase(self, name: str) -> None:
+        """
+        End the current phase of the innermost step and start the next one.
+
+        :param name: name of the ended phase
+        """
+        now = perf_counter()
+        phase_times = self._open_steps[-1].phase_times
+        phase_times[name] = phase_times.get(name, 0.) + now - self._marks[-1]
+        self._marks[-1] = now
+
+    def end_step(self) -> StepStats:
+        """Stop recording the innermost step and return its stats."""
+        stats = self._open_steps.pop()
+        self._marks.pop()
+        stats.duration = perf_counter() - stats.start
+        self.steps.append(stats)
+        return stats
+
+    def summary(self, name: str = 'sim_step') -> StepStats:
+        """
+        Return the phase times and counters summed over all recorded steps of the given name. The tick of the summary
+        is the number of summed steps.
+
+        :param name: name of the steps
+        :return: StepStats instance
+        """
+        total = StepStats(name=name, tick=0, start=self._origin)
+        for stats in self.steps:
+            if stats.name != name:
+                continue
+            total.tick += 1
+            total.duration += stats.duration
+            for phase, t in stats.phase_times.items():
+                total.phase_times[phase] = total.phase_times.get(phase, 0.) + t
+            for counter in _COUNTERS:
+                setattr(total, counter, getattr(total, counter) + getattr(stats, counter))
+        return total
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """
+        Return the recorded steps in the Chrome trace event format, as viewed by chrome://tracing or Perfetto.
+
+        Each step is a complete event with its tick and counters as arguments, followed by one complete event per
+        phase. Phase events are laid out back to back from the start of the step, so phases that interleave within a
+        step, like contact sampling and tracing per location, show as one event each. The counters of each step are
+        also emitted as counter events.
+
+        :return: a dict with the trace events
+        """
+        events = []
+        for stats in self.steps:
+            ts = (stats.start - self._origin) * 1e6
+            args = dict(tick=stats.tick, **stats.counters())
+            events.append(dict(name=stats.name, ph='X', ts=ts, dur=stats.duration * 1e6, pid=0, tid=0, args=args))
+            if stats.name == 'sim_step':
+                events.append(dict(name='counters', ph='C', ts=ts, pid=0, tid=0, args=stats.counters()))
+            for phase, t in stats.phase_times.items():
+                events.append(dict(name=phase, ph='X', ts=ts, dur=t * 1e6, pid=0, tid=0))
+                ts += t * 1e6
+        return dict(traceEvents=events, displayTimeUnit='ms')
+
+    def save_chrome_trace(self, path: Union[str, PathLike]) -> None:
+        """
+        Save the recorded steps as a Chrome trace event JSON file.
+
+        :param path: path of the file
+        """
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
@@ -1,66 +1,245 @@
-
+import sys
+from copy import copy
+from dataclasses import dataclass
 from orderedset import OrderedSet
-from typing import Dict, FrozenSet, List, Mapping, Set
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
 
 import numpy as np
 
 from ..interfaces import ContactTracer, PersonID
 
+_INDEX_BITS = 32
+_INDEX_MASK = (1 << _INDEX_BITS) - 1
+
+
+def _pack(index1: int, index2: int) -> int:
+    # key of an unordered pair of person indices, the smaller index in the high bits
+    return (index1 << _INDEX_BITS) | index2 if index1 < index2 else (index2 << _INDEX_BITS) | index1
+
+
+@dataclass(frozen=True)
+class ContactSlot:
+    """Contacts of a past time slot, as packed pair keys with counts and a per-person adjacency in CSR form."""
+
+    keys: np.ndarray
+    """Packed pair keys, the smaller person index in the high 32 bits"""
+
+    counts: np.ndarray
+    """Number of contacts of each pair"""
+
+    persons: np.ndarray
+    """Sorted indices of the persons that have contacts in the slot"""
+
+    offsets: np.ndarray
+    """The contacts of persons[i] are partners[offsets[i]:offsets[i + 1]]"""
+
+    partners: np.ndarray
+
+    partner_counts: np.ndarray
+
+    @classmethod
+    def from_counts(cls, counts: Mapping[int, int]) -> 'ContactSlot':
+        """Build a slot from a dict of packed pair keys to counts."""
+        keys = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        pair_counts = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        low = keys >> _INDEX_BITS
+        high = keys & _INDEX_MASK
+
+        endpoints = np.concatenate([low, high])
+        order = np.argsort(endpoints, kind='stable')
+        persons, starts = np.unique(endpoints[order], return_index=True)
+        return cls(keys=keys,
+                   counts=pair_counts,
+                   persons=persons,
+                   offsets=np.append(starts, len(endpoints)),
+                   partners=np.concatenate([high, low])[order],
+                   partner_counts=np.concatenate([pair_counts, pair_counts])[order])
+
+    def contacts_of(self, index: int) -> Tuple[List[int], List[int]]:
+        """Return the partners of the person with the given index and the number of contacts with each."""
+        i = int(np.searchsorted(self.persons, index))
+        if i == len(self.persons) or self.persons[i] != index:
+            return [], []
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.partners[start:end].tolist(), self.partner_counts[start:end].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.keys, self.counts, self.persons, self.offsets, self.partners,
+                                      self.partner_counts))
+
+
+_EMPTY_SLOT = ContactSlot.from_counts({})
+
 
 class MaxSlotContactTracer(ContactTracer):
     """A max slot contact tracing app. In this app, contacts are discarded after the maximum storage slots are reached.
     For example, if storage_slots is 5, and the time_slot_scale is 24 (a day), only the last 5 days of contacts
     will be kept. Note that time_slot_scale is only used as a scale and it should be care of the user to
-    make sure that the contacts are added in a proper way (respecting that scale)."""
+    make sure that the contacts are added in a proper way (respecting that scale).
+
+    The slots form a fixed ring. Contacts of the current slot are counted in a dict of packed pair keys, and when a new
+    slot starts they are frozen into a ContactSlot that replaces the oldest slot of the ring.
+
+    The mask of persons with a positive contact is computed from the keys of all slots when it is first requested after
+    the positive persons change or a slot is dropped, and contacts added in the meantime update it in place."""
 
     _storage_slots: int
     _time_slot_scale: int
-    _memory: List[Dict[FrozenSet[PersonID], int]]
-    _indices: List[Dict[PersonID, Set[FrozenSet[PersonID]]]]
+
+    # contacts are keyed on the dense indices of the person ids
+    _slots: List[ContactSlot]
+    _head: int
+    _current: Dict[int, int]
+    _current_partners: Dict[int, List[int]]
+    _person_ids: Dict[int, PersonID]
+
+    _positive: np.ndarray
+    _positive_list: List[bool]
+    _positive_contacts: Optional[np.ndarray]
 
     def __init__(self, storage_slots: int = 5, time_slot_scale: int = 24):
         self._storage_slots = storage_slots
         self._time_slot_scale = time_slot_scale
-        self._memory = [dict() for i in range(0, storage_slots)]
-        self._indices = [dict() for i in range(0, storage_slots)]
+        self.reset()
 
     def new_time_slot(self) -> None:
-        self._memory = np.roll(self._memory, 1)
-        self._indices = np.roll(self._indices, 1)
-        self._memory[0] = dict()
-        self._indices[0] = dict()
+        self._slots[self._head] = ContactSlot.from_counts(self._current)
+        # the oldest slot is dropped and its place in the ring becomes the current slot
+        self._head = (self._head - 1) % self._storage_slots
+        self._slots[self._head] = _EMPTY_SLOT
+        self._current = dict()
+        self._current_partners = dict()
+        self._positive_contacts = None
 
     def reset(self) -> None:
-        self._memory = [dict() for i in range(0, self._storage_slots)]
-        self._indices = [dict() for i in range(0, self._storage_slots)]
+        self._slots = [_EMPTY_SLOT] * self._storage_slots
+        self._head = 0
+        self._current = dict()
+        self._current_partners = dict()
+        self._person_ids = dict()
+        self._positive = np.zeros(0, dtype=bool)
+        self._positive_list = []
+        self._positive_contacts = None
 
     def add_contacts(self, contacts: OrderedSet) -> None:
-        for c in contacts:
-            idx = frozenset(c)
-
-            if idx not in self._memory[0]:
-                self._memory[0][idx] = 0
-
-            self._memory[0][idx] += 1
-
-            for pid in idx:
-                if pid not in self._indices[0]:
-                    self._indices[0][pid] = OrderedSet()
-                self._indices[0][pid].add(idx)
-
-    def get_contacts(self, person_id: PersonID) -> Mapping[PersonID, np.ndarray]:
-        res = dict()
-
-        for slot_num, indices in enumerate(self._memory):
-            if person_id not in self._indices[slot_num]:
+        current = self._current
+        partners = self._current_partners
+        person_ids = self._person_ids
+        positive = self._positive_list
+        positive_contacts = self._positive_contacts
+        for pid1, pid2 in contacts:
+            index1 = pid1.index
+            index2 = pid2.index
+            key = _pack(index1, index2)
+
+            if key in current:
+                current[key] += 1
                 continue
 
-            p_indices = self._indices[slot_num][person_id]
-
-            for idx in p_indices:
-                pid = [val for val in idx if val != person_id]
-                if pid[0] not in res:
-                    res[pid[0]] = np.zeros(self._storage_slots)
-                res[pid[0]][slot_num] += self._memory[slot_num][idx]/float(self._time_slot_scale)
+            current[key] = 1
+            if positive_contacts is not None:
+                if positive[index2]:
+                    positive_contacts[index1] = True
+                if positive[index1]:
+                    positive_contacts[index2] = True
+            for index, pid, partner in ((index1, pid1, index2), (index2, pid2, index1)):
+                if index not in partners:
+                    partners[index] = []
+                    person_ids[index] = pid
+                partners[index].append(partner)
+
+    def _slot(self, slot_num: int) -> ContactSlot:
+        return self._slots[(self._head + slot_num) % self._storage_slots]
 
-        return res
+    def get_contacts(self, person_id: PersonID) -> Mapping[PersonID, np.ndarray]:
+        index = person_id.index
+        rows: Dict[int, int] = {}
+        entries = []
+
+        current_partners = self._current_partners.get(index, [])
+        slot_contacts = [(current_partners, [self._current[_pack(index, partner)] for partner in current_partners])]
+        slot_contacts.extend(self._slot(slot_num).contacts_of(index) for slot_num in range(1, self._storage_slots))
+        for slot_num, (partners, counts) in enumerate(slot_contacts):
+            for partner, count in zip(partners, counts):
+                entries.append((rows.setdefault(partner, len(rows)), slot_num, count))
+
+        # one array for all contacts, the values of the result are its rows
+        values = np.zeros((len(rows), self._storage_slots))
+        for row, slot_num, count in entries:
+            values[row, slot_num] += count / float(self._time_slot_scale)
+        return {self._person_ids[partner]: values[row] for partner, row in rows.items()}
+
+    def set_positive_persons(self, positive: np.ndarray, person_ids: Sequence[PersonID]) -> None:
+        if self._positive_contacts is not None and np.array_equal(positive, self._positive):
+            return
+        self._positive = np.asarray(positive, dtype=bool).copy()
+        self._positive_list = self._positive.tolist()
+        self._positive_contacts = None
+
+    def positive_contact_mask(self) -> np.ndarray:
+        if self._positive_contacts is None:
+            positive = self._positive
+            mask = np.zeros(len(positive), dtype=bool)
+            keys = [np.fromiter(self._current.keys(), dtype=np.int64, count=len(self._current))]
+            keys.extend(self._slot(slot_num).keys for slot_num in range(1, self._storage_slots))
+            for slot_keys in keys:
+                low = slot_keys >> _INDEX_BITS
+                high = slot_keys & _INDEX_MASK
+                mask[low[positive[high]]] = True
+                mask[high[positive[low]]] = True
+            self._positive_contacts = mask
+        return self._positive_contacts
+
+    def has_positive_contact(self, person_id: PersonID) -> bool:
+        return bool(self.positive_contact_mask()[person_id.index])
+
+    def num_contacts(self) -> List[int]:
+        """Return the number of distinct contact pairs of each slot, starting with the current slot."""
+        return [len(self._current)] + [len(self._slot(slot_num).keys) for slot_num in range(1, self._storage_slots)]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the tracer in bytes"""
+        current = sys.getsizeof(self._current) + sys.getsizeof(self._current_partners) + sum(
+            sys.getsizeof(partners) for partners in self._current_partners.values())
+        return current + sum(slot.nbytes for slot in self._slots if slot is not _EMPTY_SLOT)
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        slots = [np.fromiter(self._current.keys(), dtype=np.int64, count=len(self._current))]
+        counts = [np.fromiter(self._current.values(), dtype=np.int64, count=len(self._current))]
+        for slot_num in range(1, self._storage_slots):
+            slots.append(self._slot(slot_num).keys)
+            counts.append(self._slot(slot_num).counts)
+        keys = np.concatenate(slots)
+        return dict(slot=np.repeat(np.arange(self._storage_slots, dtype=np.int32), [len(k) for k in slots]),
+                    person1=(keys >> _INDEX_BITS).astype(np.int32),
+                    person2=(keys & _INDEX_MASK).astype(np.int32),
+                    count=np.concatenate(counts))
+
+    def restore(self, arrays: Mapping[str, np.ndarray], person_ids: Sequence[PersonID]) -> None:
+        self.reset()
+        assert np.all(arrays['slot'] < self._storage_slots), 'The snapshot has more storage slots than the tracer.'
+        slot_counts: List[Dict[int, int]] = [dict() for _ in range(self._storage_slots)]
+        for slot_num, person1, person2, count in zip(arrays['slot'].tolist(), arrays['person1'].tolist(),
+                                                     arrays['person2'].tolist(), arrays['count'].tolist()):
+            slot_counts[slot_num][_pack(person1, person2)] = count
+            for index, partner in ((person1, person2), (person2, person1)):
+                self._person_ids[index] = person_ids[index]
+                if slot_num == 0:
+                    self._current_partners.setdefault(index, []).append(partner)
+        self._current = slot_counts[0]
+        for slot_num in range(1, self._storage_slots):
+            self._slots[slot_num] = ContactSlot.from_counts(slot_counts[slot_num])
+
+    def fork(self) -> 'MaxSlotContactTracer':
+        # past slots are immutable and shared, only the current slot is copied
+        tracer = copy(self)
+        tracer._slots = list(self._slots)
+        tracer._current = dict(self._current)
+        tracer._current_partners = {index: list(partners) for index, partners in self._current_partners.items()}
+        tracer._person_ids = dict(self._person_ids)
+        # the positive persons are replaced and never updated in place, only the mask is copied
+        if self._positive_contacts is not None:
+            tracer._positive_contacts = self._positive_contacts.copy()
+        return tracer
@@ -1,12 +1,17 @@
 import abc
 import dataclasses
-from typing import Any, cast, Type, TypeVar, Dict, List
+from copy import deepcopy
+from typing import Any, Callable, cast, Type, TypeVar, Dict, List, Tuple
 
 import istype
 import numpy as np
+from orderedset import OrderedSet
 
 _T = TypeVar('_T')
 
+_CONTAINER_COPIES: Dict[type, Callable[[Any], Any]] = {list: list.copy, set: set.copy, dict: dict.copy,
+                                                       OrderedSet: OrderedSet}
+
 
 def required() -> _T:
     def required_err() -> Any:
@@ -28,6 +33,52 @@ def shallow_asdict(x: Any) -> Dict[str, Any]:
     return {field.name: getattr(x, field.name) for field in dataclasses.fields(x)}
 
 
+def shallow_copy(x: _T) -> _T:
+    """
+    Return a shallow copy of an instance that keeps its attributes in a __dict__. This is a faster copy.copy for the
+    many small objects that are copied when forking a simulation.
+
+    :param x: an instance with a __dict__
+    :return: a copy of x
+    """
+    y = object.__new__(type(x))
+    y.__dict__.update(x.__dict__)
+    return y
+
+
+def fork_dataclass(x: _T) -> _T:
+    """
+    Return a shallow copy of a dataclass instance in which mutable container fields (lists, sets and dicts) are copied
+    as well, so that in-place updates of the copy do not leak into the original. All other values are shared.
+
+    :param x: dataclass instance
+    :return: a copy of x
+    """
+    y = shallow_copy(x)
+    attributes = y.__dict__
+    for name, value in attributes.items():
+        copy_container = _CONTAINER_COPIES.get(type(value))
+        if copy_container is not None:
+            attributes[name] = copy_container(value)
+    return y
+
+
+def deepcopy_with_numpy_rng(x: _T, numpy_rng: np.random.RandomState) -> _T:
+    """
+    Return a deep copy of x in which all references to the random state of x, its _numpy_rng attribute, are replaced
+    by the given random state.
+
+    :param x: an instance that may hold a random state in its _numpy_rng attribute
+    :param numpy_rng: random state of the copy
+    :return: a copy of x
+    """
+    memo: Dict[int, Any] = {}
+    rng = getattr(x, '_numpy_rng', None)
+    if rng is not None:
+        memo[id(rng)] = numpy_rng
+    return deepcopy(x, memo)
+
+
 def cluster_into_random_sized_groups(orig_list: List[int],
                                      min_group_size: int,
                                      max_group_size: int,
@@ -44,3 +95,37 @@ def cluster_into_random_sized_groups(orig_list: List[int],
 def integer_partitions(x: int, n_partitions: int) -> List[int]:
     _x = x // n_partitions
     return [_x + 1 if i < x % n_partitions else _x for i in range(n_partitions)]
+
+
+def unrank_pair_combinations(ranks: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Map ranks of 2-combinations of n items to their (i, j) indices, i < j, following the lexicographic order of
+    itertools.combinations(range(n), 2).
+
+    :param ranks: integer array of ranks in [0, n * (n - 1) / 2)
+    :param n: number of items
+    :return: a tuple of index arrays (i, j)
+    """
+    ranks = np.asarray(ranks, dtype=np.int64)
+    num_pairs = n * (n - 1) // 2
+    # number of pairs whose first index is >= i is (n - i) * (n - i - 1) / 2, invert the triangular number
+    rev = num_pairs - 1 - ranks
+    m = ((np.sqrt(8. * rev + 1.) - 1.) / 2.).astype(np.int64)
+    # correct for floating point round off
+    m += (m + 1) * (m + 2) // 2 <= rev
+    m -= m * (m + 1) // 2 > rev
+    i = n - 2 - m
+    j = ranks - (num_pairs - (n - i) * (n - i - 1) // 2) + i + 1
+    return i, j
+
+
+def unrank_pair_products(ranks: np.ndarray, n2: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Map ranks of pairs in the cartesian product of n1 x n2 items to their (i, j) indices, following the
+    order of itertools.product(range(n1), range(n2)).
+
+    :param ranks: integer array of ranks in [0, n1 * n2)
+    :param n2: number of items in the second group
+    :return: a tuple of index arrays (i, j)
+    """
+    return np.divmod(np.asarray(ranks, dtype=np.int64), n2)
@@ -0,0 +1,307 @@
+"""Scaling benchmarks of the simulator core on synthetic cities.
+
+Each benchmark runs in a fresh worker process per city size, so that the reported peak resident set size is that of
+the benchmark alone. The results are written to a single JSON file that can be compared against the results of another
+version with --compare. The time of a bare import of the package in a fresh interpreter is checked against
+--import-budget, and so is the absence of the dependencies that are only needed by configs, maps and plots.
+
+Example:
+    python scripts/benchmarks/simulator_benchmarks.py --sizes 1000 10000 100000 --output results.json
+    python scripts/benchmarks/simulator_benchmarks.py --sizes 1000 --compare results.json
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+import multiagentsimulator as ms
+from multiagentsimulator.data import H5DataLoader, H5DataSaver
+from multiagentsimulator.environment import GymEnvironment, PandemicObservation, SimulationConfigs, \
+    SimulationSettings, Simulator, StepProfiler, generate_locations, generate_population
+
+BenchmarkResult = Dict[str, Any]
+
+_BENCHMARKS: Dict[str, Callable[[SimulationConfigs, argparse.Namespace], BenchmarkResult]] = {}
+
+
+def benchmark(name: str) -> Callable:
+    def register(fn: Callable[[SimulationConfigs, argparse.Namespace], BenchmarkResult]) -> Callable:
+        _BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def _build(sim_config: SimulationConfigs, args: argparse.Namespace) -> Simulator:
+    ms.init_globals(seed=args.seed)
+    return Simulator.from_config(sim_config, SimulationSettings(use_population_store=args.use_population_store))
+
+
+def _phases_per_step(profiler: StepProfiler, name: str = 'sim_step') -> Dict[str, float]:
+    summary = profiler.summary(name)
+    return {phase: t / summary.tick for phase, t in summary.phase_times.items()}
+
+
+@benchmark('generate_population')
+def bench_generate_population(sim_config: SimulationConfigs, args: argparse.Namespace) -> BenchmarkResult:
+    ms.init_globals(seed=args.seed)
+    generate_locations(sim_config)
+    start = time.perf_counter()
+    generate_population(sim_config)
+    seconds = time.perf_counter() - start
+    return dict(seconds=seconds, rate=sim_config.num_persons / seconds, unit='persons/s')
+
+
+@benchmark('build')
+def bench_build(sim_config: SimulationConfigs, args: argparse.Namespace) -> BenchmarkResult:
+    start = time.perf_counter()
+    _build(sim_config, args)
+    seconds = time.perf_counter() - start
+    return dict(seconds=seconds, rate=sim_config.num_persons / seconds, unit='persons/s')
+
+
+@benchmark('step')
+def bench_step(sim_config: SimulationConfigs, args: argparse.Namespace) -> BenchmarkResult:
+    sim = _build(sim_config, args)
+    sim.step_day(args.warm_up_hours)
+    profiler = StepProfiler()
+    sim.use_profiler(profiler)
+    start = time.perf_counter()
+    sim.step_day(args.hours)
+    seconds = time.perf_counter() - start
+    summary = profiler.summary()
+    return dict(seconds=seconds, rate=args.hours / seconds, unit='steps/s', phases=_phases_per_step(profiler),
+                counters={name: value / summary.tick for name, value in summary.counters().items()})
+
+
+@benchmark('step_day')
+def bench_step_day(sim_config: SimulationConfigs, args: argparse.Namespace) -> BenchmarkResult:
+    sim = _build(sim_config, args)
+    start = time.perf_counter()
+    for _ in range(args.days):
+        sim.step_day()
+    seconds = time.perf_counter() - start
+    return dict(seconds=seconds, rate=args.days / seconds, unit='days/s')
+
+
+@benchmark('gym_step')
+def bench_gym_step(sim_config: SimulationConfigs, args: argparse.Namespace) -> BenchmarkResult:
+    env = GymEnvironment(_build(sim_config, args), ms.sh.ukraine_regulations)
+    env.reset()
+    profiler = StepProfiler()
+    env.pandemic_sim.use_profiler(profiler)
+    start = time.perf_counter()
+    for _ in range(args.days):
+        env.step(0)
+    seconds = time.perf_counter() - start
+    return dict(seconds=seconds, rate=args.days / seconds, unit='steps/s',
+                phases=_phases_per_step(profiler, 'env_step'))
+
+
+@benchmark('reset')
+def bench_reset(sim_config: SimulationConfigs, args: argparse.Namespace) -> BenchmarkResult:
+    sim = _build(sim_config, args)
+    sim.step_day(args.warm_up_hours)
+    start = time.perf_counter()
+    sim.reset()
+    seconds = time.perf_counter() - start
+    return dict(seconds=seconds, rate=1 / seconds, unit='resets/s')
+
+
+@benchmark('h5_io')
+def bench_h5_io(sim_config: SimulationConfigs, args: argparse.Namespace) -> BenchmarkResult:
+    sim = _build(sim_config, args)
+    observations = []
+    for _ in range(args.days):
+        sim.step_day()
+        obs = PandemicObservation.create_empty()
+        obs.update_obs_with_sim_state(sim.state)
+        observations.append(obs)
+    # trials that never went above the infection threshold are not saved
+    observations[0].infection_above_threshold[:] = 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        saver = H5DataSaver('benchmark.h5', path=Path(tmp))
+        saver.begin(observations[0])
+        for obs in observations[1:]:
+            saver.record(obs, np.zeros(1))
+        saver.finalize(exp_id=0, seed=args.seed, num_persons=sim_config.num_persons, num_stages_to_execute=1,
+                       stage_0=(0, -1))
+        saver.close()
+        save_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        H5DataLoader('benchmark.h5', path=Path(tmp)).get_data()
+        load_seconds = time.perf_counter() - start
+        num_bytes = (Path(tmp) / 'benchmark.h5').stat().st_size
+
+    seconds = save_seconds + load_seconds
+    return dict(seconds=seconds, rate=len(observations) / seconds, unit='observations/s',
+                phases=dict(save=save_seconds, load=load_seconds), file_bytes=num_bytes)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def run_size(num_persons: int, args: argparse.Namespace) -> List[BenchmarkResult]:
+    # import the lazily imported dependencies of the simulator, so that they are not timed by the first benchmark
+    importlib.import_module('scipy.stats')
+    sim_config = ms.sh.synthetic_city_config(num_persons, seed=args.seed)
+    results = []
+    for name in args.benchmarks:
+        result = dict(benchmark=name, num_persons=num_persons)
+        result.update(_BENCHMARKS[name](sim_config, args))
+        result['peak_rss_mb'] = _peak_rss_mb()
+        results.append(result)
+        print(f'{result["benchmark"]:>20} {num_persons:>9} persons {result["rate"]:>12.3f} {result["unit"]}',
+              file=sys.stderr)
+    return results
+
+
+# dependencies that a bare import of the package must not load
+_LAZY_DEPENDENCIES = ('matplotlib', 'folium', 'osmnx', 'geopandas', 'scipy.stats')
+
+_IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import multiagentsimulator
+seconds = time.perf_counter() - start
+json.dump(dict(seconds=seconds, loaded=[m for m in {_LAZY_DEPENDENCIES!r} if m in sys.modules]), sys.stdout)
+"""
+
+
+def measure_import(repeats: int) -> BenchmarkResult:
+    """
+    Time a bare import of the package in fresh interpreters.
+
+    :param repeats: number of interpreters, the fastest import is reported
+    :return: the benchmark result, with the lazy dependencies that the import loaded
+    """
+    runs = [json.loads(subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT], stdout=subprocess.PIPE, text=True,
+                                      check=True).stdout)
+            for _ in range(repeats)]
+    seconds = min(run['seconds'] for run in runs)
+    return dict(benchmark='import', num_persons=0, seconds=seconds, rate=1 / seconds, unit='imports/s',
+                loaded_lazy_dependencies=runs[0]['loaded'])
+
+
+def check_import_budget(result: BenchmarkResult, budget: float) -> bool:
+    """
+    Print the import time against the budget.
+
+    :param result: result of measure_import
+    :param budget: import time budget in seconds
+    :return: True if the import is within the budget and loaded none of the lazy dependencies
+    """
+    ok = result['seconds'] <= budget and not result['loaded_lazy_dependencies']
+    print(f'{"import":>20} {result["seconds"]:>9.3f} s budget {budget:.3f} s'
+          f'{"" if ok else "  OVER BUDGET"}')
+    if result['loaded_lazy_dependencies']:
+        print(f'{"":>20} loaded {", ".join(result["loaded_lazy_dependencies"])}')
+    return ok
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Sequence[BenchmarkResult], baseline: Sequence[BenchmarkResult], tolerance: float) -> bool:
+    """
+    Print the rate of each benchmark relative to the baseline.
+
+    :param results: current results
+    :param baseline: results of the baseline version
+    :param tolerance: relative slowdown that counts as a regression
+    :return: True if no benchmark regressed
+    """
+    baseline_rates = {(r['benchmark'], r['num_persons']): r['rate'] for r in baseline}
+    ok = True
+    for result in results:
+        key = (result['benchmark'], result['num_persons'])
+        if key not in baseline_rates:
+            continue
+        ratio = result['rate'] / baseline_rates[key]
+        regressed = ratio < 1 - tolerance
+        ok = ok and not regressed
+        print(f'{key[0]:>20} {key[1]:>9} persons {ratio:>7.2f}x{"  REGRESSION" if regressed else ""}')
+    return ok
+
+
+def _worker_command(num_persons: int, name: str, args: argparse.Namespace) -> List[str]:
+    command = [sys.executable, __file__, '--worker', str(num_persons), '--benchmarks', name,
+               '--hours', str(args.hours), '--warm-up-hours', str(args.warm_up_hours), '--days', str(args.days),
+               '--seed', str(args.seed)]
+    if args.use_population_store:
+        command.append('--use-population-store')
+    return command
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='populations of the cities')
+    parser.add_argument('--benchmarks', nargs='+', default=list(_BENCHMARKS), choices=list(_BENCHMARKS))
+    parser.add_argument('--hours', type=int, default=24, help='number of timed steps of the step benchmark')
+    parser.add_argument('--warm-up-hours', type=int, default=24)
+    parser.add_argument('--days', type=int, default=3, help='number of timed days of the daily benchmarks')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--use-population-store', action='store_true')
+    parser.add_argument('--output', type=Path, default=Path('benchmark_results.json'))
+    parser.add_argument('--compare', type=Path, help='results of a baseline version to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--import-budget', type=float, default=1.,
+                        help='budget in seconds of a bare import of the package')
+    parser.add_argument('--import-repeats', type=int, default=5)
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        # stdout carries the results of the worker
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run_size(args.worker, args)
+        json.dump(results, sys.stdout)
+        return
+
+    import_result = measure_import(args.import_repeats)
+    results: List[BenchmarkResult] = [import_result]
+    for num_persons in args.sizes:
+        for name in args.benchmarks:
+            out = subprocess.run(_worker_command(num_persons, name, args), stdout=subprocess.PIPE, text=True,
+                                 check=True).stdout
+            results.extend(json.loads(out))
+
+    report = dict(revision=_git_revision(), timestamp=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                  python=platform.python_version(), numpy=np.__version__, platform=platform.platform(),
+                  settings=dict(hours=args.hours, warm_up_hours=args.warm_up_hours, days=args.days, seed=args.seed,
+                                use_population_store=args.use_population_store, import_budget=args.import_budget),
+                  results=results)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    ok = check_import_budget(import_result, args.import_budget)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        ok = compare(results, baseline, args.tolerance) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()